@@ -0,0 +1,90 @@
+# bench/anon_filter.py
+# Microbenchmark offline cho bộ lọc nội dung chat ẩn danh.
+#
+#   python bench/anon_filter.py --patterns 100 1000 5000 --messages 2000
+#
+# So ContentFilter (một automaton Aho-Corasick) với hai cách quét từng pattern:
+# ``in`` trên văn bản đã bỏ dấu và một regex ``\b...\b`` cho mỗi từ.
+import argparse
+import os
+import random
+import re
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from cogs.anonymous_chat import ContentFilter, fold_text  # noqa: E402
+
+ONSETS = ["b", "c", "ch", "d", "đ", "g", "h", "k", "kh", "l", "m", "n", "ng", "nh", "ph", "qu", "s", "t", "th", "tr", "v", "x"]
+RHYMES = ["a", "á", "à", "ạ", "ai", "an", "ang", "ao", "e", "ê", "ế", "i", "ì", "o", "ô", "ố", "ơ", "ờ", "u", "ư", "ữ",
+          "uy", "ương", "iếng", "oan", "ot", "ốc", "ung"]
+
+
+def syllable(rng: random.Random) -> str:
+    return rng.choice(ONSETS) + rng.choice(RHYMES)
+
+
+def make_patterns(n: int, rng: random.Random) -> list:
+    patterns = set()
+    while len(patterns) < n:
+        patterns.add(" ".join(syllable(rng) for _ in range(rng.choice((2, 2, 3)))))
+    return sorted(patterns)
+
+
+def make_messages(n: int, rng: random.Random, patterns: list, hit_ratio: float) -> list:
+    messages = []
+    for _ in range(n):
+        words = [syllable(rng) for _ in range(rng.randint(5, 40))]
+        if rng.random() < hit_ratio:
+            words.insert(rng.randrange(len(words)), rng.choice(patterns))
+        messages.append(" ".join(words))
+    return messages
+
+
+def bench(fn, messages) -> tuple:
+    started = time.perf_counter()
+    hits = sum(fn(m) is not None for m in messages)
+    return (time.perf_counter() - started) / len(messages), hits
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Microbenchmark bộ lọc nội dung chat ẩn danh")
+    ap.add_argument("--patterns", type=int, nargs="+", default=[100, 1000, 5000], help="số từ cấm mỗi lượt đo")
+    ap.add_argument("--messages", type=int, default=2000)
+    ap.add_argument("--hit-ratio", type=float, default=0.05, help="tỉ lệ tin có chứa từ cấm")
+    ap.add_argument("--seed", type=int, default=1)
+    args = ap.parse_args()
+
+    print(f"{'pattern':>8}  {'dựng':>9}  {'Aho-Corasick':>13}  {'in / từ':>11}  {'regex / từ':>11}")
+    for n in args.patterns:
+        rng = random.Random(args.seed)
+        patterns = make_patterns(n, rng)
+        messages = make_messages(args.messages, rng, patterns, args.hit_ratio)
+
+        started = time.perf_counter()
+        automaton = ContentFilter(patterns)
+        build = time.perf_counter() - started
+
+        folded = [fold_text(p) for p in patterns]
+
+        def naive_in(text: str):
+            text = fold_text(text.lower())
+            return next((p for p in folded if p in text), None)
+
+        compiled = [re.compile(rf"\b{re.escape(p)}\b") for p in folded]
+
+        def naive_regex(text: str):
+            text = fold_text(text.lower())
+            return next((r.pattern for r in compiled if r.search(text)), None)
+
+        ac, ac_hits = bench(automaton.match, messages)
+        plain, _ = bench(naive_in, messages)
+        rx, _ = bench(naive_regex, messages)
+        print(f"{n:>8}  {build * 1000:>7.1f}ms  {ac * 1e6:>10.1f} µs  {plain * 1e6:>8.1f} µs  {rx * 1e6:>8.1f} µs"
+              f"   ({ac_hits}/{len(messages)} tin bị chặn)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,128 @@
+# bench/anon_match.py
+# Benchmark offline cho pool ghép ngẫu nhiên /timban: không cần token, không ra mạng.
+#
+#   python bench/anon_match.py --users 20000 --waiting 5000 --tags 2000
+#
+# Giữ sẵn ``--waiting`` người trong pool rồi cho ``--users`` lượt vào mới
+# (có tag, ngôn ngữ, và người đã ghép quay lại hàng chờ để chạm cooldown).
+# Đo số lượt/giây và số cặp/giây của MatchPool, so với cách quét list tuyến tính.
+import argparse
+import os
+import random
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from cogs.anonymous_chat import MatchPool, PAIR_COOLDOWN, MATCH_TAG_GRACE  # noqa: E402
+
+
+class NaivePool:
+    """Cùng luật ghép với MatchPool nhưng làm thẳng: một list người chờ, mỗi lượt quét hết."""
+
+    def __init__(self, cooldown: float = PAIR_COOLDOWN, grace: float = MATCH_TAG_GRACE):
+        self.cooldown = cooldown
+        self.grace = grace
+        self.waiting: list = []  # (uid, tags, lang, since)
+        self.recent: dict = {}
+        self.stats = {"matched": 0, "by_tag": 0, "wait_total": 0.0}
+
+    def __len__(self) -> int:
+        return len(self.waiting)
+
+    def add(self, uid, tags=(), lang="vi", payload=None, now=None):
+        self.waiting = [w for w in self.waiting if w[0] != uid]
+        tags = frozenset(tags)
+        best, fallback = None, None
+        for i, (other, other_tags, other_lang, since) in enumerate(self.waiting):
+            if other_lang != lang or self.recent.get((min(uid, other), max(uid, other)), 0) > now:
+                continue
+            if tags & other_tags:
+                best = i
+                break
+            if fallback is None and (not other_tags or since <= now - self.grace):
+                fallback = i
+        pick = best if best is not None else fallback
+        if pick is None:
+            self.waiting.append((uid, tags, lang, now))
+            return None
+        other = self.waiting.pop(pick)
+        self.stats["matched"] += 1
+        self.stats["by_tag"] += best is not None
+        self.stats["wait_total"] += now - other[3]
+        return other[0], uid
+
+    def remember_pair(self, a, b, now=None):
+        self.recent[(min(a, b), max(a, b))] = now + self.cooldown
+
+
+def make_arrivals(args, rng: random.Random):
+    vocab = [f"tag{i}" for i in range(args.tags)]
+    weights = [1 / (i + 1) ** 0.5 for i in range(args.tags)]  # vài tag phổ biến, đuôi dài
+    population = args.waiting + args.users
+    arrivals = []
+    for n in range(args.waiting + args.users):
+        # một phần là người quay lại (dễ gặp lại cặp cũ -> cooldown)
+        uid = rng.randrange(population // 2) if rng.random() < args.returning else n
+        k = rng.choice((0, 1, 1, 2, 3))
+        tags = frozenset(rng.choices(vocab, weights, k=k))
+        lang = "en" if rng.random() < args.en_ratio else "vi"
+        arrivals.append((uid, tags, lang))
+    return arrivals
+
+
+def add(pool, uid, tags, lang, now):
+    # như cog: chỉ ghi cooldown sau khi cặp đã kết nối (ở đây luôn kết nối được)
+    match = pool.add(uid, tags, lang, now=now)
+    if match is not None:
+        partner = match[0]
+        pool.remember_pair(getattr(partner, "uid", partner), uid, now=now)
+
+
+def run(pool, arrivals, args):
+    now = 0.0
+    # đổ sẵn pool: thời điểm giả để thời gian chờ có nghĩa, không tính vào phần đo
+    for uid, tags, lang in arrivals[:args.waiting]:
+        add(pool, uid, tags, lang, now)
+    matched_before = pool.stats["matched"]
+    started = time.perf_counter()
+    for uid, tags, lang in arrivals[args.waiting:]:
+        now += args.interval
+        add(pool, uid, tags, lang, now)
+    elapsed = time.perf_counter() - started
+    return elapsed, pool.stats["matched"] - matched_before
+
+
+def report(name, pool, elapsed, matches, args):
+    st = pool.stats
+    print(f"{name}")
+    print(f"  lượt vào           {args.users} trong {elapsed * 1000:.1f} ms ({args.users / elapsed:,.0f}/s,"
+          f" {elapsed / args.users * 1e6:.2f} µs/lượt)")
+    print(f"  cặp ghép           {matches} ({matches / elapsed:,.0f} cặp/s) · theo tag {st['by_tag']}"
+          f" · chờ TB {st['wait_total'] / st['matched'] if st['matched'] else 0:.1f} s (giả lập)")
+    print(f"  còn trong pool     {len(pool)}")
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Benchmark offline cho MatchPool (/timban)")
+    ap.add_argument("--users", type=int, default=20000, help="số lượt vào pool được đo")
+    ap.add_argument("--waiting", type=int, default=5000, help="số người chờ sẵn trước khi đo")
+    ap.add_argument("--tags", type=int, default=2000, help="số tag khác nhau")
+    ap.add_argument("--en-ratio", type=float, default=0.2, help="tỉ lệ người chọn English")
+    ap.add_argument("--returning", type=float, default=0.3, help="tỉ lệ lượt là người cũ quay lại")
+    ap.add_argument("--interval", type=float, default=0.05, help="giây (giả lập) giữa hai lượt vào")
+    ap.add_argument("--no-naive", action="store_true", help="bỏ phần so sánh với list quét tuyến tính")
+    ap.add_argument("--seed", type=int, default=1)
+    args = ap.parse_args()
+
+    arrivals = make_arrivals(args, random.Random(args.seed))
+    pool = MatchPool()
+    report("MatchPool (hàng đợi + index tag)", pool, *run(pool, arrivals, args), args)
+    if not args.no_naive:
+        naive = NaivePool()
+        report("List quét tuyến tính", naive, *run(naive, arrivals, args), args)
+
+
+if __name__ == "__main__":
+    main()
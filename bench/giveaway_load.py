@@ -0,0 +1,329 @@
+# bench/giveaway_load.py
+# Load test offline cho GiveawayCog: không cần token, không ra mạng.
+#
+#   python bench/giveaway_load.py --users 5000 --latency 40 --rate-limit 0.02
+#
+# Bot thật + cog thật, chỉ thay HTTPClient.request bằng một REST giả (có độ
+# trễ và 429 giả lập) và Interaction bằng một stand-in ghi lại thời điểm ack.
+# Click đi đúng đường của Discord: custom_id -> GiveawayButton -> dispatch.
+import argparse
+import asyncio
+import os
+import random
+import re
+import shutil
+import sys
+import tempfile
+import time
+from collections import Counter
+from datetime import datetime, timezone
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import discord  # noqa: E402
+from discord.ext import commands  # noqa: E402
+
+BOT_ID = 900000000000000001
+CREATOR_ID = 900000000000000002
+GUILD_ID = 900000000000000003
+CHANNEL_ID = 900000000000000004
+USER_BASE = 800000000000000000
+
+
+# -------------------- Fake REST --------------------
+def _user_payload(uid: int, bot: bool = False) -> dict:
+    return {"id": str(uid), "username": f"user{uid % 100000}", "discriminator": "0", "global_name": None,
+            "avatar": None, "bot": bot}
+
+
+def _message_payload(channel_id: int, message_id: int) -> dict:
+    return {
+        "id": str(message_id), "channel_id": str(channel_id), "author": _user_payload(BOT_ID, bot=True),
+        "content": "", "timestamp": datetime.now(timezone.utc).isoformat(), "edited_timestamp": None,
+        "tts": False, "mention_everyone": False, "mentions": [], "mention_roles": [], "attachments": [],
+        "embeds": [], "pinned": False, "type": 0,
+    }
+
+
+class FakeREST:
+    """Thay cho HTTPClient.request: trả payload tối thiểu theo route, đếm mọi call."""
+
+    def __init__(self, latency: float, jitter: float, rate_limit: float, retry_after: float, rng: random.Random):
+        self.latency = latency
+        self.jitter = jitter
+        self.rate_limit = rate_limit
+        self.retry_after = retry_after
+        self.rng = rng
+        self.calls = Counter()     # "METHOD /path/template" -> số lần
+        self.limited = 0           # số lần dính 429 (đã chờ retry_after rồi gửi lại)
+        self._ids = iter(range(700000000000000000, 800000000000000000))
+
+    async def _wire(self):
+        await asyncio.sleep(max(0.0, self.latency + self.rng.uniform(-self.jitter, self.jitter)))
+
+    async def request(self, route, *, files=None, form=None, **kwargs):
+        key = f"{route.method} {route.path}"
+        self.calls[key] += 1
+        await self._wire()
+        # 429: discord.py tự ngủ retry_after rồi gửi lại, ở đây làm y như vậy
+        while self.rng.random() < self.rate_limit:
+            self.limited += 1
+            await asyncio.sleep(self.retry_after)
+            await self._wire()
+        return self._respond(route)
+
+    async def ack(self, kind: str):
+        # interaction callback cũng là một REST call
+        self.calls[f"POST /interactions/{{id}}/{{token}}/callback ({kind})"] += 1
+        await self._wire()
+
+    def _respond(self, route):
+        ids = [int(x) for x in re.findall(r"/(\d+)", route.url)]
+        path, method = route.path, route.method
+        if path == "/users/{user_id}":
+            return _user_payload(ids[0])
+        if path == "/users/@me/channels":
+            return {"id": str(next(self._ids)), "type": 1, "recipients": [], "last_message_id": None}
+        if path == "/channels/{channel_id}" and method == "GET":
+            return {"id": str(ids[0]), "type": 0, "guild_id": str(GUILD_ID), "name": "giveaway",
+                    "position": 0, "permission_overwrites": [], "nsfw": False}
+        if path == "/channels/{channel_id}/messages" and method == "POST":
+            return _message_payload(ids[0], next(self._ids))
+        if path == "/channels/{channel_id}/messages/{message_id}":
+            return _message_payload(ids[0], ids[1])
+        return {}
+
+    @property
+    def total(self) -> int:
+        return sum(self.calls.values())
+
+
+# -------------------- Fake Interaction --------------------
+class FakeResponse:
+    def __init__(self, interaction: "FakeInteraction"):
+        self._interaction = interaction
+        self._done = False
+
+    def is_done(self) -> bool:
+        return self._done
+
+    async def _ack(self, kind: str):
+        if self._done:
+            raise discord.InteractionResponded(self._interaction)
+        self._done = True
+        self._interaction.acked_at = time.perf_counter()
+        await self._interaction.rest.ack(kind)
+
+    async def defer(self, **kwargs):
+        await self._ack("defer")
+
+    async def send_message(self, *args, **kwargs):
+        await self._ack("message")
+
+    async def edit_message(self, *args, **kwargs):
+        await self._ack("update")
+
+    async def send_modal(self, modal):
+        await self._ack("modal")
+
+
+class FakeFollowup:
+    def __init__(self, rest: FakeREST):
+        self._rest = rest
+
+    async def send(self, *args, **kwargs):
+        self._rest.calls["POST /webhooks/{id}/{token}"] += 1
+        await self._rest._wire()
+
+
+class FakeInteraction:
+    """Chỉ những gì GiveawayCog dùng: user, client, channel, response."""
+
+    def __init__(self, bot: commands.Bot, rest: FakeREST, user_id: int, custom_id: str = ""):
+        self.client = bot
+        self.rest = rest
+        self.user = discord.User(state=bot._connection, data=_user_payload(user_id))
+        self.guild = None
+        self.channel_id = CHANNEL_ID
+        self.channel = bot.get_partial_messageable(CHANNEL_ID)
+        self.data = {"custom_id": custom_id, "component_type": 2}
+        self.response = FakeResponse(self)
+        self.followup = FakeFollowup(rest)
+        self.created_at = time.perf_counter()
+        self.acked_at: float = 0.0
+
+
+# -------------------- Event loop lag --------------------
+class LagMonitor:
+    """Đo thời gian loop bị chặn: ngủ ``tick`` giây, phần thức dậy trễ là bị block."""
+
+    def __init__(self, tick: float = 0.005):
+        self.tick = tick
+        self.blocked = 0.0
+        self.max_lag = 0.0
+        self.stalls = 0  # số lần trễ > 50ms
+        self._task = None
+
+    async def _run(self):
+        while True:
+            start = time.perf_counter()
+            await asyncio.sleep(self.tick)
+            lag = time.perf_counter() - start - self.tick
+            if lag > 0.001:
+                self.blocked += lag
+                self.max_lag = max(self.max_lag, lag)
+                self.stalls += lag > 0.05
+
+    def start(self):
+        self._task = asyncio.get_running_loop().create_task(self._run())
+
+    def stop(self):
+        if self._task:
+            self._task.cancel()
+
+
+# -------------------- Driver --------------------
+def _pct(values, p):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * p))]
+
+
+async def click(bot, rest, ack_times, user_id: int, custom_id: str):
+    GiveawayButton = sys.modules["cogs.giveaway"].GiveawayButton
+    interaction = FakeInteraction(bot, rest, user_id, custom_id)
+    match = re.fullmatch(GiveawayButton.__discord_ui_compiled_template__, custom_id)
+    item = await GiveawayButton.from_custom_id(interaction, None, match)
+    await item.callback(interaction)
+    if interaction.acked_at:
+        ack_times.append(interaction.acked_at - interaction.created_at)
+
+
+async def run(args):
+    workdir = tempfile.mkdtemp(prefix="gw-bench-")
+    os.chdir(workdir)
+    from cogs import db
+
+    rng = random.Random(args.seed)
+    rest = FakeREST(args.latency / 1000, args.jitter / 1000, args.rate_limit, args.retry_after / 1000, rng)
+    bot = commands.Bot(command_prefix="sc?", intents=discord.Intents.default())
+
+    async with bot:
+        bot.http.request = rest.request
+        await bot.load_extension("cogs.giveaway")
+        # load_extension tạo module mới trong sys.modules, phải lấy lại sau khi load
+        giveaway = sys.modules["cogs.giveaway"]
+        cog = bot.get_cog("GiveawayCog")
+        cog.updater.window = args.edit_window
+
+        journal_bytes = 0
+        append = giveaway.STORE._append_journal
+
+        def counting_append(lines):
+            nonlocal journal_bytes
+            journal_bytes += sum(len(line.encode()) + 1 for line in lines)
+            append(lines)
+
+        giveaway.STORE._append_journal = counting_append
+
+        checkpoint_bytes = 0
+        apply_journal = db.apply_giveaway_journal
+
+        async def counting_apply(lines):
+            nonlocal checkpoint_bytes
+            checkpoint_bytes += sum(len(line.encode()) + 1 for line in lines)
+            await apply_journal(lines)
+
+        db.apply_giveaway_journal = counting_apply
+
+        monitor = LagMonitor()
+        monitor.start()
+        started = time.perf_counter()
+        ack_times = []
+        clicks = 0
+
+        # setup: /scgiveaway rồi vài nút của người tạo
+        create = FakeInteraction(bot, rest, CREATOR_ID)
+        await cog.scgiveaway.callback(cog, create)
+        gid = next(iter(giveaway.STORE.of_creator(CREATOR_ID))).id
+        setup = ["plusday", "minusday", "plusday"] + ["pluswin"] * args.winners + ["minuswin", "start"]
+        for action in setup:
+            await click(bot, rest, ack_times, CREATOR_ID, f"{gid}|{action}")
+            clicks += 1
+
+        # join storm: users bấm Tham gia (một phần bấm lại / rời), chạy song song theo đợt
+        events = []
+        for i in range(args.users):
+            uid = USER_BASE + i
+            events.append((uid, "join"))
+            if rng.random() < args.duplicate_ratio:
+                events.append((uid, "join"))
+            if rng.random() < args.leave_ratio:
+                events.append((uid, "leave"))
+        sem = asyncio.Semaphore(args.concurrency)
+
+        async def one(uid, action):
+            async with sem:
+                await click(bot, rest, ack_times, uid, f"{gid}|{action}")
+
+        await asyncio.gather(*(one(uid, action) for uid, action in events))
+        clicks += len(events)
+
+        if args.end:
+            await click(bot, rest, ack_times, CREATOR_ID, f"{gid}|forceend")
+            clicks += 1
+            deadline = time.perf_counter() + 30
+            d = cog.dm_dispatcher.stats
+            while d["sent"] + d["closed"] + d["failed"] < min(args.winners, args.users) and time.perf_counter() < deadline:
+                await asyncio.sleep(0.05)
+
+        # chờ các edit embed đã gộp được gửi nốt
+        await asyncio.sleep(args.edit_window + 4 * args.latency / 1000 + 0.2)
+        elapsed = time.perf_counter() - started
+        monitor.stop()
+        await bot.unload_extension("cogs.giveaway")
+        await db.close_db()
+
+    db_bytes = sum(os.path.getsize(os.path.join("data", f)) for f in os.listdir("data") if f.startswith("bot.db"))
+    u = cog.updater.stats
+    if args.keep:
+        print(f"workdir            {workdir}")
+    else:
+        os.chdir(ROOT)
+        shutil.rmtree(workdir, ignore_errors=True)
+    print(f"clicks             {clicks} ({args.users} users, {elapsed:.2f}s, {clicks / elapsed:.0f}/s)")
+    print(f"ack latency        p50 {_pct(ack_times, 0.5) * 1000:.2f} ms · p99 {_pct(ack_times, 0.99) * 1000:.2f} ms"
+          f" · max {max(ack_times) * 1000:.2f} ms")
+    print(f"REST calls         {rest.total} ({rest.total / clicks:.3f}/click, 429: {rest.limited})")
+    for key, n in rest.calls.most_common():
+        print(f"  {n:>8}  {key}")
+    print(f"embed edits        requested {u['requested']} · sent {u['sent']} · coalesced {u['coalesced']}"
+          f" · unchanged {u['unchanged']} · failed {u['failed']}")
+    print(f"persistence        journal {journal_bytes} B ({journal_bytes / clicks:.1f} B/click)"
+          f" · checkpoint {checkpoint_bytes} B · sqlite file {db_bytes} B")
+    print(f"event loop         blocked {monitor.blocked * 1000:.1f} ms · max lag {monitor.max_lag * 1000:.2f} ms"
+          f" · stalls>50ms {monitor.stalls}")
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Offline load test cho GiveawayCog")
+    ap.add_argument("--users", type=int, default=5000)
+    ap.add_argument("--concurrency", type=int, default=200, help="số click xử lý song song")
+    ap.add_argument("--leave-ratio", type=float, default=0.1)
+    ap.add_argument("--duplicate-ratio", type=float, default=0.05, help="tỉ lệ bấm Tham gia lần 2")
+    ap.add_argument("--winners", type=int, default=3)
+    ap.add_argument("--latency", type=float, default=40.0, help="ms mỗi REST call")
+    ap.add_argument("--jitter", type=float, default=10.0, help="ms")
+    ap.add_argument("--rate-limit", type=float, default=0.0, help="xác suất một REST call dính 429")
+    ap.add_argument("--retry-after", type=float, default=250.0, help="ms chờ sau 429")
+    ap.add_argument("--edit-window", type=float, default=0.5, help="giây, thay EDIT_WINDOW cho lần chạy")
+    ap.add_argument("--end", action="store_true", help="kết thúc giveaway sau đợt join (quay thưởng + DM)")
+    ap.add_argument("--seed", type=int, default=1)
+    ap.add_argument("--keep", action="store_true", help="giữ lại thư mục tạm (DB + journal) để soi")
+    asyncio.run(run(ap.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,12 +1,643 @@
 import discord
 from discord.ext import commands, tasks
 from discord import app_commands
-from datetime import datetime, timedelta
+from datetime import datetime
+import asyncio
+import bisect
+import itertools
+import io
+import mimetypes
+import os
+import re
+import tempfile
+import time
+import unicodedata
 import zoneinfo
+from collections import OrderedDict, deque
+from typing import Optional
+
+import aiohttp
+
+# Pillow là phụ thuộc tuỳ chọn, cố ý không có trong requirements.txt:
+# cài thêm (pip install Pillow) thì sticker APNG được đổi sang GIF động,
+# không có thì APNG được gửi nguyên dạng PNG (ảnh tĩnh trên đa số client).
+try:
+    from PIL import Image
+except ImportError:
+    Image = None
+
+from cogs import db
+from cogs.utils import get_resolver, TimerHeap
 
 # Múi giờ Việt Nam
 VIETNAM_TZ = zoneinfo.ZoneInfo("Asia/Ho_Chi_Minh")
 
+SESSION_TIMEOUT = 5 * 60  # giây không nhắn thì phiên tự kết thúc
+SESSION_FLUSH_INTERVAL = 30  # giây, chu kỳ ghi last_message của các phiên xuống DB
+
+# ---- hàng đợi gửi ----
+OUTBOX_LIMIT = 20  # số tin chờ gửi tối đa mỗi chiều, đầy thì từ chối tin mới
+COALESCE_WINDOW = 3  # giây, các tin chữ liên tiếp cách nhau trong khoảng này được gộp
+COALESCE_MAX_CHARS = 4096  # giới hạn description của embed
+
+# ---- /timban (ghép ngẫu nhiên) ----
+MATCH_WAIT_TIMEOUT = 10 * 60  # giây chờ tối đa trong pool
+PAIR_COOLDOWN = 30 * 60  # giây trước khi cùng một cặp được ghép lại
+MATCH_SCAN = 50  # số người tối đa xét trong mỗi hàng đợi khi bỏ qua cặp đang cooldown
+MATCH_TAG_GRACE = 60  # giây người có sở thích chỉ chờ người chung sở thích, sau đó ghép với bất kỳ ai
+MATCH_MAX_TAGS = 5
+MATCH_LANGUAGES = {"vi": "Tiếng Việt", "en": "English"}
+
+# ---- lọc nội dung ----
+FILTER_MAX_STRIKES = 3  # số lần gửi nội dung cấm trước khi phiên bị kết thúc
+
+# mốc (ms) của histogram độ trễ relay
+LATENCY_BUCKETS_MS = (5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000)
+
+# ---- relay attachment ----
+ATTACHMENT_CONCURRENCY = 4  # số file tải về cùng lúc (chung mọi phiên)
+ATTACHMENT_SPOOL_SIZE = 2 * 1024 * 1024  # byte, file lớn hơn thì tràn xuống file tạm trên đĩa
+ATTACHMENT_CHUNK = 64 * 1024  # byte mỗi lần đọc từ CDN
+MESSAGE_BYTE_BUDGET = 25 * 1024 * 1024  # tổng byte tối đa relay cho một tin nhắn
+SESSION_BYTE_BUDGET = 200 * 1024 * 1024  # tổng byte tối đa relay cho cả phiên
+# gửi link CDN thay vì tải về rồi upload lại. Link chứa tên file gốc nên mặc định tắt.
+RELAY_BY_URL = False
+
+# ---- cache sticker ----
+STICKER_DIR = os.path.join("data", "stickers")
+STICKER_MEMORY_BYTES = 8 * 1024 * 1024  # tầng RAM (LRU)
+STICKER_DISK_BYTES = 64 * 1024 * 1024  # tầng đĩa, đầy thì xoá file dùng lâu nhất
+
+
+class LatencyHistogram:
+    """Histogram độ trễ theo các mốc cố định: O(log số mốc) mỗi lần ghi, không giữ mẫu."""
+
+    __slots__ = ("counts", "total", "sum_ms", "max_ms")
+
+    def __init__(self):
+        self.counts = [0] * (len(LATENCY_BUCKETS_MS) + 1)
+        self.total = 0
+        self.sum_ms = 0.0
+        self.max_ms = 0.0
+
+    def observe(self, seconds: float):
+        ms = seconds * 1000
+        self.counts[bisect.bisect_left(LATENCY_BUCKETS_MS, ms)] += 1
+        self.total += 1
+        self.sum_ms += ms
+        self.max_ms = max(self.max_ms, ms)
+
+    def merge(self, other: "LatencyHistogram"):
+        for i, n in enumerate(other.counts):
+            self.counts[i] += n
+        self.total += other.total
+        self.sum_ms += other.sum_ms
+        self.max_ms = max(self.max_ms, other.max_ms)
+
+    def percentile(self, p: float) -> float:
+        """Cận trên (ms) của mốc chứa phân vị p."""
+        if not self.total:
+            return 0.0
+        rank = p * self.total
+        seen = 0
+        for i, n in enumerate(self.counts):
+            seen += n
+            if seen >= rank:
+                return LATENCY_BUCKETS_MS[i] if i < len(LATENCY_BUCKETS_MS) else self.max_ms
+        return self.max_ms
+
+    def summary(self) -> str:
+        if not self.total:
+            return "Chưa có tin nhắn"
+        return (
+            f"{self.total} tin · TB {self.sum_ms / self.total:.0f} ms · "
+            f"p50 ≤{self.percentile(0.5):.0f} ms · p99 ≤{self.percentile(0.99):.0f} ms · max {self.max_ms:.0f} ms"
+        )
+
+
+def upload_limit(channel) -> int:
+    """Giới hạn upload mỗi file của kênh nhận (DM dùng mức mặc định của Discord)."""
+    guild = getattr(channel, "guild", None)
+    return guild.filesize_limit if guild is not None else discord.utils.DEFAULT_FILE_SIZE_LIMIT_BYTES
+
+
+def _is_text_only(message: discord.Message) -> bool:
+    return bool(message.content) and not message.attachments and not message.stickers
+
+
+class AttachmentRelay:
+    """Tải attachment về song song (có giới hạn) để upload lại cho người kia.
+
+    Mỗi file được đọc từng chunk vào ``SpooledTemporaryFile``: file nhỏ nằm
+    trong RAM, file lớn tràn xuống đĩa, nên vài video cùng lúc không làm
+    phình bộ nhớ. File được đổi tên chung chung để không lộ tên file gốc.
+    """
+
+    def __init__(self, http: discord.http.HTTPClient, concurrency: int = ATTACHMENT_CONCURRENCY):
+        self.http = http
+        self._sem = asyncio.Semaphore(concurrency)
+        self._session: Optional[aiohttp.ClientSession] = None
+        self.stats = {"files": 0, "bytes": 0, "spilled": 0, "linked": 0, "skipped": 0}
+
+    async def close(self):
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+
+    def plan(self, attachments, session: "AnonSession", limit: int):
+        """Chia attachment thành (tải về, gửi link, bỏ qua) theo giới hạn byte."""
+        download, links, skipped = [], [], []
+        used = 0
+        for attachment in attachments:
+            if RELAY_BY_URL:
+                links.append(attachment)
+                continue
+            size = attachment.size
+            if (
+                size > limit
+                or used + size > MESSAGE_BYTE_BUDGET
+                or session.bytes_relayed + size > SESSION_BYTE_BUDGET
+            ):
+                skipped.append(attachment)
+                continue
+            used += size
+            session.bytes_relayed += size
+            download.append(attachment)
+        self.stats["linked"] += len(links)
+        self.stats["skipped"] += len(skipped)
+        return download, links, skipped
+
+    async def fetch(self, attachments, session: "AnonSession", limit: int):
+        """Tải song song, trả về (files, lỗi). File lỗi được hoàn lại vào budget của phiên."""
+        results = await asyncio.gather(
+            *(self._download(a, i, limit) for i, a in enumerate(attachments, 1)),
+            return_exceptions=True,
+        )
+        files, failed = [], []
+        for attachment, result in zip(attachments, results):
+            if isinstance(result, discord.File):
+                files.append(result)
+            else:
+                failed.append(attachment)
+                session.bytes_relayed -= attachment.size
+        self.stats["skipped"] += len(failed)
+        return files, failed
+
+    async def _download(self, attachment: discord.Attachment, index: int, limit: int) -> discord.File:
+        if self._session is None:
+            self._session = aiohttp.ClientSession()
+        kwargs = {}
+        if self.http.proxy is not None:
+            kwargs["proxy"] = self.http.proxy
+        if self.http.proxy_auth is not None:
+            kwargs["proxy_auth"] = self.http.proxy_auth
+
+        async with self._sem:
+            buf = tempfile.SpooledTemporaryFile(max_size=ATTACHMENT_SPOOL_SIZE)
+            size = 0
+            try:
+                async with self._session.get(attachment.url, **kwargs) as resp:
+                    if resp.status != 200:
+                        raise discord.HTTPException(resp, "không tải được attachment")
+                    async for chunk in resp.content.iter_chunked(ATTACHMENT_CHUNK):
+                        size += len(chunk)
+                        # size khai báo có thể sai, chặn lại khi đang tải
+                        if size > limit:
+                            raise ValueError("attachment vượt giới hạn upload")
+                        buf.write(chunk)
+            except BaseException:
+                buf.close()
+                raise
+
+        self.stats["files"] += 1
+        self.stats["bytes"] += size
+        if size > ATTACHMENT_SPOOL_SIZE:
+            self.stats["spilled"] += 1
+        buf.seek(0)
+        ext = mimetypes.guess_extension((attachment.content_type or "").split(";")[0]) or ""
+        return discord.File(buf, filename=f"file{index}{ext}", spoiler=attachment.is_spoiler())
+
+
+class StickerCache:
+    """Cache sticker theo (ID, định dạng): LRU trong RAM, phía sau là thư mục trên đĩa.
+
+    Sticker chỉ tải từ CDN (và chuyển định dạng) một lần, các lần relay sau
+    lấy từ RAM hoặc đĩa. Nhiều người gửi cùng sticker một lúc thì chỉ có một
+    lần tải. Sticker Lottie (sticker chuẩn của Discord) không tải được nên
+    được gửi lại nguyên dạng sticker, ``get`` trả về ``None``.
+    """
+
+    # đuôi file thật của từng định dạng (APNG không có Pillow thì giữ nguyên PNG động)
+    _EXT = {
+        discord.StickerFormatType.png: "png",
+        discord.StickerFormatType.apng: "png",
+        discord.StickerFormatType.gif: "gif",
+    }
+
+    def __init__(self, directory: str = STICKER_DIR,
+                 memory_bytes: int = STICKER_MEMORY_BYTES, disk_bytes: int = STICKER_DISK_BYTES):
+        self.directory = directory
+        self.memory_limit = memory_bytes
+        self.disk_limit = disk_bytes
+        self._memory: "OrderedDict[str, tuple]" = OrderedDict()  # key -> (đuôi, bytes)
+        self.memory_bytes = 0
+        self._disk: Optional["OrderedDict[str, tuple]"] = None  # key -> (đuôi, size), quét lần đầu dùng
+        self.disk_bytes = 0
+        self._scan_lock = asyncio.Lock()  # chỉ một lượt quét thư mục dù nhiều sticker tải cùng lúc
+        self._inflight: dict = {}
+        # "shared": đi chung một lượt tải/đọc đĩa đang chạy, không tính là hit
+        self.stats = {"memory": 0, "disk": 0, "download": 0, "shared": 0, "converted": 0, "native": 0}
+
+    def summary(self) -> dict:
+        hits = self.stats["memory"] + self.stats["disk"]
+        lookups = hits + self.stats["download"]
+        return {
+            **self.stats,
+            "hit_rate": hits / lookups if lookups else 0.0,
+            "memory_items": len(self._memory),
+            "memory_bytes": self.memory_bytes,
+            "disk_items": len(self._disk or ()),
+            "disk_bytes": self.disk_bytes,
+        }
+
+    async def get(self, sticker: discord.StickerItem) -> Optional[discord.File]:
+        if sticker.format is discord.StickerFormatType.lottie:
+            self.stats["native"] += 1
+            return None
+        key = f"{sticker.id}-{sticker.format.value}"
+        entry = self._memory.get(key)
+        if entry is not None:
+            self._memory.move_to_end(key)
+            self.stats["memory"] += 1
+        else:
+            task = self._inflight.get(key)
+            if task is None:
+                task = self._inflight[key] = asyncio.ensure_future(self._load(key, sticker))
+                task.add_done_callback(lambda _: self._inflight.pop(key, None))
+            else:
+                self.stats["shared"] += 1
+            entry = await task
+        ext, data = entry
+        return discord.File(io.BytesIO(data), filename=f"{sticker.name}.{ext}")
+
+    async def _load(self, key: str, sticker: discord.StickerItem) -> tuple:
+        if self._disk is None:
+            async with self._scan_lock:
+                if self._disk is None:
+                    await asyncio.to_thread(self._scan)
+        if key in self._disk:
+            ext, _ = self._disk[key]
+            self._disk.move_to_end(key)
+            data = await asyncio.to_thread(self._read, key, ext)
+            self.stats["disk"] += 1
+        else:
+            data = await sticker.read()
+            ext = self._EXT.get(sticker.format, "png")
+            if sticker.format is discord.StickerFormatType.apng and Image is not None:
+                data = await asyncio.to_thread(self._apng_to_gif, data)
+                ext = "gif"
+                self.stats["converted"] += 1
+            self._disk[key] = (ext, len(data))
+            self.disk_bytes += len(data)
+            await asyncio.to_thread(self._write, key, ext, data, self._evict_disk())
+            self.stats["download"] += 1
+        self._remember(key, (ext, data))
+        return ext, data
+
+    def _remember(self, key: str, entry: tuple):
+        self._memory[key] = entry
+        self.memory_bytes += len(entry[1])
+        while self.memory_bytes > self.memory_limit and len(self._memory) > 1:
+            _, (_, old) = self._memory.popitem(last=False)
+            self.memory_bytes -= len(old)
+
+    def _evict_disk(self) -> list:
+        evicted = []
+        while self.disk_bytes > self.disk_limit and len(self._disk) > 1:
+            old_key, (old_ext, size) = self._disk.popitem(last=False)
+            self.disk_bytes -= size
+            evicted.append(self._path(old_key, old_ext))
+        return evicted
+
+    # ---------- tầng đĩa (chạy trong thread) ----------
+    def _path(self, key: str, ext: str) -> str:
+        return os.path.join(self.directory, f"{key}.{ext}")
+
+    def _scan(self):
+        os.makedirs(self.directory, exist_ok=True)
+        found = []
+        for entry in os.scandir(self.directory):
+            if entry.name.endswith(".tmp"):
+                # file ghi dở từ lần chạy trước (bot tắt giữa chừng)
+                os.remove(entry.path)
+                continue
+            key, _, ext = entry.name.rpartition(".")
+            st = entry.stat()
+            found.append((st.st_mtime, key, ext, st.st_size))
+        self._disk = OrderedDict((key, (ext, size)) for _, key, ext, size in sorted(found))
+        self.disk_bytes = sum(size for _, size in self._disk.values())
+
+    def _read(self, key: str, ext: str) -> bytes:
+        with open(self._path(key, ext), "rb") as f:
+            return f.read()
+
+    def _write(self, key: str, ext: str, data: bytes, evicted: list):
+        # ghi ra file tạm rồi đổi tên: không ai đọc được (hay quét lại được) file ghi dở
+        path = self._path(key, ext)
+        with open(path + ".tmp", "wb") as f:
+            f.write(data)
+        os.replace(path + ".tmp", path)
+        for path in evicted:
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+
+    @staticmethod
+    def _apng_to_gif(data: bytes) -> bytes:
+        out = io.BytesIO()
+        with Image.open(io.BytesIO(data)) as img:
+            img.save(out, format="GIF", save_all=True, loop=0, disposal=2)
+        return out.getvalue()
+
+
+def _fold_char(ch: str) -> str:
+    base = unicodedata.normalize("NFD", ch)[0]
+    return "d" if base == "đ" else base
+
+
+# bảng bỏ dấu từng ký tự (1 ký tự -> 1 ký tự) cho vùng chữ Latin có dấu,
+# nên vị trí trong văn bản đã bỏ dấu trùng với văn bản gốc
+_FOLD_TABLE = {
+    cp: _fold_char(chr(cp)) for cp in range(0xC0, 0x1F00)
+    if chr(cp).islower() and _fold_char(chr(cp)) != chr(cp)
+}
+
+
+def fold_text(text: str) -> str:
+    """Bỏ dấu văn bản đã viết thường (đ -> d): "đồ ngốc" -> "do ngoc", giữ nguyên độ dài."""
+    return text.translate(_FOLD_TABLE)
+
+
+class ContentFilter:
+    """Danh sách từ cấm gom vào một automaton Aho-Corasick.
+
+    Quét một tin là một lượt qua văn bản đã bỏ dấu, chi phí không phụ thuộc
+    số từ cấm. Một từ cấm khớp khi viết đúng dấu hoặc viết không dấu ("đồ
+    ngốc" bắt cả "do ngoc" nhưng "ngu" không bắt "ngủ"), và chỉ khi đứng
+    riêng (không nằm giữa một từ khác). Các regex được gộp thành một pattern
+    chạy trên văn bản viết thường. Đối tượng không đổi sau khi dựng: reload
+    là dựng cái mới rồi thay vào.
+    """
+
+    def __init__(self, words=(), regexes=()):
+        self._goto: list = [{}]  # state -> {ký tự: state}
+        self._fail: list = [0]
+        self._out: list = [()]  # state -> ((độ dài, dạng viết thường, pattern gốc), ...)
+        self.words = 0
+        for word in words:
+            self._add(word)
+        self._link()
+
+        valid = []
+        for pattern in regexes:
+            try:
+                re.compile(pattern)
+            except re.error:
+                continue
+            valid.append(f"(?:{pattern})")
+        self.regex = re.compile("|".join(valid)) if valid else None
+        self.regexes = len(valid)
+
+    def __len__(self) -> int:
+        return self.words + self.regexes
+
+    def _add(self, word: str):
+        exact = word.strip().lower()
+        key = fold_text(exact)
+        if not key:
+            return
+        state = 0
+        for ch in key:
+            nxt = self._goto[state].get(ch)
+            if nxt is None:
+                nxt = self._goto[state][ch] = len(self._goto)
+                self._goto.append({})
+                self._fail.append(0)
+                self._out.append(())
+            state = nxt
+        if all(e != exact for _, e, _ in self._out[state]):
+            self.words += 1
+            self._out[state] = self._out[state] + ((len(key), exact, word),)
+
+    def _link(self):
+        # BFS dựng fail link; output của state gồm cả output dọc theo fail link
+        queue = deque(self._goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for ch, nxt in self._goto[state].items():
+                queue.append(nxt)
+                f = self._fail[state]
+                while f and ch not in self._goto[f]:
+                    f = self._fail[f]
+                self._fail[nxt] = self._goto[f].get(ch, 0) if self._goto[f].get(ch) != nxt else 0
+                self._out[nxt] = self._out[nxt] + self._out[self._fail[nxt]]
+
+    def match(self, text: str) -> Optional[str]:
+        """Pattern cấm đầu tiên xuất hiện trong ``text`` (None nếu sạch)."""
+        lower = text.lower()
+        folded = fold_text(lower)
+        goto, fail, out = self._goto, self._fail, self._out
+        n = len(folded)
+        state = 0
+        for i, ch in enumerate(folded):
+            while state and ch not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(ch, 0)
+            for length, exact, word in out[state]:
+                start = i - length + 1
+                if start > 0 and folded[start - 1].isalnum() or i + 1 < n and folded[i + 1].isalnum():
+                    continue
+                typed = lower[start:i + 1]
+                # đúng dấu, hoặc người gửi gõ không dấu
+                if typed == exact or typed == folded[start:i + 1]:
+                    return word
+        if self.regex is not None:
+            m = self.regex.search(lower)
+            if m:
+                return m.group(0)
+        return None
+
+
+class MatchTicket:
+    __slots__ = ("uid", "tags", "lang", "since", "payload")
+
+    def __init__(self, uid: int, tags: frozenset, lang: str, since: float, payload=None):
+        self.uid = uid
+        self.tags = tags
+        self.lang = lang
+        self.since = since
+        self.payload = payload  # discord.User để mở DM khi ghép xong
+
+
+class MatchPool:
+    """Pool chờ ghép ngẫu nhiên cho /timban.
+
+    Mỗi ngôn ngữ có một hàng đợi FIFO (``OrderedDict``) và mỗi cặp
+    (ngôn ngữ, tag) có một hàng đợi riêng, nên thêm/xoá là O(1) và người
+    chờ lâu nhất luôn ở đầu. Người mới vào được ghép với người chờ lâu nhất
+    có chung tag; không có thì với người chờ lâu nhất cùng ngôn ngữ trong
+    số những người "mở" (không có tag, hoặc đã chờ quá ``MATCH_TAG_GRACE``
+    giây). Người có tag hết thời gian ân hạn thì gọi ``rematch`` để tự tìm
+    người mở. Cặp đã kết nối được ``remember_pair`` cooldown
+    ``PAIR_COOLDOWN`` giây để không gặp lại ngay.
+    """
+
+    def __init__(self, cooldown: float = PAIR_COOLDOWN, scan: int = MATCH_SCAN, grace: float = MATCH_TAG_GRACE):
+        self.cooldown = cooldown
+        self.scan = scan
+        self.grace = grace
+        self.waiting: dict = {}  # uid -> MatchTicket
+        self._by_lang: dict = {}  # lang -> OrderedDict[uid, ticket]
+        self._by_tag: dict = {}  # (lang, tag) -> OrderedDict[uid, ticket]
+        self._recent: dict = {}  # (uid nhỏ, uid lớn) -> hết cooldown lúc
+        self._recent_order: deque = deque()  # (hết cooldown, cặp) theo thứ tự thời gian
+        self.stats = {"matched": 0, "by_tag": 0, "wait_total": 0.0}
+
+    def __len__(self) -> int:
+        return len(self.waiting)
+
+    def __contains__(self, uid: int) -> bool:
+        return uid in self.waiting
+
+    def add(self, uid: int, tags=(), lang: str = "vi", payload=None, now: Optional[float] = None):
+        """Ghép ngay nếu được (trả về hai ticket: người chờ, người mới), không thì cho vào pool."""
+        now = time.time() if now is None else now
+        self.remove(uid)
+        ticket = MatchTicket(uid, frozenset(tags), lang, now, payload)
+        self._expire_recent(now)
+
+        partner, by_tag = None, False
+        for tag in ticket.tags:
+            candidate = self._oldest(self._by_tag.get((lang, tag)), uid)
+            if candidate is not None and (partner is None or candidate.since < partner.since):
+                partner, by_tag = candidate, True
+        if partner is None:
+            partner = self._oldest(self._by_lang.get(lang), uid, now - self.grace)
+        if partner is None:
+            self.requeue(ticket)
+            return None
+        return self._pair(partner, ticket, by_tag, now)
+
+    def rematch(self, uid: int, now: Optional[float] = None):
+        """Người chờ hết ân hạn: ghép với người mở chờ lâu nhất, không cần chung tag."""
+        now = time.time() if now is None else now
+        ticket = self.waiting.get(uid)
+        if ticket is None:
+            return None
+        self._expire_recent(now)
+        partner = self._oldest(self._by_lang.get(ticket.lang), uid, now - self.grace)
+        if partner is None:
+            return None
+        self.remove(uid)
+        return self._pair(partner, ticket, False, now)
+
+    def requeue(self, ticket: MatchTicket):
+        """Đưa ticket vào pool mà không ghép (giữ nguyên thời điểm bắt đầu chờ)."""
+        self.waiting[ticket.uid] = ticket
+        self._by_lang.setdefault(ticket.lang, OrderedDict())[ticket.uid] = ticket
+        for tag in ticket.tags:
+            self._by_tag.setdefault((ticket.lang, tag), OrderedDict())[ticket.uid] = ticket
+
+    def remember_pair(self, a: int, b: int, now: Optional[float] = None):
+        """Gọi sau khi hai người đã thật sự được kết nối."""
+        expires = (time.time() if now is None else now) + self.cooldown
+        pair = (min(a, b), max(a, b))
+        self._recent[pair] = expires
+        self._recent_order.append((expires, pair))
+
+    def _pair(self, partner: MatchTicket, ticket: MatchTicket, by_tag: bool, now: float):
+        self.remove(partner.uid)
+        self.stats["matched"] += 1
+        self.stats["by_tag"] += by_tag
+        self.stats["wait_total"] += now - min(partner.since, ticket.since)
+        return partner, ticket
+
+    def remove(self, uid: int) -> Optional[MatchTicket]:
+        ticket = self.waiting.pop(uid, None)
+        if ticket is None:
+            return None
+        self._discard(self._by_lang, ticket.lang, uid)
+        for tag in ticket.tags:
+            self._discard(self._by_tag, (ticket.lang, tag), uid)
+        return ticket
+
+    @staticmethod
+    def _discard(index: dict, key, uid: int):
+        queue = index.get(key)
+        if queue is not None:
+            queue.pop(uid, None)
+            if not queue:
+                del index[key]
+
+    def _oldest(self, queue, uid: int, open_before: Optional[float] = None) -> Optional[MatchTicket]:
+        """Người chờ lâu nhất trong hàng đợi mà không đang cooldown với ``uid``.
+
+        Có ``open_before`` thì người có tag phải vào pool trước mốc đó mới được chọn.
+        """
+        if not queue:
+            return None
+        for ticket in itertools.islice(queue.values(), self.scan):
+            if ticket.uid == uid or (open_before is not None and ticket.tags and ticket.since > open_before):
+                continue
+            if (min(uid, ticket.uid), max(uid, ticket.uid)) not in self._recent:
+                return ticket
+        return None
+
+    def _expire_recent(self, now: float):
+        order = self._recent_order
+        while order and order[0][0] <= now:
+            _, pair = order.popleft()
+            if self._recent.get(pair, 0) <= now:
+                self._recent.pop(pair, None)
+
+
+def parse_tags(text: Optional[str]) -> frozenset:
+    """``"game, Anime,  nhạc"`` -> {"game", "anime", "nhạc"} (tối đa MATCH_MAX_TAGS)."""
+    tags = [t.strip().lower() for t in (text or "").split(",")]
+    return frozenset([t for t in tags if t][:MATCH_MAX_TAGS])
+
+
+class AnonSession:
+    """Một phiên chat ẩn danh: hai user, DM channel của từng bên và thống kê relay.
+
+    Được tạo khi người nhận bấm Đồng ý (hoặc khôi phục từ DB) và dùng chung
+    cho cả hai phía, nên relay chỉ cần tra dict một lần rồi gửi thẳng vào
+    DM channel đã cache của người kia. Tin của mỗi người gửi đi qua một
+    hàng đợi riêng nên tới nơi đúng thứ tự.
+    """
+
+    __slots__ = (
+        "key", "channels", "last_message", "bytes_relayed", "latency",
+        "outbox", "workers", "throttled", "strikes",
+    )
+
+    def __init__(self, u1: int, u2: int, last_message: Optional[float] = None):
+        self.key = tuple(sorted((u1, u2)))
+        self.channels: dict = {}  # user_id -> DMChannel của user đó
+        self.last_message = last_message or time.time()
+        self.bytes_relayed = 0  # tính vào SESSION_BYTE_BUDGET
+        self.latency = LatencyHistogram()
+        # mỗi chiều (theo người gửi) có hàng đợi FIFO và một worker gửi riêng
+        self.outbox: dict = {}  # user_id -> deque[(message, perf_counter lúc nhận)]
+        self.workers: dict = {}  # user_id -> asyncio.Task
+        self.throttled: set = set()  # người gửi đã được báo hàng đợi đầy
+        self.strikes: dict = {}  # user_id -> số lần gửi nội dung cấm
+
+    def partner_of(self, user_id: int) -> int:
+        a, b = self.key
+        return b if user_id == a else a
+
 
 class ConfirmView(discord.ui.View):
     def __init__(self, cog, sender: discord.User, receiver: discord.User):
@@ -17,17 +648,8 @@ class ConfirmView(discord.ui.View):
 
     @discord.ui.button(label="Đồng ý ✅", style=discord.ButtonStyle.green)
     async def accept(self, interaction: discord.Interaction, button: discord.ui.Button):
-        self.cog.active_sessions[self.sender.id] = self.receiver.id
-        self.cog.active_sessions[self.receiver.id] = self.sender.id
-        key = tuple(sorted([self.sender.id, self.receiver.id]))
-        self.cog.last_message_time[key] = datetime.now(tz=VIETNAM_TZ)
-
-        try:
-            await self.sender.send("🔗 Bạn đã được kết nối! Hãy nhắn tin qua bot.")
-            await self.receiver.send("🔗 Bạn đã được kết nối! Hãy nhắn tin qua bot.")
-        except discord.Forbidden:
-            pass
-
+        if not await self.cog.connect(self.sender, self.receiver):
+            return await interaction.response.edit_message(content="⚠️ Một trong 2 bạn đã có phiên chat khác.", view=None)
         await interaction.response.edit_message(content="✅ Bạn đã chấp nhận!", view=None)
 
     @discord.ui.button(label="Từ chối ❌", style=discord.ButtonStyle.red)
@@ -42,12 +664,138 @@ class ConfirmView(discord.ui.View):
 class AnonymousChat(commands.Cog):
     def __init__(self, bot: commands.Bot):
         self.bot = bot
-        self.active_sessions = {}       # {user_id: partner_id}
-        self.last_message_time = {}     # {(user1, user2): datetime}
-        self.check_inactive_sessions.start()
+        self.resolver = get_resolver(bot)
+        self.sessions: dict = {}  # {user_id: AnonSession} — cả hai bên trỏ tới cùng một session
+        self.ended_latency = LatencyHistogram()  # gộp từ các phiên đã kết thúc
+        self.relay_stats = {"sent": 0, "coalesced": 0, "dropped": 0, "failed": 0}
+        self.filter = ContentFilter()
+        self.filter_stats = {"blocked": 0, "ended": 0}
+        self.attachments = AttachmentRelay(bot.http)
+        self.stickers = StickerCache()
+        self.expiry = TimerHeap(self._on_expire, label="phiên ẩn danh")
+        self.pool = MatchPool()
+        self.pool_expiry = TimerHeap(self._on_pool_timeout, label="pool /timban")
+        self._dirty: set = set()  # key của các phiên có last_message chưa ghi xuống DB
+        self._restore_task: Optional[asyncio.Task] = None
 
-    def cog_unload(self):
-        self.check_inactive_sessions.cancel()
+    async def cog_load(self):
+        # khôi phục các phiên chat còn lưu trong DB (DM channel mở lại khi cần)
+        await db.init_db()
+        await self.reload_filter()
+        sessions = [AnonSession(u1, u2, last) for u1, u2, last in await db.load_sessions()]
+        for session in sessions:
+            for uid in session.key:
+                self.sessions[uid] = session
+        self.expiry.schedule_many((s.key, s.last_message + SESSION_TIMEOUT) for s in sessions)
+        self.flush_sessions.start()
+        # phiên đã quá hạn trong lúc bot tắt sẽ hết hạn (và báo DM) ngay khi bot sẵn sàng
+        self._restore_task = asyncio.get_running_loop().create_task(self._start_expiry())
+
+    async def cog_unload(self):
+        if self._restore_task:
+            self._restore_task.cancel()
+        self.expiry.stop()
+        self.pool_expiry.stop()
+        self.flush_sessions.cancel()
+        await self._flush()
+        await self.attachments.close()
+
+    async def _start_expiry(self):
+        await self.bot.wait_until_ready()
+        self.expiry.start()
+        self.pool_expiry.start()
+
+    # ---------- sessions ----------
+    async def connect(self, first: discord.abc.User, second: discord.abc.User, note: str = "") -> bool:
+        """Tạo phiên cho hai người (sau khi đồng ý lời mời hoặc được /timban ghép)."""
+        if first.id in self.sessions or second.id in self.sessions:
+            return False
+        session = AnonSession(first.id, second.id)
+        # giữ chỗ cả hai ngay, trước await đầu tiên: lời mời/ghép khác chạy song song
+        # sẽ thấy họ đã có phiên thay vì cùng qua được bước kiểm tra ở trên
+        self.add_session(session)
+        # mở DM channel một lần, các lần relay sau gửi thẳng vào channel này
+        for user in (first, second):
+            self.pool.remove(user.id)
+            self.pool_expiry.cancel(user.id)
+            self.pool_expiry.cancel(("grace", user.id))
+            try:
+                session.channels.setdefault(user.id, user.dm_channel or await user.create_dm())
+            except discord.HTTPException:
+                pass
+        await db.save_session(*session.key, session.last_message)
+
+        text = "🔗 Bạn đã được kết nối! Hãy nhắn tin qua bot." + note
+        await asyncio.gather(*(self._notify(session, user.id, text) for user in (first, second)))
+        return True
+
+    def add_session(self, session: AnonSession):
+        for uid in session.key:
+            self.sessions[uid] = session
+        self.expiry.schedule(session.key, session.last_message + SESSION_TIMEOUT)
+
+    def remove_session(self, session: AnonSession):
+        for uid in session.key:
+            if self.sessions.get(uid) is session:
+                del self.sessions[uid]
+        self.expiry.cancel(session.key)
+        self._dirty.discard(session.key)
+        # tin còn chờ gửi bị huỷ cùng phiên
+        for task in session.workers.values():
+            if task is not asyncio.current_task():
+                task.cancel()
+        session.outbox.clear()
+        self.ended_latency.merge(session.latency)
+
+    def _touch(self, session: AnonSession):
+        # chỉ đánh dấu; hẹn giờ hết hạn được dời lại lúc nó tới hạn (xem _on_expire)
+        session.last_message = time.time()
+        self._dirty.add(session.key)
+
+    async def _on_expire(self, key: tuple):
+        session = self.sessions.get(key[0])
+        if session is None or session.key != key:
+            return
+        due = session.last_message + SESSION_TIMEOUT
+        if due > time.time():
+            # có tin nhắn mới từ lần hẹn trước: hẹn lại, không cần quét
+            self.expiry.schedule(key, due)
+            return
+        self.remove_session(session)
+        await db.delete_session(*key)
+
+        ended = datetime.now(tz=VIETNAM_TZ).strftime("%H:%M:%S")
+        text = f"⏰ Phiên chat đã kết thúc do không hoạt động {SESSION_TIMEOUT // 60} phút ({ended})"
+        await asyncio.gather(*(self._notify(session, uid, text) for uid in key))
+
+    async def _notify(self, session: AnonSession, user_id: int, text: str):
+        try:
+            channel = await self._channel_for(session, user_id)
+            await channel.send(text)
+        except discord.HTTPException:
+            pass
+
+    async def _flush(self):
+        if not self._dirty:
+            return
+        rows = []
+        for key in self._dirty:
+            session = self.sessions.get(key[0])
+            if session is not None and session.key == key:
+                rows.append((*key, session.last_message))
+        self._dirty.clear()
+        await db.touch_sessions(rows)
+
+    @tasks.loop(seconds=SESSION_FLUSH_INTERVAL)
+    async def flush_sessions(self):
+        await self._flush()
+
+    async def _channel_for(self, session: AnonSession, user_id: int) -> discord.DMChannel:
+        channel = session.channels.get(user_id)
+        if channel is None:
+            user = await self.resolver.user(user_id)
+            channel = session.channels[user_id] = user.dm_channel or await user.create_dm()
+        return channel
 
     # ===== SLASH COMMAND nhantinan =====
     @app_commands.command(name="nhantinan", description="Kết nối ẩn danh với người khác")
@@ -61,7 +809,7 @@ class AnonymousChat(commands.Cog):
             return await interaction.response.send_message(
                 "❌ Không thể nhắn tin với bot.", ephemeral=True
             )
-        if interaction.user.id in self.active_sessions or user.id in self.active_sessions:
+        if interaction.user.id in self.sessions or user.id in self.sessions:
             return await interaction.response.send_message(
                 "⚠️ Một trong 2 bạn đã có phiên chat.", ephemeral=True
             )
@@ -82,85 +830,354 @@ class AnonymousChat(commands.Cog):
                 "❌ Không thể gửi DM đến người này.", ephemeral=True
             )
 
+    # ===== SLASH COMMAND timban =====
+    @app_commands.command(name="timban", description="Ghép ngẫu nhiên với một người lạ để chat ẩn danh")
+    @app_commands.describe(
+        so_thich="Sở thích, cách nhau bởi dấu phẩy (vd: game, anime, nhạc)",
+        ngon_ngu="Ngôn ngữ muốn trò chuyện",
+    )
+    @app_commands.choices(ngon_ngu=[app_commands.Choice(name=v, value=k) for k, v in MATCH_LANGUAGES.items()])
+    async def timban(self, interaction: discord.Interaction, so_thich: Optional[str] = None,
+                     ngon_ngu: Optional[app_commands.Choice[str]] = None):
+        if interaction.user.id in self.sessions:
+            return await interaction.response.send_message(
+                "⚠️ Bạn đang có phiên chat, dùng `/endcall` trước.", ephemeral=True
+            )
+        tags = parse_tags(so_thich)
+        match = self.pool.add(interaction.user.id, tags, ngon_ngu.value if ngon_ngu else "vi", payload=interaction.user)
+        if match is None:
+            self._schedule_wait(self.pool.waiting[interaction.user.id])
+            return await interaction.response.send_message(
+                f"🔎 Đang tìm người phù hợp... ({len(self.pool)} người đang chờ). "
+                f"Bot sẽ nhắn bạn khi ghép xong, dùng `/huytimban` để huỷ.",
+                ephemeral=True,
+            )
+
+        await interaction.response.send_message("✅ Đã tìm thấy người trò chuyện, kiểm tra DM nhé!", ephemeral=True)
+        await self._pair(*match)
+
+    def _schedule_wait(self, ticket: MatchTicket):
+        self.pool_expiry.schedule(ticket.uid, ticket.since + MATCH_WAIT_TIMEOUT)
+        if ticket.tags:
+            # hết ân hạn mà chưa ai chung tag thì tự tìm người mở
+            self.pool_expiry.schedule(("grace", ticket.uid), ticket.since + self.pool.grace)
+
+    async def _pair(self, waiting: MatchTicket, ticket: MatchTicket):
+        for t in (waiting, ticket):
+            self.pool_expiry.cancel(t.uid)
+            self.pool_expiry.cancel(("grace", t.uid))
+        shared = waiting.tags & ticket.tags
+        note = f"\n🏷️ Sở thích chung: {', '.join(sorted(shared))}" if shared else ""
+        if await self.connect(waiting.payload, ticket.payload, note):
+            self.pool.remember_pair(waiting.uid, ticket.uid)
+            return
+        # một trong hai vừa vào phiên khác: ai còn rảnh thì chờ tiếp, không ghép lại ngay
+        for t in (waiting, ticket):
+            if t.uid not in self.sessions and t.uid not in self.pool:
+                self.pool.requeue(t)
+                self._schedule_wait(t)
+
+    @app_commands.command(name="huytimban", description="Rời hàng chờ ghép ngẫu nhiên")
+    async def huytimban(self, interaction: discord.Interaction):
+        if self.pool.remove(interaction.user.id) is None:
+            return await interaction.response.send_message("❌ Bạn không ở trong hàng chờ.", ephemeral=True)
+        self.pool_expiry.cancel(interaction.user.id)
+        self.pool_expiry.cancel(("grace", interaction.user.id))
+        await interaction.response.send_message("✅ Đã rời hàng chờ.", ephemeral=True)
+
+    async def _on_pool_timeout(self, uid):
+        if isinstance(uid, tuple):
+            match = self.pool.rematch(uid[1])
+            if match is not None:
+                await self._pair(*match)
+            return
+        ticket = self.pool.remove(uid)
+        if ticket is None:
+            return
+        self.pool_expiry.cancel(("grace", uid))
+        try:
+            await ticket.payload.send(
+                f"⌛ Chưa tìm được người phù hợp sau {MATCH_WAIT_TIMEOUT // 60} phút. Hãy thử lại `/timban`."
+            )
+        except discord.HTTPException:
+            pass
+
     # ===== SLASH COMMAND endcall =====
     @app_commands.command(name="endcall", description="Kết thúc phiên chat ẩn danh")
     async def endcall(self, interaction: discord.Interaction):
-        if interaction.user.id not in self.active_sessions:
+        session = self.sessions.get(interaction.user.id)
+        if session is None:
             return await interaction.response.send_message(
                 "❌ Bạn không có phiên chat.", ephemeral=True
             )
 
-        partner_id = self.active_sessions.pop(interaction.user.id)
-        self.active_sessions.pop(partner_id, None)
-        key = tuple(sorted([interaction.user.id, partner_id]))
-        self.last_message_time.pop(key, None)
+        partner_id = session.partner_of(interaction.user.id)
+        self.remove_session(session)
+        await db.delete_session(*session.key)
 
         # Gửi interaction response trước
         await interaction.response.send_message("✅ Phiên chat đã kết thúc.", ephemeral=True)
 
         # Sau đó gửi DM cho cả 2 bên
         try:
-            partner = await self.bot.fetch_user(partner_id)
-            await partner.send("⚠️ Người kia đã kết thúc phiên chat.")
+            partner_channel = await self._channel_for(session, partner_id)
+            await partner_channel.send("⚠️ Người kia đã kết thúc phiên chat.")
             await interaction.user.send("⚠️ Bạn đã kết thúc phiên chat.")
-        except discord.Forbidden:
+        except discord.HTTPException:
             pass
 
     # ===== RELAY MESSAGES (text, image, video, emoji, sticker) =====
     @commands.Cog.listener()
     async def on_message(self, message: discord.Message):
-        if message.author.bot:
+        # chặn sớm: chỉ DM của người đang trong phiên mới đi tiếp
+        if message.guild is not None or message.author.bot:
+            return
+        session = self.sessions.get(message.author.id)
+        if session is None:
             return
 
-        if not message.guild and message.author.id in self.active_sessions:
-            partner_id = self.active_sessions[message.author.id]
-            partner = await self.bot.fetch_user(partner_id)
-            key = tuple(sorted([message.author.id, partner_id]))
-            self.last_message_time[key] = datetime.now(tz=VIETNAM_TZ)
+        self._touch(session)
+        uid = message.author.id
+        if message.content and self.filter.match(message.content) is not None:
+            return await self._strike(session, uid)
+        outbox = session.outbox.setdefault(uid, deque())
+        if len(outbox) >= OUTBOX_LIMIT:
+            # người kia nhận chậm (DM bị rate limit): từ chối tin mới, chỉ báo một lần
+            self.relay_stats["dropped"] += 1
+            if uid not in session.throttled:
+                session.throttled.add(uid)
+                await self._notify(session, uid, "⏳ Bạn gửi quá nhanh, người kia chưa nhận kịp. Tin vừa rồi chưa được chuyển, hãy chờ một chút.")
+            return
+        outbox.append((message, time.perf_counter()))
+        worker = session.workers.get(uid)
+        if worker is None or worker.done():
+            session.workers[uid] = asyncio.get_running_loop().create_task(self._drain(session, uid))
+
+    async def _strike(self, session: AnonSession, uid: int):
+        self.filter_stats["blocked"] += 1
+        strikes = session.strikes[uid] = session.strikes.get(uid, 0) + 1
+        if strikes < FILTER_MAX_STRIKES:
+            return await self._notify(
+                session, uid,
+                f"🚫 Tin nhắn chứa nội dung bị cấm và không được chuyển (cảnh cáo {strikes}/{FILTER_MAX_STRIKES}).",
+            )
+        self.filter_stats["ended"] += 1
+        self.remove_session(session)
+        await db.delete_session(*session.key)
+        await asyncio.gather(
+            self._notify(session, uid, "🚫 Phiên chat đã bị kết thúc vì bạn gửi nội dung bị cấm nhiều lần."),
+            self._notify(session, session.partner_of(uid), "🚫 Phiên chat đã bị kết thúc do người kia vi phạm quy định."),
+        )
+
+    async def _drain(self, session: AnonSession, uid: int):
+        """Worker của một chiều: gửi lần lượt theo thứ tự, gộp các tin chữ liên tiếp."""
+        outbox = session.outbox[uid]
+        while outbox:
+            batch = [outbox.popleft()]
+            if _is_text_only(batch[0][0]):
+                first = batch[0][0]
+                size = len(first.content)
+                while outbox and _is_text_only(outbox[0][0]):
+                    nxt = outbox[0][0]
+                    if (nxt.created_at - first.created_at).total_seconds() > COALESCE_WINDOW:
+                        break
+                    if size + 1 + len(nxt.content) > COALESCE_MAX_CHARS:
+                        break
+                    size += 1 + len(nxt.content)
+                    batch.append(outbox.popleft())
+            try:
+                await self._relay(session, batch)
+            except Exception as e:
+                self.relay_stats["failed"] += 1
+                print(f"❌ Lỗi relay ẩn danh: {e}")
+            if len(outbox) <= OUTBOX_LIMIT // 2:
+                session.throttled.discard(uid)
 
-            embed = discord.Embed(color=discord.Color.blurple())
-            embed.set_author(name="💬 Tin nhắn Ẩn danh")
-            embed.set_footer(text=f"⏰ {message.created_at.astimezone(VIETNAM_TZ).strftime('%H:%M:%S - %d/%m/%Y')}")
+    async def _relay(self, session: AnonSession, batch: list):
+        message = batch[-1][0]
+        sender_id = message.author.id
+        partner_id = session.partner_of(sender_id)
 
-            if message.content:
-                embed.description = message.content
+        embed = discord.Embed(color=discord.Color.blurple())
+        embed.set_author(name="💬 Tin nhắn Ẩn danh")
+        embed.set_footer(text=f"⏰ {message.created_at.astimezone(VIETNAM_TZ).strftime('%H:%M:%S - %d/%m/%Y')}")
 
-            files = []
+        text = "\n".join(m.content for m, _ in batch if m.content)
+        if text:
+            embed.description = text
 
+        files, links, skipped, native = [], [], [], []
+        try:
+            channel = await self._channel_for(session, partner_id)
             # Attachments (image/video)
-            for attachment in message.attachments:
-                if attachment.content_type and attachment.content_type.startswith(("image/", "video/")):
-                    files.append(await attachment.to_file())
+            media = [
+                a for a in message.attachments
+                if a.content_type and a.content_type.startswith(("image/", "video/"))
+            ]
+            limit = upload_limit(channel)
+            download, links, skipped = self.attachments.plan(media, session, limit)
+            files, failed = await self.attachments.fetch(download, session, limit)
+            skipped += failed
 
-            # Stickers
+            # Stickers: lấy từ cache, Lottie thì gửi lại nguyên sticker
             for sticker in message.stickers:
-                sticker_bytes = await sticker.read()
-                files.append(discord.File(fp=sticker_bytes, filename=f"{sticker.name}.png"))
+                file = await self.stickers.get(sticker)
+                if file is None:
+                    native.append(sticker)
+                else:
+                    files.append(file)
 
-            try:
-                await partner.send(embed=embed if embed.description else None, files=files if files else None)
-            except:
-                await message.author.send("❌ Không thể gửi nội dung đến người kia.")
-
-    # ===== AUTO TIMEOUT =====
-    @tasks.loop(minutes=1)
-    async def check_inactive_sessions(self):
-        now = datetime.now(tz=VIETNAM_TZ)
-        timeout = timedelta(minutes=5)
-        expired = [k for k, t in self.last_message_time.items() if now - t > timeout]
-
-        for u1, u2 in expired:
-            self.active_sessions.pop(u1, None)
-            self.active_sessions.pop(u2, None)
-            self.last_message_time.pop((u1, u2), None)
-
-            for uid in [u1, u2]:
+            content = "\n".join(a.proxy_url for a in links) or None
+            if embed.description or files or content or native:
+                await channel.send(
+                    content=content,
+                    embed=embed if embed.description else None,
+                    files=files or None,
+                    stickers=native or None,
+                )
+        except discord.Forbidden:
+            self.relay_stats["failed"] += len(batch)
+            await self._notify(session, sender_id, "❌ Người kia đã tắt DM hoặc chặn bot, tin nhắn không được chuyển.")
+        except discord.HTTPException:
+            self.relay_stats["failed"] += len(batch)
+            await self._notify(session, sender_id, "❌ Không thể gửi nội dung đến người kia.")
+        else:
+            done = time.perf_counter()
+            for _, started in batch:
+                session.latency.observe(done - started)
+            self.relay_stats["sent"] += 1
+            self.relay_stats["coalesced"] += len(batch) - 1
+            if skipped:
+                await self._notify(session, sender_id, f"⚠️ {len(skipped)} tệp không gửi được (quá giới hạn dung lượng hoặc lỗi tải).")
+        finally:
+            for f in files:
+                f.close()
+                f.fp.close()
+
+    # ===== OWNER: thống kê relay =====
+    @commands.command(name="anonstats")
+    @commands.is_owner()
+    async def anonstats(self, ctx):
+        live = {id(s): s for s in self.sessions.values()}.values()
+        total = LatencyHistogram()
+        total.merge(self.ended_latency)
+        embed = discord.Embed(title="📈 Relay ẩn danh", color=discord.Color.blurple())
+        # không hiện ID người dùng, chỉ đánh số phiên
+        busiest = sorted(live, key=lambda s: s.latency.total, reverse=True)
+        for i, session in enumerate(busiest):
+            total.merge(session.latency)
+            if i < 10:
+                embed.add_field(name=f"Phiên #{i + 1}", value=session.latency.summary(), inline=False)
+        embed.description = f"Đang mở: {len(busiest)} phiên\nTổng: {total.summary()}"
+        ps = self.pool.stats
+        embed.add_field(
+            name="🎲 /timban",
+            value=(
+                f"Đang chờ: {len(self.pool)} · Đã ghép: {ps['matched']} (theo sở thích {ps['by_tag']})\n"
+                f"Chờ TB: {ps['wait_total'] / ps['matched'] if ps['matched'] else 0:.0f} s"
+            ),
+            inline=False,
+        )
+        st = self.attachments.stats
+        rs = self.relay_stats
+        embed.add_field(
+            name="📨 Hàng đợi gửi",
+            value=f"Đã gửi: {rs['sent']} lần · Gộp: {rs['coalesced']} tin · Từ chối (đầy): {rs['dropped']} · Lỗi: {rs['failed']}",
+            inline=False,
+        )
+        embed.add_field(
+            name="📎 Attachment",
+            value=(
+                f"Đã relay: {st['files']} file ({st['bytes'] / 1048576:.1f} MB, {st['spilled']} tràn xuống đĩa)\n"
+                f"Gửi link: {st['linked']} · Bỏ qua: {st['skipped']}"
+            ),
+            inline=False,
+        )
+        sk = self.stickers.summary()
+        embed.add_field(
+            name="🏷️ Sticker cache",
+            value=(
+                f"Hit rate: {sk['hit_rate']:.1%} (RAM {sk['memory']} · đĩa {sk['disk']} · tải {sk['download']}"
+                f" · chờ chung {sk['shared']})\n"
+                f"RAM: {sk['memory_items']} sticker, {sk['memory_bytes'] / 1024:.0f} KB\n"
+                f"Đĩa: {sk['disk_items']} sticker, {sk['disk_bytes'] / 1024:.0f} KB\n"
+                f"Chuyển GIF: {sk['converted']} · Gửi nguyên sticker: {sk['native']}"
+            ),
+            inline=False,
+        )
+        await ctx.send(embed=embed)
+
+
+    # ===== OWNER: bộ lọc nội dung =====
+    async def reload_filter(self):
+        """Dựng lại automaton từ DB (trong thread) rồi thay bộ lọc đang dùng."""
+        rows = await db.list_filter_patterns()
+        words = [p for p, is_regex in rows if not is_regex]
+        regexes = [p for p, is_regex in rows if is_regex]
+        self.filter = await asyncio.to_thread(ContentFilter, words, regexes)
+
+    @commands.command(name="filteradd")
+    @commands.is_owner()
+    async def filteradd(self, ctx, *patterns: str):
+        """Thêm từ cấm (``re:`` ở đầu là regex), hoặc đính kèm file .txt mỗi dòng một pattern."""
+        lines = list(patterns)
+        for attachment in ctx.message.attachments:
+            lines += (await attachment.read()).decode("utf-8", "ignore").splitlines()
+        rows, invalid = [], []
+        for line in lines:
+            line = line.strip()
+            if not line:
+                continue
+            if line.startswith("re:"):
                 try:
-                    user = await self.bot.fetch_user(uid)
-                    await user.send(f"⏰ Phiên chat đã kết thúc do không hoạt động 5 phút ({now.strftime('%H:%M:%S')})")
-                except discord.Forbidden:
-                    pass
+                    re.compile(line[3:])
+                except re.error:
+                    invalid.append(line)
+                    continue
+                rows.append((line[3:], True))
+            else:
+                rows.append((line, False))
+        if not rows:
+            return await ctx.send("❌ Cú pháp: `sc?filteradd <từ> [từ ...]`, `re:<regex>` hoặc đính kèm file .txt.")
+        added = await db.add_filter_patterns(rows, added_by=ctx.author.id)
+        await self.reload_filter()
+        msg = f"✅ Đã thêm {added} pattern (bỏ qua {len(rows) - added} trùng). Bộ lọc: {len(self.filter)} pattern."
+        if invalid:
+            msg += f"\n⚠️ Regex lỗi: {', '.join(f'`{p}`' for p in invalid[:10])}"
+        await ctx.send(msg)
+
+    @commands.command(name="filterdel")
+    @commands.is_owner()
+    async def filterdel(self, ctx, *, pattern: str):
+        pattern = pattern[3:] if pattern.startswith("re:") else pattern
+        if not await db.remove_filter_pattern(pattern):
+            return await ctx.send("⚠️ Không có pattern này trong bộ lọc.")
+        await self.reload_filter()
+        await ctx.send(f"🗑️ Đã xoá. Bộ lọc: {len(self.filter)} pattern.")
+
+    @commands.command(name="filterlist")
+    @commands.is_owner()
+    async def filterlist(self, ctx):
+        rows = await db.list_filter_patterns()
+        shown = "\n".join(f"`{'re:' if is_regex else ''}{p}`" for p, is_regex in rows[-30:])
+        embed = discord.Embed(
+            title="🚫 Bộ lọc chat ẩn danh",
+            description=shown or "Chưa có pattern nào.",
+            color=discord.Color.red(),
+        )
+        embed.set_footer(
+            text=f"{self.filter.words} từ · {self.filter.regexes} regex · "
+                 f"đã chặn {self.filter_stats['blocked']} tin · kết thúc {self.filter_stats['ended']} phiên"
+        )
+        await ctx.send(embed=embed)
+
+    @commands.command(name="filterreload")
+    @commands.is_owner()
+    async def filterreload(self, ctx):
+        started = time.perf_counter()
+        await self.reload_filter()
+        await ctx.send(f"🔄 Đã nạp lại {len(self.filter)} pattern ({(time.perf_counter() - started) * 1000:.0f} ms).")
 
 
 async def setup(bot: commands.Bot):
-    await bot.add_cog(AnonymousChat(bot))
\ No newline at end of file
+    await bot.add_cog(AnonymousChat(bot))
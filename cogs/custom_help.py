@@ -21,6 +21,8 @@ class HelpCog(commands.Cog):
         member_embed.add_field(
             name="💬 Anonymous Chat",
             value="`/nhantinan <user>` - Gửi lời mời chat ẩn danh\n"
+                  "`/timban [sở thích] [ngôn ngữ]` - Ghép ngẫu nhiên với người lạ\n"
+                  "`/huytimban` - Rời hàng chờ ghép\n"
                   "`/endcall` - Kết thúc phiên chat",
             inline=False
         )
@@ -28,7 +30,11 @@ class HelpCog(commands.Cog):
         member_embed.add_field(
             name="🎉 Giveaway",
             value="`/scgiveaway` - Tạo giveaway mới và mở menu setup\n"
-                  "`/scgiveawaycheck <ID>` - Xem danh sách người tham gia giveaway theo ID",
+                  "`/scgiveawaycheck <ID>` - Xem danh sách người tham gia giveaway theo ID\n"
+                  "`/scgiveawaylist` - Xem các giveaway đang có trong kênh\n"
+                  "`/scgiveawayhistory [user]` - Xem các giveaway đã kết thúc\n"
+                  "`/scgiveawayreport <ID>` - Báo cáo gửi DM cho người thắng (người tạo)\n"
+                  "`/reroll <ID> [count]` - Quay lại người thắng (người tạo)",
             inline=False
         )
 
@@ -70,7 +76,14 @@ class HelpCog(commands.Cog):
         admin_embed.add_field(
             name="🔧 Admin Commands",
             value="`sc?status` - Đổi trạng thái bot\n"
-                  "`sc?owner` - Menu quản trị Admin Bot (Reset DB, Thống kê, Test, ...)",
+                  "`sc?owner` - Menu quản trị Admin Bot (Reset DB, Thống kê, Test, ...)\n"
+                  "`sc?gwstats` - Thống kê hiệu năng giveaway (edit embed, hẹn giờ)\n"
+                  "`sc?cachestats` - Thống kê cache user/channel dùng chung\n"
+                  "`sc?anonstats` - Thống kê độ trễ relay chat ẩn danh\n"
+                  "`sc?filteradd` / `sc?filterdel` / `sc?filterlist` / `sc?filterreload` - Bộ lọc từ cấm chat ẩn danh\n"
+                  "`sc?addtick @user [global]` / `sc?xoatick @user [global]` - Thêm/xoá tick verified "
+                  "(mặc định chỉ server hiện tại; `global` = mọi server, chỉ owner)\n"
+                  "`sc?checktick` - Danh sách verified (phân trang) · `sc?tickaudit [@user]` - Lịch sử tick",
             inline=False
         )
         admin_embed.set_footer(
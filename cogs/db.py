@@ -0,0 +1,614 @@
+# cogs/db.py
+# Lớp lưu trữ SQLite dùng chung cho các cog (không phải extension, main.py bỏ qua file này).
+# Mọi truy vấn chạy trên MỘT thread riêng để không chặn event loop và để
+# connection sqlite3 chỉ bị dùng bởi đúng một thread.
+import asyncio
+import base64
+import json
+import os
+import sqlite3
+import time
+from array import array
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional, Tuple
+
+DB_FILE = os.path.join("data", "bot.db")
+
+_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="sqlite")
+_conn: Optional[sqlite3.Connection] = None
+_init_lock = asyncio.Lock()
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS meta (
+    key   TEXT PRIMARY KEY,
+    value TEXT
+);
+
+CREATE TABLE IF NOT EXISTS giveaways (
+    id          TEXT PRIMARY KEY,
+    creator_id  INTEGER NOT NULL,
+    channel_id  INTEGER,
+    message_id  INTEGER,
+    reward      TEXT NOT NULL,
+    days        INTEGER NOT NULL,
+    hour        INTEGER NOT NULL,
+    minute      INTEGER NOT NULL,
+    num_winners INTEGER NOT NULL,
+    end_time    TEXT,
+    seed        TEXT,
+    rules       TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_giveaways_message ON giveaways(message_id);
+CREATE INDEX IF NOT EXISTS idx_giveaways_end ON giveaways(end_time);
+
+CREATE TABLE IF NOT EXISTS participants (
+    giveaway_id TEXT NOT NULL,
+    user_id     INTEGER NOT NULL,
+    joined_at   REAL NOT NULL,
+    PRIMARY KEY (giveaway_id, user_id)
+);
+CREATE INDEX IF NOT EXISTS idx_participants_joined ON participants(giveaway_id, joined_at);
+
+CREATE TABLE IF NOT EXISTS verified_members (
+    guild_id INTEGER NOT NULL,  -- 0 = mọi server
+    user_id  INTEGER NOT NULL,
+    added_by INTEGER,
+    added_at REAL NOT NULL,
+    PRIMARY KEY (guild_id, user_id)
+);
+
+CREATE TABLE IF NOT EXISTS verified_audit (
+    id       INTEGER PRIMARY KEY AUTOINCREMENT,
+    guild_id INTEGER NOT NULL,
+    user_id  INTEGER NOT NULL,
+    action   TEXT NOT NULL,  -- 'add' / 'remove'
+    actor_id INTEGER,
+    at       REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_verified_audit_guild ON verified_audit(guild_id, at);
+CREATE INDEX IF NOT EXISTS idx_verified_audit_user ON verified_audit(user_id, at);
+
+CREATE TABLE IF NOT EXISTS anon_sessions (
+    user_a       INTEGER NOT NULL,
+    user_b       INTEGER NOT NULL,
+    last_message REAL NOT NULL,
+    PRIMARY KEY (user_a, user_b)
+);
+CREATE UNIQUE INDEX IF NOT EXISTS idx_anon_user_b ON anon_sessions(user_b);
+CREATE INDEX IF NOT EXISTS idx_anon_last ON anon_sessions(last_message);
+
+CREATE TABLE IF NOT EXISTS anon_filter (
+    pattern  TEXT PRIMARY KEY,
+    is_regex INTEGER NOT NULL DEFAULT 0,
+    added_by INTEGER,
+    added_at REAL NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS dm_outbox (
+    giveaway_id TEXT NOT NULL,
+    user_id     INTEGER NOT NULL,
+    creator_id  INTEGER NOT NULL,
+    payload     TEXT NOT NULL,
+    status      TEXT NOT NULL DEFAULT 'pending',
+    attempts    INTEGER NOT NULL DEFAULT 0,
+    error       TEXT,
+    updated_at  REAL NOT NULL,
+    PRIMARY KEY (giveaway_id, user_id)
+);
+CREATE INDEX IF NOT EXISTS idx_dm_outbox_status ON dm_outbox(status);
+
+CREATE TABLE IF NOT EXISTS giveaway_draws (
+    giveaway_id TEXT NOT NULL,
+    round       INTEGER NOT NULL,
+    creator_id  INTEGER NOT NULL,
+    seed        TEXT NOT NULL,
+    commitment  TEXT NOT NULL,
+    pool_hash   TEXT NOT NULL,
+    pool_size   INTEGER NOT NULL,
+    winners     TEXT NOT NULL,
+    drawn_at    REAL NOT NULL,
+    PRIMARY KEY (giveaway_id, round)
+);
+
+CREATE TABLE IF NOT EXISTS giveaway_archive (
+    giveaway_id  TEXT PRIMARY KEY,
+    guild_id     INTEGER,
+    creator_id   INTEGER NOT NULL,
+    channel_id   INTEGER,
+    reward       TEXT NOT NULL,
+    participants INTEGER NOT NULL,
+    ended_at     REAL NOT NULL,
+    segment      INTEGER NOT NULL,
+    position     INTEGER NOT NULL,
+    length       INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_archive_guild ON giveaway_archive(guild_id, ended_at);
+CREATE INDEX IF NOT EXISTS idx_archive_creator ON giveaway_archive(creator_id, ended_at);
+"""
+
+# cột được thêm sau khi bảng đã tồn tại ở bản cũ: (bảng, cột, kiểu)
+MIGRATIONS = (
+    ("giveaways", "seed", "TEXT"),
+    ("giveaways", "rules", "TEXT"),
+)
+
+GLOBAL_SCOPE = 0  # guild_id của verified áp dụng cho mọi server
+
+GIVEAWAY_COLUMNS = ("id", "creator_id", "channel_id", "message_id", "reward",
+                    "days", "hour", "minute", "num_winners", "end_time", "seed", "rules")
+
+
+# -------------------- Core --------------------
+def _connect():
+    global _conn
+    if _conn is None:
+        os.makedirs(os.path.dirname(DB_FILE) or ".", exist_ok=True)
+        conn = sqlite3.connect(DB_FILE)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.executescript(SCHEMA)
+        _migrate(conn)
+        conn.commit()
+        _conn = conn
+    return _conn
+
+
+def _migrate(conn: sqlite3.Connection):
+    for table, column, decl in MIGRATIONS:
+        columns = {r[1] for r in conn.execute(f"PRAGMA table_info({table})")}
+        if column not in columns:
+            conn.execute(f"ALTER TABLE {table} ADD COLUMN {column} {decl}")
+    # bảng verified_users cũ (không theo server) -> verified_members phạm vi toàn cục
+    if conn.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'verified_users'").fetchone():
+        conn.execute(
+            "INSERT OR IGNORE INTO verified_members (guild_id, user_id, added_by, added_at) "
+            "SELECT ?, user_id, added_by, added_at FROM verified_users",
+            (GLOBAL_SCOPE,),
+        )
+        conn.execute("DROP TABLE verified_users")
+
+
+async def _run(fn, *args):
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_executor, fn, *args)
+
+
+async def init_db():
+    # gọi nhiều lần cũng được (main.on_ready và cog_load của từng cog)
+    async with _init_lock:
+        await _run(_connect)
+
+
+async def close_db():
+    def _close():
+        global _conn
+        if _conn is not None:
+            _conn.close()
+            _conn = None
+    await _run(_close)
+
+
+def _get_meta(key: str) -> Optional[str]:
+    row = _connect().execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+    return row[0] if row else None
+
+
+def _set_meta(key: str, value: str):
+    conn = _connect()
+    conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)", (key, value))
+    conn.commit()
+
+
+async def get_meta(key: str) -> Optional[str]:
+    return await _run(_get_meta, key)
+
+
+async def set_meta(key: str, value: str):
+    await _run(_set_meta, key, value)
+
+
+# -------------------- Giveaways --------------------
+def _upsert_giveaway(conn: sqlite3.Connection, data: dict):
+    conn.execute(
+        f"INSERT OR REPLACE INTO giveaways ({', '.join(GIVEAWAY_COLUMNS)}) "
+        f"VALUES ({', '.join('?' for _ in GIVEAWAY_COLUMNS)})",
+        tuple(data.get(c) for c in GIVEAWAY_COLUMNS),
+    )
+
+
+def _delete_giveaway(conn: sqlite3.Connection, gid: str):
+    conn.execute("DELETE FROM participants WHERE giveaway_id = ?", (gid,))
+    conn.execute("DELETE FROM giveaways WHERE id = ?", (gid,))
+
+
+def _decode_users(value) -> array:
+    # users trong journal là base64 của mảng int64 (xem ParticipantSet.to_b64)
+    ids = array("q")
+    if isinstance(value, str):
+        ids.frombytes(base64.b64decode(value))
+    elif value:
+        ids.extend(value)
+    return ids
+
+
+def _apply_giveaway_journal(lines: List[str]):
+    """Áp dụng một loạt bản ghi journal của GiveawayStore trong một transaction."""
+    conn = _connect()
+    now = time.time()
+    with conn:
+        for line in lines:
+            rec = json.loads(line)
+            op, gid = rec["op"], rec["gid"]
+            if op == "put":
+                data = rec["data"]
+                _upsert_giveaway(conn, data)
+                conn.execute("DELETE FROM participants WHERE giveaway_id = ?", (gid,))
+                conn.executemany(
+                    "INSERT OR IGNORE INTO participants (giveaway_id, user_id, joined_at) VALUES (?, ?, ?)",
+                    ((gid, uid, now + i * 1e-6) for i, uid in enumerate(_decode_users(data.get("users")))),
+                )
+            elif op == "del":
+                _delete_giveaway(conn, gid)
+            elif op == "set":
+                if rec["field"] in GIVEAWAY_COLUMNS and rec["field"] != "id":
+                    conn.execute(f"UPDATE giveaways SET {rec['field']} = ? WHERE id = ?", (rec["value"], gid))
+            elif op == "join":
+                conn.execute(
+                    "INSERT OR IGNORE INTO participants (giveaway_id, user_id, joined_at) VALUES (?, ?, ?)",
+                    (gid, rec["uid"], rec.get("ts", now)),
+                )
+            elif op == "leave":
+                conn.execute("DELETE FROM participants WHERE giveaway_id = ? AND user_id = ?", (gid, rec["uid"]))
+
+
+def _load_giveaways() -> Dict[str, dict]:
+    """Giveaway còn sống; users trả về dạng array int64 (không tạo list)."""
+    conn = _connect()
+    result = {}
+    for row in conn.execute(f"SELECT {', '.join(GIVEAWAY_COLUMNS)} FROM giveaways"):
+        data = dict(zip(GIVEAWAY_COLUMNS, row))
+        data["users"] = array("q", (
+            r[0] for r in conn.execute(
+                "SELECT user_id FROM participants WHERE giveaway_id = ? ORDER BY joined_at", (data["id"],)
+            )
+        ))
+        result[data["id"]] = data
+    return result
+
+
+def _participants_after(gid: str, after_ts: float, after_uid: int, limit: int) -> List[Tuple[int, float]]:
+    # keyset pagination theo (joined_at, user_id): không OFFSET nên trang nào cũng nhanh như trang đầu
+    return _connect().execute(
+        "SELECT user_id, joined_at FROM participants WHERE giveaway_id = ? AND (joined_at, user_id) > (?, ?) "
+        "ORDER BY joined_at, user_id LIMIT ?",
+        (gid, after_ts, after_uid, limit),
+    ).fetchall()
+
+
+async def apply_giveaway_journal(lines: List[str]):
+    await _run(_apply_giveaway_journal, lines)
+
+
+async def load_giveaways() -> Dict[str, dict]:
+    return await _run(_load_giveaways)
+
+
+async def iter_participants(gid: str, chunk: int = 5000):
+    """Duyệt (user_id, joined_at) theo thứ tự tham gia, mỗi lần lấy ``chunk`` dòng."""
+    after_ts, after_uid = float("-inf"), 0
+    while True:
+        rows = await _run(_participants_after, gid, after_ts, after_uid, chunk)
+        for row in rows:
+            yield row
+        if len(rows) < chunk:
+            return
+        after_uid, after_ts = rows[-1]
+
+
+# -------------------- Verified users --------------------
+def _audit_verified(conn: sqlite3.Connection, guild_id: int, uid: int, action: str, actor_id: Optional[int]):
+    conn.execute(
+        "INSERT INTO verified_audit (guild_id, user_id, action, actor_id, at) VALUES (?, ?, ?, ?, ?)",
+        (guild_id, uid, action, actor_id, time.time()),
+    )
+
+
+def _add_verified(uid: int, guild_id: int, added_by: Optional[int]) -> bool:
+    conn = _connect()
+    with conn:
+        cur = conn.execute(
+            "INSERT OR IGNORE INTO verified_members (guild_id, user_id, added_by, added_at) VALUES (?, ?, ?, ?)",
+            (guild_id, uid, added_by, time.time()),
+        )
+        if cur.rowcount > 0:
+            _audit_verified(conn, guild_id, uid, "add", added_by)
+    return cur.rowcount > 0
+
+
+def _remove_verified(uid: int, guild_id: int, removed_by: Optional[int]) -> bool:
+    conn = _connect()
+    with conn:
+        cur = conn.execute("DELETE FROM verified_members WHERE guild_id = ? AND user_id = ?", (guild_id, uid))
+        if cur.rowcount > 0:
+            _audit_verified(conn, guild_id, uid, "remove", removed_by)
+    return cur.rowcount > 0
+
+
+def _load_verified() -> List[Tuple[int, int]]:
+    return _connect().execute("SELECT guild_id, user_id FROM verified_members ORDER BY added_at").fetchall()
+
+
+def _verified_audit(guild_id: Optional[int], user_id: Optional[int], limit: int) -> List[Tuple]:
+    where, args = [], []
+    if guild_id is not None:
+        where.append("guild_id IN (?, ?)")
+        args += [GLOBAL_SCOPE, guild_id]
+    if user_id is not None:
+        where.append("user_id = ?")
+        args.append(user_id)
+    sql = "SELECT guild_id, user_id, action, actor_id, at FROM verified_audit"
+    if where:
+        sql += " WHERE " + " AND ".join(where)
+    return _connect().execute(sql + " ORDER BY id DESC LIMIT ?", (*args, limit)).fetchall()
+
+
+def _seed_verified(uids: List[int]):
+    # chỉ seed một lần, để việc xoá tick sau đó không bị hồi sinh khi restart
+    if _get_meta("verified_seeded"):
+        return
+    conn = _connect()
+    with conn:
+        conn.executemany(
+            "INSERT OR IGNORE INTO verified_members (guild_id, user_id, added_by, added_at) VALUES (?, ?, NULL, ?)",
+            ((GLOBAL_SCOPE, uid, time.time()) for uid in uids),
+        )
+    _set_meta("verified_seeded", "1")
+
+
+async def add_verified(uid: int, guild_id: int = GLOBAL_SCOPE, added_by: Optional[int] = None) -> bool:
+    return await _run(_add_verified, uid, guild_id, added_by)
+
+
+async def remove_verified(uid: int, guild_id: int = GLOBAL_SCOPE, removed_by: Optional[int] = None) -> bool:
+    return await _run(_remove_verified, uid, guild_id, removed_by)
+
+
+async def load_verified() -> List[Tuple[int, int]]:
+    """Mọi (guild_id, user_id) đã verified, theo thứ tự thêm."""
+    return await _run(_load_verified)
+
+
+async def verified_audit(guild_id: Optional[int] = None, user_id: Optional[int] = None,
+                         limit: int = 20) -> List[Tuple]:
+    """Lịch sử thêm/xoá tick mới nhất trước: (guild_id, user_id, action, actor_id, at)."""
+    return await _run(_verified_audit, guild_id, user_id, limit)
+
+
+async def seed_verified(uids: List[int]):
+    await _run(_seed_verified, uids)
+
+
+# -------------------- Anonymous content filter --------------------
+def _add_filter_patterns(patterns: List[Tuple[str, bool]], added_by: Optional[int]) -> int:
+    conn = _connect()
+    with conn:
+        before = conn.total_changes
+        conn.executemany(
+            "INSERT OR IGNORE INTO anon_filter (pattern, is_regex, added_by, added_at) VALUES (?, ?, ?, ?)",
+            ((p, int(is_regex), added_by, time.time()) for p, is_regex in patterns),
+        )
+        return conn.total_changes - before
+
+
+def _remove_filter_pattern(pattern: str) -> bool:
+    conn = _connect()
+    with conn:
+        cur = conn.execute("DELETE FROM anon_filter WHERE pattern = ?", (pattern,))
+    return cur.rowcount > 0
+
+
+def _list_filter_patterns() -> List[Tuple[str, bool]]:
+    return [(p, bool(r)) for p, r in _connect().execute("SELECT pattern, is_regex FROM anon_filter ORDER BY added_at")]
+
+
+async def add_filter_patterns(patterns: List[Tuple[str, bool]], added_by: Optional[int] = None) -> int:
+    """Thêm nhiều (pattern, is_regex), trả về số pattern mới."""
+    return await _run(_add_filter_patterns, patterns, added_by)
+
+
+async def remove_filter_pattern(pattern: str) -> bool:
+    return await _run(_remove_filter_pattern, pattern)
+
+
+async def list_filter_patterns() -> List[Tuple[str, bool]]:
+    return await _run(_list_filter_patterns)
+
+
+# -------------------- Anonymous sessions --------------------
+def _save_session(u1: int, u2: int, last_message: float):
+    a, b = sorted((u1, u2))
+    conn = _connect()
+    with conn:
+        conn.execute(
+            "INSERT OR REPLACE INTO anon_sessions (user_a, user_b, last_message) VALUES (?, ?, ?)",
+            (a, b, last_message),
+        )
+
+
+def _touch_sessions(rows: List[Tuple[int, int, float]]):
+    conn = _connect()
+    with conn:
+        conn.executemany(
+            "UPDATE anon_sessions SET last_message = ? WHERE user_a = ? AND user_b = ?",
+            [(last, *sorted((u1, u2))) for u1, u2, last in rows],
+        )
+
+
+def _delete_session(u1: int, u2: int):
+    a, b = sorted((u1, u2))
+    conn = _connect()
+    with conn:
+        conn.execute("DELETE FROM anon_sessions WHERE user_a = ? AND user_b = ?", (a, b))
+
+
+def _load_sessions() -> List[Tuple[int, int, float]]:
+    return _connect().execute("SELECT user_a, user_b, last_message FROM anon_sessions").fetchall()
+
+
+async def save_session(u1: int, u2: int, last_message: float):
+    await _run(_save_session, u1, u2, last_message)
+
+
+async def touch_sessions(rows: List[Tuple[int, int, float]]):
+    """Ghi last_message của nhiều phiên trong một transaction."""
+    await _run(_touch_sessions, rows)
+
+
+async def delete_session(u1: int, u2: int):
+    await _run(_delete_session, u1, u2)
+
+
+async def load_sessions() -> List[Tuple[int, int, float]]:
+    return await _run(_load_sessions)
+
+
+# -------------------- Winner DM outbox --------------------
+def _enqueue_dms(rows: List[Tuple[str, int, int, str]]):
+    conn = _connect()
+    now = time.time()
+    with conn:
+        conn.executemany(
+            "INSERT OR IGNORE INTO dm_outbox (giveaway_id, user_id, creator_id, payload, updated_at) "
+            "VALUES (?, ?, ?, ?, ?)",
+            ((gid, uid, creator_id, payload, now) for gid, uid, creator_id, payload in rows),
+        )
+
+
+def _pending_dms() -> List[Tuple[str, int, str, int]]:
+    return _connect().execute(
+        "SELECT giveaway_id, user_id, payload, attempts FROM dm_outbox WHERE status = 'pending'"
+    ).fetchall()
+
+
+def _mark_dm(gid: str, uid: int, status: str, attempts: int, error: Optional[str]):
+    conn = _connect()
+    with conn:
+        conn.execute(
+            "UPDATE dm_outbox SET status = ?, attempts = ?, error = ?, updated_at = ? "
+            "WHERE giveaway_id = ? AND user_id = ?",
+            (status, attempts, error, time.time(), gid, uid),
+        )
+
+
+def _dm_report(gid: str) -> Optional[dict]:
+    conn = _connect()
+    rows = conn.execute(
+        "SELECT user_id, creator_id, status, attempts, error FROM dm_outbox WHERE giveaway_id = ?", (gid,)
+    ).fetchall()
+    if not rows:
+        return None
+    report = {"creator_id": rows[0][1], "counts": {}, "problems": []}
+    for uid, _, status, attempts, error in rows:
+        report["counts"][status] = report["counts"].get(status, 0) + 1
+        if status in ("failed", "closed"):
+            report["problems"].append((uid, status, attempts, error))
+    return report
+
+
+async def enqueue_dms(rows: List[Tuple[str, int, int, str]]):
+    await _run(_enqueue_dms, rows)
+
+
+async def pending_dms() -> List[Tuple[str, int, str, int]]:
+    return await _run(_pending_dms)
+
+
+async def mark_dm(gid: str, uid: int, status: str, attempts: int, error: Optional[str] = None):
+    await _run(_mark_dm, gid, uid, status, attempts, error)
+
+
+async def dm_report(gid: str) -> Optional[dict]:
+    return await _run(_dm_report, gid)
+
+
+# -------------------- Giveaway draws (seed + commitment) --------------------
+def _record_draw(gid: str, round_: int, creator_id: int, seed: str, commitment: str,
+                 pool_hash: str, pool_size: int, winners: List[int]):
+    conn = _connect()
+    with conn:
+        conn.execute(
+            "INSERT OR REPLACE INTO giveaway_draws "
+            "(giveaway_id, round, creator_id, seed, commitment, pool_hash, pool_size, winners, drawn_at) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            (gid, round_, creator_id, seed, commitment, pool_hash, pool_size, json.dumps(winners), time.time()),
+        )
+
+
+def _get_draws(gid: str) -> List[dict]:
+    rows = _connect().execute(
+        "SELECT round, creator_id, seed, commitment, pool_hash, pool_size, winners, drawn_at "
+        "FROM giveaway_draws WHERE giveaway_id = ? ORDER BY round", (gid,)
+    ).fetchall()
+    return [
+        {"round": r[0], "creator_id": r[1], "seed": r[2], "commitment": r[3], "pool_hash": r[4],
+         "pool_size": r[5], "winners": json.loads(r[6]), "drawn_at": r[7]}
+        for r in rows
+    ]
+
+
+async def record_draw(gid: str, round_: int, creator_id: int, seed: str, commitment: str,
+                      pool_hash: str, pool_size: int, winners: List[int]):
+    await _run(_record_draw, gid, round_, creator_id, seed, commitment, pool_hash, pool_size, winners)
+
+
+async def get_draws(gid: str) -> List[dict]:
+    return await _run(_get_draws, gid)
+
+
+# -------------------- Giveaway archive index --------------------
+ARCHIVE_COLUMNS = ("giveaway_id", "guild_id", "creator_id", "channel_id", "reward",
+                   "participants", "ended_at", "segment", "position", "length")
+
+
+def _archive_index(row: dict):
+    conn = _connect()
+    with conn:
+        conn.execute(
+            f"INSERT OR REPLACE INTO giveaway_archive ({', '.join(ARCHIVE_COLUMNS)}) "
+            f"VALUES ({', '.join('?' * len(ARCHIVE_COLUMNS))})",
+            tuple(row[c] for c in ARCHIVE_COLUMNS),
+        )
+
+
+def _archive_lookup(gid: str) -> Optional[dict]:
+    row = _connect().execute(
+        f"SELECT {', '.join(ARCHIVE_COLUMNS)} FROM giveaway_archive WHERE giveaway_id = ?", (gid,)
+    ).fetchone()
+    return dict(zip(ARCHIVE_COLUMNS, row)) if row else None
+
+
+def _archive_list(guild_id: Optional[int], creator_id: Optional[int], limit: int) -> List[dict]:
+    where, args = [], []
+    if guild_id is not None:
+        where.append("guild_id = ?")
+        args.append(guild_id)
+    if creator_id is not None:
+        where.append("creator_id = ?")
+        args.append(creator_id)
+    sql = f"SELECT {', '.join(ARCHIVE_COLUMNS)} FROM giveaway_archive"
+    if where:
+        sql += " WHERE " + " AND ".join(where)
+    rows = _connect().execute(sql + " ORDER BY ended_at DESC LIMIT ?", (*args, limit)).fetchall()
+    return [dict(zip(ARCHIVE_COLUMNS, r)) for r in rows]
+
+
+async def archive_index(row: dict):
+    await _run(_archive_index, row)
+
+
+async def archive_lookup(gid: str) -> Optional[dict]:
+    return await _run(_archive_lookup, gid)
+
+
+async def archive_list(guild_id: Optional[int] = None, creator_id: Optional[int] = None, limit: int = 10) -> List[dict]:
+    return await _run(_archive_list, guild_id, creator_id, limit)
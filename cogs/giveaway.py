@@ -4,18 +4,60 @@ from discord.ext import commands
 from discord import app_commands
 from datetime import datetime, timedelta
 import asyncio
+import base64
+import bisect
+import csv
+import hashlib
+import heapq
+import io
+import itertools
 import random
+import re
+import secrets
+import struct
+import tempfile
+import zlib
 import pytz
-import string
 import json
 import os
+import time
+from array import array
+from collections import OrderedDict
 from typing import Optional, List
 
+from cogs import db
+from cogs.utils import get_resolver, TimerHeap
+
 VN_TZ = pytz.timezone("Asia/Ho_Chi_Minh")
-DATA_FILE = "giveaways.json"
+DATA_FILE = "giveaways.json"  # định dạng cũ, chỉ dùng để migrate sang SQLite
+JOURNAL_FILE = os.path.join("data", "giveaways.journal")
+ARCHIVE_DIR = os.path.join("data", "archive")  # segment nén của giveaway đã kết thúc
+ARCHIVE_SEGMENT_SIZE = 8 * 1024 * 1024  # byte, đầy thì mở segment mới
+ARCHIVE_CACHE_BYTES = 64 * 1024 * 1024  # byte (JSON đã giải nén) bản ghi archive giữ trong RAM
+ARCHIVE_CACHE_MAX_RECORD = 8 * 1024 * 1024  # bản ghi lớn hơn thì không cache, đọc lại từ đĩa
 COUNTDOWN_INTERVAL = 15  # giây, cập nhật thời gian trên embed
+EDIT_WINDOW = 3.0  # giây, mỗi message giveaway chỉ bị edit tối đa 1 lần / cửa sổ
+# "live": tự edit countdown theo REFRESH_TIERS; "relative": dùng <t:...:R> của Discord, không edit định kỳ
+COUNTDOWN_MODE = "live"
+REFRESH_RATE = 2.0  # số edit countdown / giây cho TẤT CẢ giveaway cộng lại
+# (còn lại > N giây, refresh mỗi M giây) — càng gần kết thúc càng refresh dày
+REFRESH_TIERS = ((86400, 600), (3600, 120), (600, 30), (0, COUNTDOWN_INTERVAL))
+DM_CONCURRENCY = 5  # số DM báo thắng gửi song song
+DM_MAX_ATTEMPTS = 5  # thử lại khi gặp 429/5xx
+DM_BACKOFF = 1.0  # giây, nhân đôi sau mỗi lần thử lại
+BONUS_ROLE_ENTRIES: dict = {}  # {role_id: số vé cộng thêm} cho người có role đó
+BOOSTER_ENTRIES = 1  # vé cộng thêm cho người boost server
+ALT_ACCOUNT_DAYS = 30  # "chống clone": tài khoản trẻ hơn N ngày và chưa có avatar bị coi là clone
+PARTICIPANTS_PER_PAGE = 25
+EXPORT_SPOOL_SIZE = 1024 * 1024  # byte, file export lớn hơn thì tràn xuống file tạm trên đĩa
+DRAW_CACHE_SIZE = 20  # số pool quay thưởng giữ lại trong RAM cho /reroll
+FLUSH_INTERVAL = 1.0  # giây, gom các thay đổi rồi mới ghi journal một lần
+COMPACT_THRESHOLD = 5000  # số bản ghi journal trước khi checkpoint vào SQLite
+RECOVERY_BATCH = 5  # số giveaway quá hạn kết thúc song song mỗi đợt khi khởi động lại
+RECOVERY_PAUSE = 2.0  # giây nghỉ giữa các đợt, để không dồn REST call sau khi bot sập
+ID_EPOCH = 1704067200  # 2024-01-01 UTC, mốc thời gian của ID giveaway
 
-# -------------------- Helpers: load/save --------------------
+# -------------------- Helpers: load (legacy JSON) --------------------
 def load_data() -> dict:
     if not os.path.exists(DATA_FILE):
         return {}
@@ -26,17 +68,918 @@ def load_data() -> dict:
         return {}
 
 
-def save_data(data: dict):
-    with open(DATA_FILE, "w", encoding="utf-8") as f:
-        json.dump(data, f, ensure_ascii=False, indent=4)
+def _dump_record(rec: dict) -> str:
+    return json.dumps(rec, ensure_ascii=False, separators=(",", ":"))
+
+
+# -------------------- Participants --------------------
+_HASH_MUL = 0x9E3779B97F4A7C15  # hằng số Fibonacci cho multiplicative hashing
+_EMPTY, _DELETED = 0, -1
+
+
+class ParticipantSet:
+    """Tập người tham gia gọn nhẹ cho giveaway rất đông người.
+
+    - ``_ids``: array int64 giữ ID theo thứ tự tham gia; ID bị rời được đánh
+      dấu 0 (snowflake không bao giờ bằng 0) và dọn dẹp dần.
+    - ``_slots``: bảng băm mở (linear probing) lưu vị trí+1 trong ``_ids``.
+    Tham gia / rời / kiểm tra đều O(1); mỗi người tốn ~24 byte thay vì một
+    object int + phần tử list + phần tử set.
+    """
+
+    __slots__ = ("_ids", "_slots", "_shift", "_count", "_used")
+
+    def __init__(self, ids=()):
+        self._ids = array("q")
+        self._count = 0
+        self._rehash(max(8, len(ids) * 2))
+        for uid in ids:
+            self.add(uid)
+
+    # ---------- (de)serialize ----------
+    @classmethod
+    def load(cls, value) -> "ParticipantSet":
+        if isinstance(value, ParticipantSet):
+            return value
+        if isinstance(value, str):
+            ids = array("q")
+            ids.frombytes(base64.b64decode(value))
+            return cls.from_array(ids)
+        if isinstance(value, array):
+            return cls.from_array(value)
+        return cls(value or ())
+
+    @classmethod
+    def from_array(cls, ids: array) -> "ParticipantSet":
+        ps = cls.__new__(cls)
+        ps._ids = array("q", ids)
+        ps._count = len(ps._ids)
+        ps._rehash(max(8, ps._count * 2))
+        return ps
+
+    def to_b64(self) -> str:
+        return base64.b64encode(self.ids().tobytes()).decode("ascii")
+
+    # ---------- hash table ----------
+    def _rehash(self, min_size: int):
+        size = 8
+        while size < min_size:
+            size <<= 1
+        self._shift = 64 - size.bit_length() + 1
+        self._slots = array("q", bytes(8 * size))
+        self._used = 0
+        mask = size - 1
+        for pos, uid in enumerate(self._ids):
+            if uid:
+                i = self._hash(uid)
+                while self._slots[i] != _EMPTY:
+                    i = (i + 1) & mask
+                self._slots[i] = pos + 1
+                self._used += 1
+
+    def _hash(self, uid: int) -> int:
+        return ((uid * _HASH_MUL) & 0xFFFFFFFFFFFFFFFF) >> self._shift
+
+    def _find(self, uid: int) -> int:
+        """Trả về chỉ số slot chứa uid, hoặc -1."""
+        slots, ids = self._slots, self._ids
+        mask = len(slots) - 1
+        i = self._hash(uid)
+        while True:
+            v = slots[i]
+            if v == _EMPTY:
+                return -1
+            if v != _DELETED and ids[v - 1] == uid:
+                return i
+            i = (i + 1) & mask
+
+    # ---------- public API ----------
+    def __len__(self) -> int:
+        return self._count
+
+    def __contains__(self, uid: int) -> bool:
+        return self._find(uid) >= 0
+
+    def __iter__(self):
+        return (uid for uid in self._ids if uid)
+
+    def add(self, uid: int) -> bool:
+        if self._find(uid) >= 0:
+            return False
+        if (self._used + 1) * 2 > len(self._slots):
+            self._compact_ids()
+            self._rehash((self._count + 1) * 4)
+        slots = self._slots
+        mask = len(slots) - 1
+        i = self._hash(uid)
+        while slots[i] not in (_EMPTY, _DELETED):
+            i = (i + 1) & mask
+        if slots[i] == _EMPTY:
+            self._used += 1
+        self._ids.append(uid)
+        slots[i] = len(self._ids)
+        self._count += 1
+        return True
+
+    def discard(self, uid: int) -> bool:
+        i = self._find(uid)
+        if i < 0:
+            return False
+        self._ids[self._slots[i] - 1] = 0
+        self._slots[i] = _DELETED
+        self._count -= 1
+        # quá nửa mảng là chỗ trống -> dọn lại cho gọn
+        if len(self._ids) > 64 and self._count * 2 < len(self._ids):
+            self._compact_ids()
+            self._rehash(self._count * 2)
+        return True
+
+    def _compact_ids(self):
+        if self._count != len(self._ids):
+            self._ids = array("q", (uid for uid in self._ids if uid))
+
+    def ids(self) -> array:
+        """Mảng int64 các ID theo thứ tự tham gia (không copy thành list)."""
+        if self._count != len(self._ids):
+            self._compact_ids()
+            self._rehash(self._count * 2)
+        return self._ids
+
+    def index_of(self, uid: int) -> int:
+        """Vị trí của uid trong ``ids()`` (-1 nếu không có)."""
+        self.ids()
+        i = self._find(uid)
+        return self._slots[i] - 1 if i >= 0 else -1
+
+
+# -------------------- Draw engine --------------------
+def seed_commitment(seed: str) -> str:
+    """Cam kết công bố trước khi quay: sha256(seed). Seed được lộ khi kết thúc."""
+    return hashlib.sha256(seed.encode("utf-8")).hexdigest()
+
+
+class DrawPool:
+    """Pool vé có trọng số, dựng một lần và dùng lại cho /reroll.
+
+    Lưu ID (int64) + trọng số (float64) + tổng tích luỹ; mỗi lần quay chỉ là
+    bisect O(log n). Kết quả hoàn toàn xác định bởi (seed, round) nên ai có
+    danh sách người tham gia + seed đều kiểm chứng lại được; ``pool_hash`` =
+    sha256(ids int64 LE || weights float64 LE).
+    """
+
+    __slots__ = ("ids", "weights", "cum", "total", "pool_hash")
+
+    def __init__(self, ids: array, weights: array):
+        self.ids = ids
+        self.weights = weights
+        self.cum = array("d", itertools.accumulate(weights))
+        self.total = self.cum[-1] if self.cum else 0.0
+        self.pool_hash = hashlib.sha256(ids.tobytes() + weights.tobytes()).hexdigest()
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def draw(self, k: int, seed: str, round_: int = 0, exclude=()) -> List[int]:
+        """Quay k người (không lặp, bỏ qua ``exclude``) có trọng số."""
+        rng = random.Random(f"{seed}:{round_}")
+        excluded = set(exclude)
+        k = max(0, min(k, len(self.ids) - len(excluded)))
+        winners: List[int] = []
+        ids, cum, total = self.ids, self.cum, self.total
+        attempts, max_attempts = 0, 50 * k + 100
+        while len(winners) < k and attempts < max_attempts:
+            attempts += 1
+            uid = ids[bisect.bisect_right(cum, rng.random() * total)]
+            if uid not in excluded:
+                excluded.add(uid)
+                winners.append(uid)
+        if len(winners) < k:
+            # gần hết pool đã bị loại -> quay trên phần còn lại (vẫn có trọng số)
+            rest = [(uid, w) for uid, w in zip(ids, self.weights) if uid not in excluded]
+            while len(winners) < k and rest:
+                i = rng.choices(range(len(rest)), weights=[w for _, w in rest])[0]
+                winners.append(rest.pop(i)[0])
+        return winners
+
+
+# -------------------- Eligibility --------------------
+DISCORD_EPOCH_MS = 1420070400000
+
+
+def snowflake_ts(snowflake: int) -> int:
+    """Thời điểm tạo (epoch giây) của một snowflake, không cần gọi API."""
+    return ((snowflake >> 22) + DISCORD_EPOCH_MS) // 1000
+
+
+class MemberIndex:
+    """Thuộc tính thành viên của một guild dạng cột, cập nhật từ event member.
+
+    - ``roles``: bitset (int) các role của từng người, mỗi role một bit.
+    - ``joined``: epoch vào server (array int64).
+    - ``flags``: bit FLAG_AVATAR / FLAG_BOT (array int8).
+    Tuổi tài khoản suy ra từ snowflake ID nên không cần lưu. ``complete``
+    cho biết index được dựng từ danh sách member đầy đủ (guild đã chunk).
+    """
+
+    FLAG_AVATAR, FLAG_BOT = 1, 2
+
+    def __init__(self, complete: bool = False):
+        self.complete = complete
+        self._rows: dict = {}   # member_id -> vị trí trong các cột
+        self._free: list = []   # vị trí trống sau khi member rời
+        self._bits: dict = {}   # role_id -> bit
+        self.roles: list = []
+        self.joined = array("q")
+        self.flags = array("b")
+
+    @classmethod
+    def build(cls, guild: discord.Guild) -> "MemberIndex":
+        index = cls(complete=guild.chunked)
+        for member in guild.members:
+            index.upsert(member)
+        return index
+
+    def __len__(self) -> int:
+        return len(self._rows)
+
+    def row(self, member_id: int) -> Optional[int]:
+        return self._rows.get(member_id)
+
+    def rows_for(self, ids):
+        """Vị trí trong các cột của từng ID (None nếu không có trong index), theo thứ tự ``ids``."""
+        return map(self._rows.get, ids)
+
+    def role_mask(self, role_ids) -> int:
+        mask = 0
+        for role_id in role_ids:
+            bit = self._bits.get(role_id)
+            if bit is None:
+                bit = self._bits[role_id] = len(self._bits)
+            mask |= 1 << bit
+        return mask
+
+    def upsert(self, member: discord.Member):
+        mask = self.role_mask(role.id for role in member.roles)
+        joined = int(member.joined_at.timestamp()) if member.joined_at else 0
+        flags = (self.FLAG_AVATAR if member.avatar else 0) | (self.FLAG_BOT if member.bot else 0)
+        row = self._rows.get(member.id)
+        if row is None:
+            if self._free:
+                row = self._free.pop()
+            else:
+                row = len(self.roles)
+                self.roles.append(0)
+                self.joined.append(0)
+                self.flags.append(0)
+            self._rows[member.id] = row
+        self.roles[row] = mask
+        self.joined[row] = joined
+        self.flags[row] = flags
+
+    def set_avatar(self, member_id: int, has_avatar: bool):
+        row = self._rows.get(member_id)
+        if row is not None:
+            self.flags[row] = (self.flags[row] & ~self.FLAG_AVATAR) | (self.FLAG_AVATAR if has_avatar else 0)
+
+    def remove(self, member_id: int):
+        row = self._rows.pop(member_id, None)
+        if row is not None:
+            self.roles[row] = 0
+            self._free.append(row)
+
+
+class EligibilityRules:
+    """Điều kiện tham gia của một giveaway, biên dịch một lần thành mask role + ngưỡng.
+
+    Spec (JSON lưu trong cột ``rules``): ``require_roles`` (cần ít nhất một),
+    ``exclude_roles`` (không được có), ``min_account_days``,
+    ``min_member_days``, ``no_alts``.
+    """
+
+    __slots__ = ("spec", "require", "exclude", "min_account", "min_member", "no_alts", "_compiled_for")
+
+    def __init__(self, spec: dict):
+        self.spec = spec
+        self.require = tuple(spec.get("require_roles") or ())
+        self.exclude = tuple(spec.get("exclude_roles") or ())
+        self.min_account = int(spec.get("min_account_days") or 0) * 86400
+        self.min_member = int(spec.get("min_member_days") or 0) * 86400
+        self.no_alts = bool(spec.get("no_alts"))
+        # (MemberIndex, require_mask, exclude_mask): bit role là riêng của từng index,
+        # index dựng lại (MemberIndex.build) thì mask cũ bị thay luôn
+        self._compiled_for = None
+
+    def _compiled(self, index: MemberIndex):
+        cached = self._compiled_for
+        if cached is None or cached[0] is not index:
+            cached = self._compiled_for = (index, index.role_mask(self.require), index.role_mask(self.exclude))
+        return cached[1], cached[2]
+
+    def check(self, index: MemberIndex, uid: int, now: Optional[float] = None) -> Optional[str]:
+        """O(1): None nếu đủ điều kiện, ngược lại là lý do để báo cho người dùng."""
+        row = index.row(uid)
+        if row is None:
+            return "Không tìm thấy bạn trong server."
+        now = time.time() if now is None else now
+        require, exclude = self._compiled(index)
+        roles = index.roles[row]
+        if require and not roles & require:
+            return "Bạn chưa có role yêu cầu."
+        if roles & exclude:
+            return "Role của bạn không được tham gia giveaway này."
+        created = snowflake_ts(uid)
+        if now - created < self.min_account:
+            return f"Tài khoản phải tạo ít nhất {self.min_account // 86400} ngày."
+        if now - index.joined[row] < self.min_member:
+            return f"Bạn phải ở trong server ít nhất {self.min_member // 86400} ngày."
+        if self.no_alts and (index.flags[row] & MemberIndex.FLAG_BOT or (
+                not index.flags[row] & MemberIndex.FLAG_AVATAR and now - created < ALT_ACCOUNT_DAYS * 86400)):
+            return "Tài khoản bị nghi là clone (quá mới và chưa có avatar)."
+        return None
+
+    def filter(self, index: MemberIndex, ids: array, now: Optional[float] = None) -> array:
+        """Kiểm tra lại cả pool một lượt, giữ nguyên thứ tự; người đã rời server bị loại."""
+        now = time.time() if now is None else now
+        require, exclude = self._compiled(index)
+        roles, joined, flags = index.roles, index.joined, index.flags
+        max_created = now - self.min_account
+        max_joined = now - self.min_member
+        alt_created = now - ALT_ACCOUNT_DAYS * 86400
+        no_alts, keep_missing = self.no_alts, not index.complete
+        kept = array("q")
+        for uid, row in zip(ids, index.rows_for(ids)):
+            if row is None:
+                if keep_missing:
+                    kept.append(uid)
+                continue
+            r = roles[row]
+            created = ((uid >> 22) + DISCORD_EPOCH_MS) // 1000
+            if ((not require or r & require) and not r & exclude and created <= max_created
+                    and joined[row] <= max_joined
+                    and not (no_alts and (flags[row] & 2 or (not flags[row] & 1 and created > alt_created)))):
+                kept.append(uid)
+        return kept
+
+    def describe(self) -> str:
+        parts = []
+        if self.require:
+            parts.append("cần 1 trong " + " ".join(f"<@&{r}>" for r in self.require))
+        if self.exclude:
+            parts.append("không có " + " ".join(f"<@&{r}>" for r in self.exclude))
+        if self.min_account:
+            parts.append(f"tài khoản ≥ {self.min_account // 86400} ngày")
+        if self.min_member:
+            parts.append(f"trong server ≥ {self.min_member // 86400} ngày")
+        if self.no_alts:
+            parts.append("chặn clone")
+        return ", ".join(parts)
+
+
+# -------------------- Persistence: SQLite + journal --------------------
+class GiveawayStore:
+    """RAW (gid -> Giveaway) trong RAM + journal append-only, checkpoint vào SQLite.
+
+    Mỗi thay đổi (join/leave/set/put/del) được áp dụng ngay vào RAM và thêm
+    một dòng vào hàng đợi; task nền gom các dòng đó ghi vào journal mỗi
+    FLUSH_INTERVAL giây. Khi journal đủ dài thì các bản ghi được áp dụng vào
+    SQLite trong một transaction rồi journal bị xoá. Mọi bản ghi đều là phép
+    gán (idempotent) nên replay lại phần journal đã checkpoint vẫn đúng.
+    """
+
+    def __init__(self, journal_file: str = JOURNAL_FILE):
+        self.journal_file = journal_file
+        self.raw: dict = {}
+        # index phụ, luôn khớp với raw: message_id -> gid, channel/creator -> {gid}
+        self.by_message: dict = {}
+        self.by_channel: dict = {}
+        self.by_creator: dict = {}
+        self._indexed: dict = {}           # gid -> (message_id, channel_id, creator_id) đang được index
+        self._pending: List[str] = []      # chưa ghi xuống journal
+        self._unckpt: List[str] = []       # chưa checkpoint vào SQLite
+        self._flush_task: Optional[asyncio.Task] = None
+        self._lock = asyncio.Lock()
+
+    # ---------- startup ----------
+    async def load(self) -> dict:
+        await db.init_db()
+        await self._migrate_legacy_json()
+        self.raw.clear()
+        for index in (self.by_message, self.by_channel, self.by_creator, self._indexed):
+            index.clear()
+        for gid, data in (await db.load_giveaways()).items():
+            self._add(Giveaway(data=data))
+        self._unckpt = []
+        if os.path.exists(self.journal_file):
+            with open(self.journal_file, "r", encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        rec = json.loads(line)
+                    except ValueError:
+                        # dòng cuối ghi dở khi crash -> bỏ qua
+                        continue
+                    self._apply(rec)
+                    self._unckpt.append(line.rstrip("\n"))
+        return self.raw
+
+    async def _migrate_legacy_json(self):
+        if await db.get_meta("giveaways_migrated"):
+            return
+        legacy = load_data()
+        if legacy:
+            await db.apply_giveaway_journal([_dump_record({"op": "put", "gid": gid, "data": d}) for gid, d in legacy.items()])
+            os.replace(DATA_FILE, DATA_FILE + ".migrated")
+        await db.set_meta("giveaways_migrated", "1")
+
+    # ---------- secondary indexes ----------
+    def _add(self, gw: "Giveaway"):
+        old = self.raw.get(gw.id)
+        if old is not None and old is not gw:
+            self._unindex(old.id)
+        self.raw[gw.id] = gw
+        self._reindex(gw)
+
+    def _unindex(self, gid: str):
+        keys = self._indexed.pop(gid, None)
+        if keys is None:
+            return
+        message_id, channel_id, creator_id = keys
+        if message_id is not None and self.by_message.get(message_id) == gid:
+            del self.by_message[message_id]
+        for index, key in ((self.by_channel, channel_id), (self.by_creator, creator_id)):
+            gids = index.get(key)
+            if gids is not None:
+                gids.discard(gid)
+                if not gids:
+                    del index[key]
+
+    def _reindex(self, gw: "Giveaway"):
+        keys = (gw.message_id, gw.channel_id, gw.creator_id)
+        if self._indexed.get(gw.id) == keys:
+            return
+        self._unindex(gw.id)
+        self._indexed[gw.id] = keys
+        if gw.message_id is not None:
+            self.by_message[gw.message_id] = gw.id
+        if gw.channel_id is not None:
+            self.by_channel.setdefault(gw.channel_id, set()).add(gw.id)
+        if gw.creator_id is not None:
+            self.by_creator.setdefault(gw.creator_id, set()).add(gw.id)
+
+    def by_message_id(self, message_id: int) -> Optional["Giveaway"]:
+        gid = self.by_message.get(message_id)
+        return self.raw.get(gid) if gid else None
+
+    def in_channel(self, channel_id: int) -> List["Giveaway"]:
+        return [self.raw[gid] for gid in sorted(self.by_channel.get(channel_id, ()))]
+
+    def of_creator(self, creator_id: int) -> List["Giveaway"]:
+        return [self.raw[gid] for gid in sorted(self.by_creator.get(creator_id, ()))]
+
+    def _apply(self, rec: dict):
+        op, gid = rec["op"], rec["gid"]
+        if op == "put":
+            self._add(Giveaway(data=rec["data"]))
+            return
+        if op == "del":
+            self._unindex(gid)
+            self.raw.pop(gid, None)
+            return
+        gw = self.raw.get(gid)
+        if gw is None:
+            return
+        if op == "set":
+            gw.load_field(rec["field"], rec["value"])
+            self._reindex(gw)
+        elif op == "join":
+            gw.users.add(rec["uid"])
+        elif op == "leave":
+            gw.users.discard(rec["uid"])
+
+    def _record(self, rec: dict):
+        self._apply(rec)
+        self._log(rec)
+
+    def _log(self, rec: dict):
+        line = _dump_record(rec)
+        self._pending.append(line)
+        self._unckpt.append(line)
+        if self._flush_task is None or self._flush_task.done():
+            self._flush_task = asyncio.get_running_loop().create_task(self._delayed_flush())
+
+    # ---------- mutations (O(1) mỗi lần gọi) ----------
+    def put(self, gw: "Giveaway"):
+        # giữ nguyên object sống; users được ghi dạng base64 int64
+        self._add(gw)
+        gw.pop_dirty()
+        self._log({"op": "put", "gid": gw.id, "data": dict(gw.to_dict(), users=gw.users.to_b64())})
+
+    def delete(self, gid: str):
+        self._record({"op": "del", "gid": gid})
+
+    def set_field(self, gid: str, field: str, value):
+        self._record({"op": "set", "gid": gid, "field": field, "value": value})
+
+    def commit(self, gw: "Giveaway") -> bool:
+        """Ghi journal cho các field của gw vừa bị gán (dirty tracking).
+
+        False nếu gw không còn trong store (bị huỷ/kết thúc khi modal còn mở):
+        không ghi gì và không index lại, tránh gid mồ côi trong by_channel/by_creator.
+        """
+        if self.raw.get(gw.id) is not gw:
+            gw.pop_dirty()
+            return False
+        for field in gw.pop_dirty():
+            self._log({"op": "set", "gid": gw.id, "field": field, "value": gw.get_field(field)})
+        self._reindex(gw)
+        return True
+
+    def join(self, gid: str, uid: int) -> bool:
+        gw = self.raw.get(gid)
+        if gw is None or uid in gw.users:
+            return False
+        self._record({"op": "join", "gid": gid, "uid": uid, "ts": time.time()})
+        return True
+
+    def leave(self, gid: str, uid: int) -> bool:
+        gw = self.raw.get(gid)
+        if gw is None or uid not in gw.users:
+            return False
+        self._record({"op": "leave", "gid": gid, "uid": uid})
+        return True
+
+    # ---------- background flush / checkpoint ----------
+    async def _delayed_flush(self):
+        await asyncio.sleep(FLUSH_INTERVAL)
+        await self.flush()
+
+    def _append_journal(self, lines: List[str]):
+        with open(self.journal_file, "a", encoding="utf-8") as f:
+            f.write("\n".join(lines) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+
+    def _truncate_journal(self):
+        with open(self.journal_file, "w", encoding="utf-8"):
+            pass
 
+    async def flush(self):
+        async with self._lock:
+            # lặp tới khi hết: bản ghi đến trong lúc đang ghi không tạo task flush mới
+            # (task hiện tại chưa xong) nên phải được ghi ngay trong lượt này
+            while True:
+                if self._pending:
+                    lines, self._pending = self._pending, []
+                    await asyncio.to_thread(self._append_journal, lines)
+                if len(self._unckpt) >= COMPACT_THRESHOLD:
+                    await self._checkpoint()
+                if not self._pending:
+                    break
 
-# In-memory mirror of saved data for speed (kept consistent)
-RAW = load_data()
+    async def _checkpoint(self):
+        # các dòng còn chờ ghi journal cũng đi thẳng vào SQLite luôn
+        lines, self._unckpt, self._pending = self._unckpt, [], []
+        if lines:
+            await db.apply_giveaway_journal(lines)
+        await asyncio.to_thread(self._truncate_journal)
+
+    async def checkpoint(self):
+        """Đưa mọi thay đổi vào SQLite ngay (ví dụ trước khi export từ DB)."""
+        async with self._lock:
+            await self._checkpoint()
+
+    async def close(self):
+        await self.checkpoint()
+
+
+# -------------------- Archive (cold tier) --------------------
+class GiveawayArchive:
+    """Giveaway đã kết thúc: segment file append-only + index trong SQLite.
+
+    Mỗi bản ghi (thông tin giveaway, người tham gia int64, pool vé, seed,
+    người thắng, thời điểm) được nén zlib riêng và ghi thành một frame
+    ``[độ dài 4 byte][dữ liệu]`` vào cuối segment hiện tại. Bảng
+    ``giveaway_archive`` chỉ giữ vài cột để lọc (guild, creator, thời điểm)
+    cùng vị trí frame, nên đọc một giveaway là một lần seek + giải nén.
+    """
+
+    _HEADER = struct.Struct(">I")
+
+    def __init__(self, directory: str = ARCHIVE_DIR):
+        self.directory = directory
+        self._segment: Optional[int] = None  # segment đang ghi
+        self._lock = asyncio.Lock()
+        self._cache: "OrderedDict[str, tuple]" = OrderedDict()  # gid -> (byte, record)
+        self.cache_bytes = 0
+
+    def _path(self, segment: int) -> str:
+        return os.path.join(self.directory, f"seg-{segment:06d}.z")
+
+    def _append(self, record: dict):
+        """Dump + nén + ghi frame, cả ba trong thread (giveaway lớn mất cả giây để nén)."""
+        text = _dump_record(record).encode("utf-8")
+        blob = zlib.compress(text)
+        os.makedirs(self.directory, exist_ok=True)
+        if self._segment is None:
+            segments = sorted(f for f in os.listdir(self.directory) if f.startswith("seg-"))
+            self._segment = int(segments[-1][4:10]) if segments else 1
+        path = self._path(self._segment)
+        if os.path.exists(path) and os.path.getsize(path) + len(blob) > ARCHIVE_SEGMENT_SIZE:
+            self._segment += 1
+            path = self._path(self._segment)
+        with open(path, "ab") as f:
+            position = f.tell()
+            f.write(self._HEADER.pack(len(blob)) + blob)
+            f.flush()
+            os.fsync(f.fileno())
+        return self._segment, position, self._HEADER.size + len(blob), len(text)
+
+    def _read(self, segment: int, position: int) -> tuple:
+        with open(self._path(segment), "rb") as f:
+            f.seek(position)
+            (length,) = self._HEADER.unpack(f.read(self._HEADER.size))
+            text = zlib.decompress(f.read(length))
+            return json.loads(text), len(text)
+
+    def _remember(self, record: dict, size: int):
+        gid = record["id"]
+        old = self._cache.pop(gid, None)
+        if old is not None:
+            self.cache_bytes -= old[0]
+        if size > ARCHIVE_CACHE_MAX_RECORD:
+            return
+        self._cache[gid] = (size, record)
+        self.cache_bytes += size
+        while self.cache_bytes > ARCHIVE_CACHE_BYTES:
+            _, (evicted, _) = self._cache.popitem(last=False)
+            self.cache_bytes -= evicted
+
+    async def put(self, record: dict):
+        async with self._lock:
+            segment, position, length, size = await asyncio.to_thread(self._append, record)
+        await db.archive_index({
+            "giveaway_id": record["id"], "guild_id": record.get("guild_id"), "creator_id": record["creator_id"],
+            "channel_id": record["channel_id"], "reward": record["reward"], "participants": record["participants"],
+            "ended_at": record["ended_at"], "segment": segment, "position": position,
+            "length": length,
+        })
+        self._remember(record, size)
+
+    async def get(self, gid: str) -> Optional[dict]:
+        cached = self._cache.get(gid)
+        if cached is not None:
+            self._cache.move_to_end(gid)
+            return cached[1]
+        entry = await db.archive_lookup(gid)
+        if entry is None:
+            return None
+        record, size = await asyncio.to_thread(self._read, entry["segment"], entry["position"])
+        self._remember(record, size)
+        return record
+
+    async def history(self, guild_id: Optional[int] = None, creator_id: Optional[int] = None,
+                      limit: int = 10) -> List[dict]:
+        return await db.archive_list(guild_id=guild_id, creator_id=creator_id, limit=limit)
+
+
+def _b64_array(typecode: str, text: Optional[str]) -> array:
+    arr = array(typecode)
+    if text:
+        arr.frombytes(base64.b64decode(text))
+    return arr
+
+
+# -------------------- Embed update coalescer --------------------
+class EmbedUpdater:
+    """Gom các lần cập nhật embed của cùng một message giveaway.
+
+    ``request`` chỉ đánh dấu giveaway là "bẩn" rồi trả về ngay; mỗi message
+    được edit tối đa một lần mỗi ``window`` giây, và lần edit đó render từ
+    trạng thái mới nhất trong RAW nên gộp được mọi thay đổi đang chờ.
+    """
+
+    def __init__(self, send, window: float = EDIT_WINDOW):
+        self._send = send  # coroutine(gid, status)
+        self.window = window
+        self._pending: dict = {}    # gid -> status mới nhất
+        self._last_edit: dict = {}  # gid -> epoch lần edit gần nhất
+        self._tasks: dict = {}
+        self.stats = {"requested": 0, "sent": 0, "coalesced": 0, "unchanged": 0, "failed": 0}
+
+    def request(self, gid: str, status: str):
+        self.stats["requested"] += 1
+        if gid in self._pending:
+            self.stats["coalesced"] += 1
+            self._pending[gid] = status
+            return
+        self._pending[gid] = status
+        delay = max(0.0, self._last_edit.get(gid, 0.0) + self.window - time.time())
+        self._tasks[gid] = asyncio.get_running_loop().create_task(self._flush_later(gid, delay))
+
+    def discard(self, gid: str):
+        """Bỏ edit đang chờ (giveaway bị huỷ/kết thúc sẽ tự edit lần cuối)."""
+        self._pending.pop(gid, None)
+        self._last_edit.pop(gid, None)
+        task = self._tasks.pop(gid, None)
+        if task:
+            task.cancel()
+
+    async def _flush_later(self, gid: str, delay: float):
+        if delay:
+            await asyncio.sleep(delay)
+        self._tasks.pop(gid, None)
+        status = self._pending.pop(gid, None)
+        if status is None:
+            return
+        self._last_edit[gid] = time.time()
+        try:
+            if await self._send(gid, status):
+                self.stats["sent"] += 1
+            else:
+                self.stats["unchanged"] += 1
+        except Exception:
+            # channel/message may be deleted
+            self.stats["failed"] += 1
+
+    @property
+    def saved(self) -> int:
+        return self.stats["coalesced"] + self.stats["unchanged"]
+
+
+def refresh_interval(remaining: float) -> float:
+    for threshold, interval in REFRESH_TIERS:
+        if remaining > threshold:
+            return interval
+    return COUNTDOWN_INTERVAL
+
+
+class RefreshBudget:
+    """Hàng đợi ưu tiên + giới hạn tốc độ chung cho các lần refresh countdown.
+
+    Giveaway sắp kết thúc được refresh trước; tổng số refresh không vượt
+    ``rate`` lần/giây dù có bao nhiêu giveaway. Một giveaway đã nằm trong
+    hàng đợi thì không bị thêm lần nữa.
+    """
+
+    def __init__(self, send, rate: float = REFRESH_RATE):
+        self._send = send  # callable(gid)
+        self.rate = rate
+        self._heap: list = []
+        self._queued: set = set()
+        self._wakeup = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+        self.stats = {"submitted": 0, "deduped": 0, "sent": 0}
+
+    def __len__(self) -> int:
+        return len(self._queued)
+
+    def start(self):
+        if self._task is None or self._task.done():
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    def stop(self):
+        if self._task:
+            self._task.cancel()
+            self._task = None
+
+    def submit(self, gid: str, end_ts: float):
+        self.stats["submitted"] += 1
+        if gid in self._queued:
+            self.stats["deduped"] += 1
+            return
+        self._queued.add(gid)
+        heapq.heappush(self._heap, (end_ts, gid))
+        self._wakeup.set()
+
+    async def _run(self):
+        while True:
+            if not self._heap:
+                self._wakeup.clear()
+                await self._wakeup.wait()
+                continue
+            _, gid = heapq.heappop(self._heap)
+            self._queued.discard(gid)
+            if gid in RAW:
+                self._send(gid)
+                self.stats["sent"] += 1
+                await asyncio.sleep(1 / self.rate)
+
+
+# -------------------- Winner DM dispatcher --------------------
+class DMDispatcher:
+    """Gửi DM báo thắng song song có giới hạn, thử lại khi 429/5xx.
+
+    Mỗi DM nằm trong bảng dm_outbox (SQLite) trước khi gửi, nên DM chưa gửi
+    xong vẫn còn sau khi restart (``resume``). Kết quả từng người được ghi
+    lại: sent / closed (đóng DM) / failed, làm báo cáo cho người tạo.
+    """
+
+    def __init__(self, resolver, concurrency: int = DM_CONCURRENCY):
+        self.resolver = resolver
+        self._sem = asyncio.Semaphore(concurrency)
+        self.stats = {"sent": 0, "closed": 0, "failed": 0, "retries": 0}
+
+    async def enqueue(self, gid: str, creator_id: int, winners: List[int], embed: discord.Embed):
+        payload = json.dumps(embed.to_dict(), ensure_ascii=False)
+        await db.enqueue_dms([(gid, uid, creator_id, payload) for uid in winners])
+        await self.deliver([(gid, uid, payload, 0) for uid in winners])
+
+    async def resume(self):
+        rows = await db.pending_dms()
+        if rows:
+            await self.deliver(rows)
+
+    async def deliver(self, rows):
+        await asyncio.gather(*(self._deliver_one(*row) for row in rows))
+
+    async def _deliver_one(self, gid: str, uid: int, payload: str, attempts: int):
+        async with self._sem:
+            status, error = "failed", None
+            while attempts < DM_MAX_ATTEMPTS:
+                attempts += 1
+                try:
+                    user = await self.resolver.user(uid)
+                    embed = discord.Embed.from_dict(json.loads(payload))
+                    # set winner avatar as thumbnail (if available)
+                    if user.avatar:
+                        embed.set_thumbnail(url=user.avatar.url)
+                    await user.send(embed=embed)
+                    status, error = "sent", None
+                    break
+                except discord.Forbidden as e:
+                    # DM đóng — thử lại cũng vô ích
+                    status, error = "closed", str(e)
+                    break
+                except discord.HTTPException as e:
+                    error = str(e)
+                    if e.status != 429 and e.status < 500:
+                        break
+                    self.stats["retries"] += 1
+                    await asyncio.sleep(DM_BACKOFF * 2 ** (attempts - 1) + random.random())
+                except Exception as e:
+                    error = str(e)
+                    break
+            self.stats[status] += 1
+            await db.mark_dm(gid, uid, status, attempts, error)
+
+
+# Live Giveaway objects by ID (filled by STORE.load() in cog_load)
+STORE = GiveawayStore()
+RAW = STORE.raw
+ARCHIVE = GiveawayArchive()
+
+
+# -------------------- Giveaway IDs --------------------
+_B32 = "0123456789ABCDEFGHJKMNPQRSTVWXYZ"  # Crockford base32: không có I, L, O, U
+_B32_FIX = str.maketrans("ILO", "110")
+
+
+def _b32(value: int, width: int) -> str:
+    out = []
+    for _ in range(width):
+        value, r = divmod(value, 32)
+        out.append(_B32[r])
+    return "".join(reversed(out))
+
+
+class IdAllocator:
+    """ID giveaway dạng ``G-`` + 6 ký tự giây (từ ID_EPOCH) + 2 ký tự số thứ tự.
+
+    ID tăng dần theo thời gian nên sắp xếp chuỗi = sắp xếp theo lúc tạo.
+    Mỗi giây cấp được 1024 ID; hết thì mượn giây kế tiếp, đồng hồ lùi cũng
+    không cấp lại giá trị cũ. ``taken`` chặn thêm trùng với ID đang sống
+    (ví dụ ID cũ dạng ``G-1234``).
+    """
+
+    SEQ_BITS = 10
+
+    def __init__(self, taken=lambda gid: False):
+        self._taken = taken
+        self._last = -1  # (giây << SEQ_BITS) | seq của ID cấp gần nhất
+
+    def next(self) -> str:
+        now = (int(time.time()) - ID_EPOCH) << self.SEQ_BITS
+        value = max(now, self._last + 1)
+        while True:
+            gid = "G-" + _b32(value >> self.SEQ_BITS, 6) + _b32(value & ((1 << self.SEQ_BITS) - 1), 2)
+            self._last = value
+            if not self._taken(gid):
+                return gid
+            value += 1
+
+
+def normalize_id(text: str) -> str:
+    """Chuẩn hoá ID người dùng gõ: không phân biệt hoa thường, I/L -> 1, O -> 0."""
+    text = text.strip().upper()
+    if text.startswith("G-"):
+        return "G-" + text[2:].translate(_B32_FIX)
+    return text
+
+
+ID_ALLOCATOR = IdAllocator(taken=RAW.__contains__)
 
 
 def generate_id() -> str:
-    return "G-" + "".join(random.choices(string.digits, k=4))
+    return ID_ALLOCATOR.next()
 
 
 def now_vn() -> datetime:
@@ -44,8 +987,60 @@ def now_vn() -> datetime:
 
 
 # -------------------- Giveaway Model --------------------
+def _parse_end_ts(value) -> Optional[int]:
+    """ISO (định dạng lưu trữ) hoặc epoch -> epoch giây; parse đúng một lần."""
+    if value is None or isinstance(value, int):
+        return value
+    try:
+        return int(datetime.fromisoformat(value).timestamp())
+    except (TypeError, ValueError):
+        return None
+
+
+def _format_remaining(seconds: int) -> str:
+    days, rem = divmod(seconds, 86400)
+    hours, rem = divmod(rem, 3600)
+    minutes, secs = divmod(rem, 60)
+    parts = []
+    if days:
+        parts.append(f"{days}d")
+    if hours:
+        parts.append(f"{hours}h")
+    if minutes:
+        parts.append(f"{minutes}m")
+    # giây chỉ hiện khi còn dưới 1 giờ, để text khớp nhịp refresh
+    if not days and not hours:
+        parts.append(f"{secs}s")
+    return " ".join(parts)
+
+
 class Giveaway:
+    """Giveaway sống trong RAM.
+
+    ``end_ts`` là epoch (int) đã parse sẵn. Gán vào các field lưu trữ sẽ
+    đánh dấu "bẩn" (``dirty``) để ``STORE.commit`` chỉ ghi journal những gì
+    thực sự đổi. ``build_embed`` tái dùng Embed cũ khi mọi thứ hiển thị
+    (số người, phần thưởng, số winner, text thời gian còn lại, ...) không đổi.
+    """
+
+    __slots__ = (
+        "id", "creator_id", "reward", "days", "hour", "minute", "num_winners",
+        "users", "channel_id", "message_id", "end_ts", "seed", "rules",
+        "_dirty", "_render_key", "_render_embed", "_eligibility",
+    )
+
+    # thuộc tính -> tên field lưu trữ (journal / SQLite)
+    STORED_FIELDS = {
+        "creator_id": "creator_id", "reward": "reward", "days": "days", "hour": "hour",
+        "minute": "minute", "num_winners": "num_winners", "channel_id": "channel_id",
+        "message_id": "message_id", "end_ts": "end_time", "seed": "seed", "rules": "rules",
+    }
+
     def __init__(self, creator_id: int = None, data: dict = None):
+        object.__setattr__(self, "_dirty", set())
+        self._render_key = None
+        self._render_embed = None
+        self._eligibility = None
         if data:
             # restore
             self.id: str = data["id"]
@@ -55,10 +1050,13 @@ class Giveaway:
             self.hour: int = data["hour"]
             self.minute: int = data["minute"]
             self.num_winners: int = data["num_winners"]
-            self.users: List[int] = data.get("users", [])
+            self.users: ParticipantSet = ParticipantSet.load(data.get("users"))
             self.channel_id: Optional[int] = data.get("channel_id")
             self.message_id: Optional[int] = data.get("message_id")
-            self.end_time_iso: Optional[str] = data.get("end_time")
+            self.end_ts: Optional[int] = _parse_end_ts(data.get("end_time"))
+            self.seed: Optional[str] = data.get("seed")
+            self.rules: Optional[str] = data.get("rules")  # JSON spec của EligibilityRules
+            self._dirty.clear()
         else:
             # new
             self.id = generate_id()
@@ -68,28 +1066,54 @@ class Giveaway:
             self.hour = 18
             self.minute = 0
             self.num_winners = 1
-            self.users = []
+            self.users = ParticipantSet()
             self.channel_id = None
             self.message_id = None
-            self.end_time_iso = None
+            self.end_ts = None
+            self.seed = None
+            self.rules = None
 
+    def __setattr__(self, name, value):
+        object.__setattr__(self, name, value)
+        field = self.STORED_FIELDS.get(name)
+        if field:
+            self._dirty.add(field)
+
+    # ---------- storage fields ----------
+    def get_field(self, field: str):
+        if field == "end_time":
+            return self.end_time_iso
+        return getattr(self, field)
+
+    def load_field(self, field: str, value):
+        """Gán giá trị đọc từ journal/DB (không đánh dấu bẩn)."""
+        if field == "end_time":
+            object.__setattr__(self, "end_ts", _parse_end_ts(value))
+        elif field in self.STORED_FIELDS:
+            object.__setattr__(self, field, value)
+
+    def pop_dirty(self) -> List[str]:
+        fields = list(self._dirty)
+        self._dirty.clear()
+        return fields
+
+    @property
+    def eligibility(self) -> Optional[EligibilityRules]:
+        """Điều kiện tham gia đã biên dịch; chỉ parse lại khi ``rules`` đổi."""
+        if not self.rules:
+            return None
+        if self._eligibility is None or self._eligibility[0] != self.rules:
+            self._eligibility = (self.rules, EligibilityRules(json.loads(self.rules)))
+        return self._eligibility[1]
+
+    # ---------- end time ----------
     @property
     def end_time(self) -> Optional[datetime]:
-        if self.end_time_iso:
-            try:
-                # parse ISO format with tz
-                return datetime.fromisoformat(self.end_time_iso)
-            except:
-                return None
-        return None
+        return datetime.fromtimestamp(self.end_ts, VN_TZ) if self.end_ts is not None else None
 
-    @end_time.setter
-    def end_time(self, dt: Optional[datetime]):
-        if dt:
-            # ensure tz-aware ISO
-            self.end_time_iso = dt.isoformat()
-        else:
-            self.end_time_iso = None
+    @property
+    def end_time_iso(self) -> Optional[str]:
+        return self.end_time.isoformat() if self.end_ts is not None else None
 
     def to_dict(self) -> dict:
         return {
@@ -104,28 +1128,27 @@ class Giveaway:
             "channel_id": self.channel_id,
             "message_id": self.message_id,
             "end_time": self.end_time_iso,
+            "seed": self.seed,
+            "rules": self.rules,
         }
 
     def build_embed(self, creator: Optional[discord.User] = None, status: str = "🛠️ Setup"):
         # remaining time display
         remaining_text = "Chưa bắt đầu"
-        if self.end_time:
-            diff = self.end_time - now_vn()
-            if diff.total_seconds() <= 0:
-                remaining_text = "Đang xử lý..."
-            else:
-                days = diff.days
-                hours, rem = divmod(diff.seconds, 3600)
-                minutes, seconds = divmod(rem, 60)
-                parts = []
-                if days:
-                    parts.append(f"{days}d")
-                if hours:
-                    parts.append(f"{hours}h")
-                if minutes:
-                    parts.append(f"{minutes}m")
-                parts.append(f"{seconds}s")
-                remaining_text = " ".join(parts)
+        if self.end_ts is not None and COUNTDOWN_MODE == "relative":
+            # Discord client tự đếm ngược, không cần edit định kỳ
+            remaining_text = f"<t:{self.end_ts}:R>"
+        elif self.end_ts is not None:
+            remaining = self.end_ts - int(time.time())
+            remaining_text = _format_remaining(remaining) if remaining > 0 else "Đang xử lý..."
+
+        avatar_url = creator.avatar.url if creator and creator.avatar else None
+        key = (
+            status, len(self.users), self.reward, self.num_winners, self.days, self.hour,
+            self.minute, remaining_text, self.seed, self.rules, str(creator) if creator else None, avatar_url,
+        )
+        if key == self._render_key:
+            return self._render_embed
 
         desc = (
             f"**ID:** `{self.id}`\n"
@@ -135,6 +1158,11 @@ class Giveaway:
             f"**Người tham gia:** {len(self.users)}\n"
             f"**Thời gian còn lại:** {remaining_text}"
         )
+        rules = self.eligibility
+        if rules is not None:
+            desc += f"\n**Điều kiện:** {rules.describe()}"
+        if self.seed and self.end_ts is not None:
+            desc += f"\n**Cam kết quay thưởng:** `{seed_commitment(self.seed)}`"
         embed = discord.Embed(
             title=f"🎉 Giveaway · {status}",
             description=desc,
@@ -142,35 +1170,277 @@ class Giveaway:
             timestamp=now_vn(),
         )
         if creator:
-            embed.set_footer(text=f"Tạo bởi {creator}", icon_url=creator.avatar.url if creator and creator.avatar else None)
-            try:
-                if creator and creator.avatar:
-                    embed.set_thumbnail(url=creator.avatar.url)
-            except:
-                pass
+            embed.set_footer(text=f"Tạo bởi {creator}", icon_url=avatar_url)
+            if avatar_url:
+                embed.set_thumbnail(url=avatar_url)
+        self._render_key = key
+        self._render_embed = embed
         return embed
 
 
+# -------------------- Modals --------------------
+async def _giveaway_gone(interaction: discord.Interaction, gw: Giveaway) -> bool:
+    """Giveaway đã bị huỷ/kết thúc trong lúc modal còn mở thì báo cho người dùng."""
+    if RAW.get(gw.id) is gw:
+        return False
+    await interaction.response.send_message("❌ Giveaway không còn tồn tại (đã huỷ hoặc kết thúc).", ephemeral=True)
+    return True
+
+
+class HourModal(discord.ui.Modal, title="Nhập giờ kết thúc (HH:MM)"):
+    time = discord.ui.TextInput(label="Giờ (VN)", placeholder="18:30", max_length=5)
+
+    def __init__(self, cog: "GiveawayCog", gw: Giveaway):
+        super().__init__()
+        self.cog = cog
+        self.gw = gw
+
+    async def on_submit(self, interaction: discord.Interaction):
+        if await _giveaway_gone(interaction, self.gw):
+            return
+        try:
+            h, m = map(int, self.time.value.strip().split(":"))
+            if not (0 <= h < 24 and 0 <= m < 60):
+                raise ValueError
+        except ValueError:
+            await interaction.response.send_message("❌ Giờ không hợp lệ. Dùng định dạng HH:MM (ví dụ 18:30).", ephemeral=True)
+            return
+        self.gw.hour, self.gw.minute = h, m
+        STORE.commit(self.gw)
+        self.cog._queue_embed_update(self.gw)
+        await interaction.response.send_message("✅ Đã cập nhật giờ.", ephemeral=True)
+
+
+class RewardModal(discord.ui.Modal, title="Nhập phần thưởng"):
+    r = discord.ui.TextInput(label="Phần thưởng", placeholder="Nitro / Giftcard / ...", max_length=200)
+
+    def __init__(self, cog: "GiveawayCog", gw: Giveaway):
+        super().__init__()
+        self.cog = cog
+        self.gw = gw
+
+    async def on_submit(self, interaction: discord.Interaction):
+        if await _giveaway_gone(interaction, self.gw):
+            return
+        self.gw.reward = self.r.value.strip() or "Chưa đặt"
+        STORE.commit(self.gw)
+        self.cog._queue_embed_update(self.gw)
+        await interaction.response.send_message("✅ Đã cập nhật phần thưởng.", ephemeral=True)
+
+
+class RulesModal(discord.ui.Modal, title="Điều kiện tham gia"):
+    require = discord.ui.TextInput(label="Role yêu cầu (cần 1 trong các role)", placeholder="ID hoặc @role, cách nhau dấu phẩy", required=False, max_length=400)
+    exclude = discord.ui.TextInput(label="Role bị loại trừ", placeholder="ID hoặc @role, cách nhau dấu phẩy", required=False, max_length=400)
+    account_days = discord.ui.TextInput(label="Tuổi tài khoản tối thiểu (ngày)", placeholder="0", required=False, max_length=4)
+    member_days = discord.ui.TextInput(label="Thời gian trong server tối thiểu (ngày)", placeholder="0", required=False, max_length=4)
+    no_alts = discord.ui.TextInput(label="Chặn tài khoản clone? (có/không)", placeholder="không", required=False, max_length=5)
+
+    def __init__(self, cog: "GiveawayCog", gw: Giveaway):
+        super().__init__()
+        self.cog = cog
+        self.gw = gw
+        rules = gw.eligibility
+        if rules is not None:
+            self.require.default = ", ".join(map(str, rules.require))
+            self.exclude.default = ", ".join(map(str, rules.exclude))
+            self.account_days.default = str(rules.min_account // 86400)
+            self.member_days.default = str(rules.min_member // 86400)
+            self.no_alts.default = "có" if rules.no_alts else "không"
+
+    async def on_submit(self, interaction: discord.Interaction):
+        if await _giveaway_gone(interaction, self.gw):
+            return
+        try:
+            spec = {
+                "require_roles": [int(x) for x in re.findall(r"\d{15,20}", self.require.value)],
+                "exclude_roles": [int(x) for x in re.findall(r"\d{15,20}", self.exclude.value)],
+                "min_account_days": int(self.account_days.value.strip() or 0),
+                "min_member_days": int(self.member_days.value.strip() or 0),
+                "no_alts": self.no_alts.value.strip().lower() in ("có", "co", "yes", "y", "1"),
+            }
+        except ValueError:
+            await interaction.response.send_message("❌ Số ngày không hợp lệ.", ephemeral=True)
+            return
+        self.gw.rules = json.dumps(spec, separators=(",", ":")) if any(spec.values()) else None
+        STORE.commit(self.gw)
+        self.cog._queue_embed_update(self.gw)
+        await interaction.response.send_message("✅ Đã cập nhật điều kiện tham gia.", ephemeral=True)
+
+
+# -------------------- Persistent buttons --------------------
+# Các nút được đăng ký bằng bot.add_dynamic_items nên vẫn hoạt động sau restart;
+# discord.py chỉ gọi callback cho custom_id khớp template, không qua on_interaction.
+CREATOR_ACTIONS = {"plusday", "minusday", "sethour", "setreward", "setrules", "pluswin", "minuswin", "start", "cancel", "forceend"}
+
+
+class GiveawayButton(discord.ui.DynamicItem[discord.ui.Button], template=r"(?P<gid>G-[^|]+)\|(?P<action>[a-z]+)"):
+    def __init__(self, gid: str, action: str, label: Optional[str] = None,
+                 style: discord.ButtonStyle = discord.ButtonStyle.secondary):
+        super().__init__(discord.ui.Button(label=label, style=style, custom_id=f"{gid}|{action}"))
+        self.gid = gid
+        self.action = action
+
+    @classmethod
+    async def from_custom_id(cls, interaction: discord.Interaction, item: discord.ui.Button, match):
+        return cls(match["gid"], match["action"])
+
+    async def callback(self, interaction: discord.Interaction):
+        cog = interaction.client.get_cog("GiveawayCog")
+        if cog:
+            await cog.dispatch(interaction, self.gid, self.action)
+
+
+class ParticipantsPageButton(discord.ui.DynamicItem[discord.ui.Button],
+                             template=r"(?P<gid>G-[^|]+)\|participants\|(?P<dir>[np])(?P<uid>\d+):(?P<pos>\d+)"):
+    """Nút Prev/Next; cursor = (hướng, user làm mốc, vị trí dự phòng nếu mốc đã rời)."""
+
+    def __init__(self, gid: str, direction: str, uid: int, pos: int, label: Optional[str] = None):
+        super().__init__(discord.ui.Button(label=label, style=discord.ButtonStyle.secondary,
+                                           custom_id=f"{gid}|participants|{direction}{uid}:{pos}"))
+        self.gid = gid
+        self.cursor = (direction, uid, pos)
+
+    @classmethod
+    async def from_custom_id(cls, interaction: discord.Interaction, item: discord.ui.Button, match):
+        return cls(match["gid"], match["dir"], int(match["uid"]), int(match["pos"]))
+
+    async def callback(self, interaction: discord.Interaction):
+        cog = interaction.client.get_cog("GiveawayCog")
+        if not cog:
+            return
+        gw = await cog._lookup_any(self.gid)
+        if gw is None:
+            await interaction.response.send_message("❌ Giveaway không tồn tại.", ephemeral=True)
+            return
+        await cog._respond_participants(interaction, gw, cursor=self.cursor)
+
+
+class ParticipantsExportButton(discord.ui.DynamicItem[discord.ui.Button],
+                               template=r"(?P<gid>G-[^|]+)\|export\|(?P<fmt>csv|ndjson)"):
+    def __init__(self, gid: str, fmt: str):
+        super().__init__(discord.ui.Button(label=f"📥 {fmt.upper()}", style=discord.ButtonStyle.primary,
+                                           custom_id=f"{gid}|export|{fmt}"))
+        self.gid = gid
+        self.fmt = fmt
+
+    @classmethod
+    async def from_custom_id(cls, interaction: discord.Interaction, item: discord.ui.Button, match):
+        return cls(match["gid"], match["fmt"])
+
+    async def callback(self, interaction: discord.Interaction):
+        cog = interaction.client.get_cog("GiveawayCog")
+        if cog:
+            await cog._export_participants(interaction, self.gid, self.fmt)
+
+
 # -------------------- Cog --------------------
 class GiveawayCog(commands.Cog):
     def __init__(self, bot: commands.Bot):
         self.bot = bot
-        # restore in-memory RAW and restart countdown tasks
-        # RAW is already loaded from JSON at import
-        for gid, data in list(RAW.items()):
-            # schedule countdown only if has end_time
-            gw = Giveaway(data=data)
-            if gw.end_time:
-                # try to re-schedule countdown
-                self.bot.loop.create_task(self._ensure_countdown(gw))
+        self.resolver = get_resolver(bot)
+        self.scheduler = TimerHeap(self._on_timer, label="giveaway")
+        self.updater = EmbedUpdater(self._send_embed_update)
+        self.dm_dispatcher = DMDispatcher(self.resolver)
+        self._draws: "OrderedDict[str, dict]" = OrderedDict()  # gid -> pool + seed cho /reroll
+        self.refresh_budget = RefreshBudget(lambda gid: self.updater.request(gid, "🔥 Đang diễn ra"))
+        self._last_render: dict = {}  # gid -> (title, description, running) lần edit gần nhất
+        self._recovery_task: Optional[asyncio.Task] = None
+        self._background: set = set()  # task gửi DM chạy nền, giữ tham chiếu tới khi xong
+        self._member_indexes: dict = {}  # guild_id -> MemberIndex cho điều kiện tham gia
+        self.recovery: dict = {}  # thống kê lần khôi phục gần nhất
+        # action trong custom_id "<gid>|<action>" -> handler
+        self._handlers = {
+            "plusday": self._on_plusday,
+            "minusday": self._on_minusday,
+            "sethour": self._on_sethour,
+            "setreward": self._on_setreward,
+            "setrules": self._on_setrules,
+            "pluswin": self._on_pluswin,
+            "minuswin": self._on_minuswin,
+            "start": self._on_start,
+            "cancel": self._on_cancel,
+            "forceend": self._on_forceend,
+            "join": self._on_join,
+            "leave": self._on_leave,
+        }
+
+    async def cog_load(self):
+        # restore in-memory RAW (SQLite + journal); timers are re-armed after on_ready
+        await STORE.load()
+        self.bot.add_dynamic_items(GiveawayButton, ParticipantsPageButton, ParticipantsExportButton)
+        self.refresh_budget.start()
+        self._recovery_task = self.bot.loop.create_task(self._recover())
+
+    def _spawn(self, coro):
+        task = self.bot.loop.create_task(coro)
+        self._background.add(task)
+        task.add_done_callback(self._background.discard)
+
+    async def _recover(self):
+        """Sau on_ready: bỏ giveaway mất kênh, dựng lịch một lượt, kết thúc giveaway quá hạn theo đợt."""
+        await self.bot.wait_until_ready()
+        started = time.perf_counter()
+
+        # mỗi kênh kiểm tra một lần (thường trúng cache gateway), không fetch từng message;
+        # message bị xoá sẽ được phát hiện ở lần edit đầu tiên (xem _send_embed_update)
+        # chỉ NotFound mới là kênh đã mất; Forbidden/lỗi khác có thể chỉ là tạm thời
+        # (đổi quyền, Discord lỗi) nên giữ giveaway, lần edit/kết thúc sau sẽ thử lại
+        orphaned = unreachable = 0
+        for channel_id in list(STORE.by_channel):
+            try:
+                await self.resolver.channel(channel_id)
+            except discord.NotFound:
+                for gw in STORE.in_channel(channel_id):
+                    self._drop_orphan(gw)
+                    orphaned += 1
+            except discord.HTTPException as e:
+                unreachable += 1
+                print(f"⚠️ Chưa truy cập được kênh {channel_id} khi khôi phục, giữ giveaway: {e}")
+
+        now = time.time()
+        overdue, timers = [], []
+        for gw in RAW.values():
+            if gw.end_ts is None:
+                continue
+            if gw.end_ts <= now:
+                overdue.append(gw)
+                continue
+            timers.append(((gw.id, "end"), gw.end_ts))
+            refresh_ts = self._next_refresh(gw.end_ts, now)
+            if refresh_ts is not None:
+                timers.append(((gw.id, "refresh"), refresh_ts))
+        running = sum(1 for (_, kind), _ in timers if kind == "end")
+        self.scheduler.schedule_many(timers)
+        self.scheduler.start()
+        # DM báo thắng còn dở từ lần chạy trước
+        self._spawn(self.dm_dispatcher.resume())
+        scheduled_in = time.perf_counter() - started
+
+        # giveaway hết hạn lúc bot tắt: kết thúc theo thứ tự hạn chót, từng đợt nhỏ
+        overdue.sort(key=lambda gw: gw.end_ts)
+        for i in range(0, len(overdue), RECOVERY_BATCH):
+            if i:
+                await asyncio.sleep(RECOVERY_PAUSE)
+            batch = overdue[i:i + RECOVERY_BATCH]
+            for gw, result in zip(batch, await asyncio.gather(*(self._end_giveaway(gw) for gw in batch), return_exceptions=True)):
+                if isinstance(result, Exception):
+                    print(f"❌ Lỗi kết thúc giveaway {gw.id} khi khôi phục: {result}")
+
+        self.recovery = {
+            "running": running, "overdue": len(overdue), "orphaned": orphaned, "unreachable": unreachable,
+            "schedule_ms": scheduled_in * 1000, "total_s": time.perf_counter() - started,
+        }
+        print(
+            f"♻️ Khôi phục giveaway: {len(RAW)} còn lại, {len(overdue)} quá hạn đã kết thúc, "
+            f"{orphaned} mất kênh · lịch {scheduled_in * 1000:.1f} ms, tổng {self.recovery['total_s']:.1f} s"
+        )
 
     # ---------- Slash: /scgiveaway (create/setup) ----------
     @app_commands.command(name="scgiveaway", description="Tạo giveaway mới (mở menu setup)")
     async def scgiveaway(self, interaction: discord.Interaction):
         # create new giveaway object and persist
         gw = Giveaway(creator_id=interaction.user.id)
-        RAW[gw.id] = gw.to_dict()
-        save_data(RAW)
+        STORE.put(gw)
 
         # send setup embed + view
         embed = gw.build_embed(creator=interaction.user, status="🛠️ Setup")
@@ -178,22 +1448,72 @@ class GiveawayCog(commands.Cog):
         msg = await interaction.channel.send(embed=embed, view=view)
         gw.channel_id = msg.channel.id
         gw.message_id = msg.id
-        RAW[gw.id] = gw.to_dict()
-        save_data(RAW)
+        STORE.commit(gw)
 
         await interaction.response.send_message(f"✅ Giveaway `{gw.id}` đã tạo. Kiểm tra message ở kênh này.", ephemeral=True)
 
     # ---------- Slash: /scgiveawaycheck <id> (participants) ----------
     @app_commands.command(name="scgiveawaycheck", description="Xem danh sách người tham gia giveaway theo ID")
-    @app_commands.describe(giveaway_id="ID giveaway (ví dụ G-1234)")
+    @app_commands.describe(giveaway_id="ID giveaway (ví dụ G-0ABC1234), ID hoặc link message giveaway")
     async def scgiveawaycheck(self, interaction: discord.Interaction, giveaway_id: str):
-        data = RAW.get(giveaway_id)
-        if not data:
+        gw = self._find_giveaway(giveaway_id) or await self._lookup_any(normalize_id(giveaway_id))
+        if not gw:
             await interaction.response.send_message("❌ Không tìm thấy giveaway với ID đó.", ephemeral=True)
             return
-        gw = Giveaway(data=data)
         # show first page (page 1)
-        await self._respond_participants(interaction, gw, page=1)
+        await self._respond_participants(interaction, gw)
+
+    # ---------- Slash: /scgiveawaylist (giveaways in this channel) ----------
+    @app_commands.command(name="scgiveawaylist", description="Xem các giveaway đang có trong kênh này")
+    async def scgiveawaylist(self, interaction: discord.Interaction):
+        giveaways = STORE.in_channel(interaction.channel_id)
+        if not giveaways:
+            await interaction.response.send_message("📭 Kênh này không có giveaway nào.", ephemeral=True)
+            return
+        lines = []
+        for gw in giveaways[:25]:
+            state = f"kết thúc <t:{gw.end_ts}:R>" if gw.end_ts is not None else "đang setup"
+            lines.append(f"`{gw.id}` · {gw.reward} · {len(gw.users)} người · {state}")
+        embed = discord.Embed(
+            title=f"🎉 Giveaway trong kênh ({len(giveaways)})",
+            description="\n".join(lines),
+            color=discord.Color.blurple(),
+        )
+        await interaction.response.send_message(embed=embed, ephemeral=True)
+
+    # ---------- Slash: /scgiveawayreport <id> (winner DM delivery) ----------
+    @app_commands.command(name="scgiveawayreport", description="Xem báo cáo gửi DM cho người thắng (chỉ người tạo)")
+    @app_commands.describe(giveaway_id="ID giveaway đã kết thúc")
+    async def scgiveawayreport(self, interaction: discord.Interaction, giveaway_id: str):
+        giveaway_id = normalize_id(giveaway_id)
+        report = await db.dm_report(giveaway_id)
+        if not report:
+            await interaction.response.send_message("❌ Không có báo cáo DM cho giveaway này.", ephemeral=True)
+            return
+        if interaction.user.id != report["creator_id"]:
+            await interaction.response.send_message("❌ Chỉ người tạo giveaway mới xem được báo cáo.", ephemeral=True)
+            return
+        counts = report["counts"]
+        embed = discord.Embed(
+            title=f"📬 Báo cáo DM · {giveaway_id}",
+            description=(
+                f"✅ Đã gửi: {counts.get('sent', 0)}\n"
+                f"⏳ Đang chờ: {counts.get('pending', 0)}\n"
+                f"🔒 Đóng DM: {counts.get('closed', 0)}\n"
+                f"❌ Lỗi: {counts.get('failed', 0)}"
+            ),
+            color=discord.Color.blurple(),
+            timestamp=now_vn()
+        )
+        if report["problems"]:
+            lines = [
+                f"<@{uid}> — {'đóng DM' if status == 'closed' else 'lỗi'} ({attempts} lần)"
+                for uid, status, attempts, _ in report["problems"][:20]
+            ]
+            if len(report["problems"]) > 20:
+                lines.append(f"... và {len(report['problems']) - 20} người khác")
+            embed.add_field(name="Chưa nhận được DM", value="\n".join(lines), inline=False)
+        await interaction.response.send_message(embed=embed, ephemeral=True)
 
     # ---------- Build views: setup & join ----------
     def _build_setup_view(self, gw: Giveaway) -> discord.ui.View:
@@ -201,18 +1521,19 @@ class GiveawayCog(commands.Cog):
         gid = gw.id
 
         # row 1: day +/- , hour modal
-        v.add_item(discord.ui.Button(label="+Ngày", style=discord.ButtonStyle.success, custom_id=f"{gid}|plusday"))
-        v.add_item(discord.ui.Button(label="-Ngày", style=discord.ButtonStyle.danger, custom_id=f"{gid}|minusday"))
-        v.add_item(discord.ui.Button(label="⏰ Chỉnh giờ", style=discord.ButtonStyle.primary, custom_id=f"{gid}|sethour"))
+        v.add_item(GiveawayButton(gid, "plusday", label="+Ngày", style=discord.ButtonStyle.success))
+        v.add_item(GiveawayButton(gid, "minusday", label="-Ngày", style=discord.ButtonStyle.danger))
+        v.add_item(GiveawayButton(gid, "sethour", label="⏰ Chỉnh giờ", style=discord.ButtonStyle.primary))
 
         # row 2: reward modal, winners +/-
-        v.add_item(discord.ui.Button(label="🎁 Chỉnh phần thưởng", style=discord.ButtonStyle.secondary, custom_id=f"{gid}|setreward"))
-        v.add_item(discord.ui.Button(label="+Winner", style=discord.ButtonStyle.success, custom_id=f"{gid}|pluswin"))
-        v.add_item(discord.ui.Button(label="-Winner", style=discord.ButtonStyle.danger, custom_id=f"{gid}|minuswin"))
+        v.add_item(GiveawayButton(gid, "setreward", label="🎁 Chỉnh phần thưởng", style=discord.ButtonStyle.secondary))
+        v.add_item(GiveawayButton(gid, "pluswin", label="+Winner", style=discord.ButtonStyle.success))
+        v.add_item(GiveawayButton(gid, "minuswin", label="-Winner", style=discord.ButtonStyle.danger))
+        v.add_item(GiveawayButton(gid, "setrules", label="📋 Điều kiện", style=discord.ButtonStyle.secondary))
 
         # row 3: start / cancel
-        v.add_item(discord.ui.Button(label="🚀 Bắt đầu Giveaway", style=discord.ButtonStyle.success, custom_id=f"{gid}|start"))
-        v.add_item(discord.ui.Button(label="❌ Huỷ Giveaway", style=discord.ButtonStyle.danger, custom_id=f"{gid}|cancel"))
+        v.add_item(GiveawayButton(gid, "start", label="🚀 Bắt đầu Giveaway", style=discord.ButtonStyle.success))
+        v.add_item(GiveawayButton(gid, "cancel", label="❌ Huỷ Giveaway", style=discord.ButtonStyle.danger))
         return v
 
     def _build_join_view(self, gw: Giveaway) -> discord.ui.View:
@@ -221,213 +1542,239 @@ class GiveawayCog(commands.Cog):
         # Show Join / Leave. We'll control enabled/disabled based on global state:
         joined_any = len(gw.users) > 0  # just a heuristic; we will keep both buttons visible.
         # Join (green)
-        v.add_item(discord.ui.Button(label="🎉 Tham gia", style=discord.ButtonStyle.success, custom_id=f"{gid}|join"))
+        v.add_item(GiveawayButton(gid, "join", label="🎉 Tham gia", style=discord.ButtonStyle.success))
         # Leave (red)
-        v.add_item(discord.ui.Button(label="🚪 Rời", style=discord.ButtonStyle.danger, custom_id=f"{gid}|leave"))
+        v.add_item(GiveawayButton(gid, "leave", label="🚪 Rời", style=discord.ButtonStyle.danger))
         # Also add manual end (for creator)
-        v.add_item(discord.ui.Button(label="🛑 Kết thúc (Creator only)", style=discord.ButtonStyle.secondary, custom_id=f"{gid}|forceend"))
+        v.add_item(GiveawayButton(gid, "forceend", label="🛑 Kết thúc (Creator only)", style=discord.ButtonStyle.secondary))
         return v
 
-    # ---------- Global interaction handler ----------
-    @commands.Cog.listener()
-    async def on_interaction(self, interaction: discord.Interaction):
-        # only handle component interactions (buttons)
-        if interaction.type != discord.InteractionType.component:
-            return
-
-        cid = interaction.data.get("custom_id")
-        if not cid or "|" not in cid:
+    # ---------- Component router (GiveawayButton -> handler) ----------
+    async def dispatch(self, interaction: discord.Interaction, gid: str, action: str):
+        handler = self._handlers.get(action)
+        if handler is None:
             return
-        gid, action = cid.split("|", 1)
-        data = RAW.get(gid)
-        if not data:
+        gw = RAW.get(gid)
+        if gw is None:
             await interaction.response.send_message("❌ Giveaway không tồn tại hoặc đã kết thúc.", ephemeral=True)
             return
-
-        gw = Giveaway(data=data)
-
-        # -------------------------------------------
         # Actions that only creator can do (setup/start/cancel/forceend)
         # join/leave allowed for any user
-        if action in ("plusday", "minusday", "sethour", "setreward", "pluswin", "minuswin", "start", "cancel", "forceend"):
-            if interaction.user.id != gw.creator_id:
-                await interaction.response.send_message("❌ Chỉ người tạo giveaway mới làm được thao tác này.", ephemeral=True)
-                return
-
-        # ---------- Setup actions ----------
-        # +/- day
-        if action == "plusday":
-            gw.days = gw.days + 1
-            RAW[gw.id] = gw.to_dict(); save_data(RAW)
-            await self._edit_message_embed(gw)
-            await interaction.response.defer()
-            return
-        if action == "minusday":
-            gw.days = max(0, gw.days - 1)
-            RAW[gw.id] = gw.to_dict(); save_data(RAW)
-            await self._edit_message_embed(gw)
-            await interaction.response.defer()
-            return
-
-        # set hour: modal
-        if action == "sethour":
-            class HourModal(discord.ui.Modal, title="Nhập giờ kết thúc (HH:MM)"):
-                time = discord.ui.TextInput(label="Giờ (VN)", placeholder="18:30", max_length=5)
-                async def on_submit(self_modal, modal_inter: discord.Interaction):
-                    try:
-                        h_str = self_modal.time.value.strip()
-                        h, m = map(int, h_str.split(":"))
-                        if not (0 <= h < 24 and 0 <= m < 60):
-                            raise ValueError
-                        gw.hour, gw.minute = h, m
-                        RAW[gw.id] = gw.to_dict(); save_data(RAW)
-                        await self._edit_message_embed(gw)
-                        await modal_inter.response.send_message("✅ Đã cập nhật giờ.", ephemeral=True)
-                    except Exception:
-                        await modal_inter.response.send_message("❌ Giờ không hợp lệ. Dùng định dạng HH:MM (ví dụ 18:30).", ephemeral=True)
-            await interaction.response.send_modal(HourModal())
-            return
-
-        # set reward modal
-        if action == "setreward":
-            class RewardModal(discord.ui.Modal, title="Nhập phần thưởng"):
-                r = discord.ui.TextInput(label="Phần thưởng", placeholder="Nitro / Giftcard / ...", max_length=200)
-                async def on_submit(self_modal, modal_inter: discord.Interaction):
-                    gw.reward = self_modal.r.value.strip() or "Chưa đặt"
-                    RAW[gw.id] = gw.to_dict(); save_data(RAW)
-                    await self._edit_message_embed(gw)
-                    await modal_inter.response.send_message("✅ Đã cập nhật phần thưởng.", ephemeral=True)
-            await interaction.response.send_modal(RewardModal())
-            return
-
-        # winners +/-
-        if action == "pluswin":
-            gw.num_winners += 1
-            RAW[gw.id] = gw.to_dict(); save_data(RAW)
-            await self._edit_message_embed(gw)
-            await interaction.response.defer()
-            return
-        if action == "minuswin":
-            gw.num_winners = max(1, gw.num_winners - 1)
-            RAW[gw.id] = gw.to_dict(); save_data(RAW)
-            await self._edit_message_embed(gw)
-            await interaction.response.defer()
-            return
-
-        # start
-        if action == "start":
-            # compute end_time based on days + hour/minute in VN timezone
-            et = now_vn() + timedelta(days=gw.days)
-            et = et.replace(hour=gw.hour, minute=gw.minute, second=0, microsecond=0)
-            gw.end_time = et
-            RAW[gw.id] = gw.to_dict(); save_data(RAW)
-            # edit message to join view & start countdown
-            await self._edit_message_embed(gw, status="🔥 Đang diễn ra")
-            self.bot.loop.create_task(self._ensure_countdown(gw))
-            await interaction.response.send_message(f"🚀 Giveaway `{gw.id}` đã bắt đầu.", ephemeral=True)
-            return
-
-        # cancel
-        if action == "cancel":
-            # edit original message, remove view, delete data
-            await self._edit_message_to_cancelled(gw)
-            RAW.pop(gw.id, None); save_data(RAW)
-            await interaction.response.send_message("❌ Giveaway đã bị huỷ và xóa.", ephemeral=True)
-            return
-
-        # force end (creator)
-        if action == "forceend":
-            await self._end_giveaway(gw, forced=True)
-            await interaction.response.send_message(f"🛑 Giveaway `{gw.id}` đã được kết thúc bởi người tạo.", ephemeral=True)
-            return
-
-        # ---------- Join / Leave ----------
-        if action == "join":
-            if interaction.user.id not in gw.users:
-                gw.users.append(interaction.user.id)
-                RAW[gw.id] = gw.to_dict(); save_data(RAW)
-                await self._edit_message_embed(gw, status="🔥 Đang diễn ra")
-                await interaction.response.send_message("🎉 Bạn đã tham gia giveaway!", ephemeral=True)
-            else:
-                await interaction.response.send_message("ℹ️ Bạn đã tham gia rồi.", ephemeral=True)
+        if action in CREATOR_ACTIONS and interaction.user.id != gw.creator_id:
+            await interaction.response.send_message("❌ Chỉ người tạo giveaway mới làm được thao tác này.", ephemeral=True)
             return
-
-        if action == "leave":
-            if interaction.user.id in gw.users:
-                gw.users.remove(interaction.user.id)
-                RAW[gw.id] = gw.to_dict(); save_data(RAW)
-                await self._edit_message_embed(gw, status="🔥 Đang diễn ra")
-                await interaction.response.send_message("🚪 Bạn đã rời giveaway.", ephemeral=True)
-            else:
-                await interaction.response.send_message("ℹ️ Bạn chưa tham gia giveaway.", ephemeral=True)
+        # hết giờ nhưng chưa quay (ví dụ đang chờ tới lượt khôi phục)
+        if action in ("join", "leave") and gw.end_ts is not None and gw.end_ts <= time.time():
+            await interaction.response.send_message("⏳ Giveaway đã hết giờ, đang chờ quay thưởng.", ephemeral=True)
             return
+        await handler(interaction, gw)
+
+    # ---------- Setup actions ----------
+    async def _on_plusday(self, interaction: discord.Interaction, gw: Giveaway):
+        gw.days += 1
+        STORE.commit(gw)
+        self._queue_embed_update(gw)
+        await interaction.response.defer()
+
+    async def _on_minusday(self, interaction: discord.Interaction, gw: Giveaway):
+        gw.days = max(0, gw.days - 1)
+        STORE.commit(gw)
+        self._queue_embed_update(gw)
+        await interaction.response.defer()
+
+    async def _on_sethour(self, interaction: discord.Interaction, gw: Giveaway):
+        await interaction.response.send_modal(HourModal(self, gw))
+
+    async def _on_setreward(self, interaction: discord.Interaction, gw: Giveaway):
+        await interaction.response.send_modal(RewardModal(self, gw))
+
+    async def _on_setrules(self, interaction: discord.Interaction, gw: Giveaway):
+        await interaction.response.send_modal(RulesModal(self, gw))
+
+    async def _on_pluswin(self, interaction: discord.Interaction, gw: Giveaway):
+        gw.num_winners += 1
+        STORE.commit(gw)
+        self._queue_embed_update(gw)
+        await interaction.response.defer()
+
+    async def _on_minuswin(self, interaction: discord.Interaction, gw: Giveaway):
+        gw.num_winners = max(1, gw.num_winners - 1)
+        STORE.commit(gw)
+        self._queue_embed_update(gw)
+        await interaction.response.defer()
+
+    async def _on_start(self, interaction: discord.Interaction, gw: Giveaway):
+        # compute end_time based on days + hour/minute in VN timezone
+        et = now_vn() + timedelta(days=gw.days)
+        et = et.replace(hour=gw.hour, minute=gw.minute, second=0, microsecond=0)
+        gw.end_ts = int(et.timestamp())
+        # seed bí mật, chỉ công bố sha256(seed) cho tới khi quay thưởng
+        gw.seed = secrets.token_hex(16)
+        STORE.commit(gw)
+        # edit message to join view & start countdown
+        self._queue_embed_update(gw, status="🔥 Đang diễn ra")
+        self._schedule(gw)
+        await interaction.response.send_message(f"🚀 Giveaway `{gw.id}` đã bắt đầu.", ephemeral=True)
+
+    async def _on_cancel(self, interaction: discord.Interaction, gw: Giveaway):
+        # edit original message, remove view, delete data
+        self._unschedule(gw.id)
+        await self._edit_message_to_cancelled(gw)
+        STORE.delete(gw.id)
+        await interaction.response.send_message("❌ Giveaway đã bị huỷ và xóa.", ephemeral=True)
+
+    async def _on_forceend(self, interaction: discord.Interaction, gw: Giveaway):
+        # quay thưởng + archive + gửi kết quả có thể quá 3 giây với giveaway lớn: defer trước
+        await interaction.response.defer(ephemeral=True, thinking=True)
+        await self._end_giveaway(gw, forced=True)
+        await interaction.followup.send(f"🛑 Giveaway `{gw.id}` đã được kết thúc bởi người tạo.", ephemeral=True)
+
+    # ---------- Join / Leave ----------
+    async def _on_join(self, interaction: discord.Interaction, gw: Giveaway):
+        rules = gw.eligibility
+        if rules is not None and interaction.guild is not None and interaction.user.id not in gw.users:
+            index = self._member_index(interaction.guild)
+            if index.row(interaction.user.id) is None and isinstance(interaction.user, discord.Member):
+                index.upsert(interaction.user)
+            reason = rules.check(index, interaction.user.id)
+            if reason:
+                await interaction.response.send_message(f"❌ {reason}", ephemeral=True)
+                return
+        if STORE.join(gw.id, interaction.user.id):
+            self._queue_embed_update(gw, status="🔥 Đang diễn ra")
+            await interaction.response.send_message("🎉 Bạn đã tham gia giveaway!", ephemeral=True)
+        else:
+            await interaction.response.send_message("ℹ️ Bạn đã tham gia rồi.", ephemeral=True)
+
+    async def _on_leave(self, interaction: discord.Interaction, gw: Giveaway):
+        if STORE.leave(gw.id, interaction.user.id):
+            self._queue_embed_update(gw, status="🔥 Đang diễn ra")
+            await interaction.response.send_message("🚪 Bạn đã rời giveaway.", ephemeral=True)
+        else:
+            await interaction.response.send_message("ℹ️ Bạn chưa tham gia giveaway.", ephemeral=True)
 
     # ---------- Helper: edit message embed (setup or running) ----------
-    async def _edit_message_embed(self, gw: Giveaway, status: str = "🛠️ Setup"):
+    def _queue_embed_update(self, gw: Giveaway, status: str = "🛠️ Setup"):
+        self.updater.request(gw.id, status)
+
+    def _partial_message(self, gw: Giveaway) -> discord.PartialMessage:
+        # không cần fetch_channel/fetch_message: edit thẳng theo ID
+        return self.bot.get_partial_messageable(gw.channel_id).get_partial_message(gw.message_id)
+
+    async def _send_embed_update(self, gid: str, status: str) -> bool:
+        gw = RAW.get(gid)
+        if not gw:
+            return False
+        creator = await self.resolver.user(gw.creator_id)
+        if gw.end_ts is not None:
+            embed = gw.build_embed(creator=creator, status=status if status else "🔥 Đang diễn ra")
+            view = self._build_join_view(gw)
+        else:
+            embed = gw.build_embed(creator=creator, status=status)
+            view = self._build_setup_view(gw)
+        # nội dung y hệt lần trước -> khỏi edit
+        rendered = (embed.title, embed.description, gw.end_ts is not None)
+        if self._last_render.get(gid) == rendered:
+            return False
         try:
-            channel = self.bot.get_channel(gw.channel_id) or await self.bot.fetch_channel(gw.channel_id)
-            msg = await channel.fetch_message(gw.message_id)
-            creator = await self.bot.fetch_user(gw.creator_id)
-            if gw.end_time:
-                embed = gw.build_embed(creator=creator, status=status if status else "🔥 Đang diễn ra")
-                view = self._build_join_view(gw)
-            else:
-                embed = gw.build_embed(creator=creator, status=status)
-                view = self._build_setup_view(gw)
-            await msg.edit(embed=embed, view=view)
-        except Exception:
-            # ignore (channel/message may be deleted)
-            pass
+            await self._partial_message(gw).edit(embed=embed, view=view)
+        except discord.NotFound:
+            # message/kênh giveaway đã bị xoá -> bỏ giveaway luôn
+            self._drop_orphan(gw)
+            return False
+        self._last_render[gid] = rendered
+        return True
+
+    def _drop_orphan(self, gw: Giveaway):
+        self._unschedule(gw.id)
+        self.updater.discard(gw.id)
+        self._last_render.pop(gw.id, None)
+        STORE.delete(gw.id)
+        # vẫn lưu vào archive để còn tra người tham gia, không xoá mất dữ liệu
+        self._spawn(self._archive(gw, None, None, None, []))
+        print(f"🗑️ Giveaway {gw.id} mất message/kênh, đã chuyển vào archive.")
 
     async def _edit_message_to_cancelled(self, gw: Giveaway):
+        self.updater.discard(gw.id)
+        self._last_render.pop(gw.id, None)
         try:
-            channel = self.bot.get_channel(gw.channel_id) or await self.bot.fetch_channel(gw.channel_id)
-            msg = await channel.fetch_message(gw.message_id)
             embed = discord.Embed(title="❌ Giveaway đã bị huỷ", color=discord.Color.red(), timestamp=now_vn())
-            await msg.edit(embed=embed, view=None)
+            await self._partial_message(gw).edit(embed=embed, view=None)
         except Exception:
             pass
 
     # ---------- Countdown & end ----------
-    async def _ensure_countdown(self, gw: Giveaway):
-        # If GW removed while scheduling, quit
-        while True:
-            # refresh from RAW to get updates
-            raw = RAW.get(gw.id)
-            if not raw:
-                return
-            gw = Giveaway(data=raw)
-            et = gw.end_time
-            if not et:
-                return
-            now = now_vn()
-            remaining = (et - now).total_seconds()
-            if remaining <= 0:
-                await self._end_giveaway(gw)
-                return
-            # update embed countdown on message
-            await self._edit_message_embed(gw, status="🔥 Đang diễn ra")
-            # sleep shorter when near end to be responsive
-            await asyncio.sleep(min(COUNTDOWN_INTERVAL, max(1, remaining)))
+    def _schedule(self, gw: Giveaway):
+        end_ts = gw.end_ts
+        self.scheduler.schedule((gw.id, "end"), end_ts)
+        self._schedule_refresh(gw.id, end_ts)
+
+    @staticmethod
+    def _next_refresh(end_ts: float, now: float) -> Optional[float]:
+        if COUNTDOWN_MODE == "relative":
+            return None
+        refresh_ts = now + refresh_interval(end_ts - now)
+        return refresh_ts if refresh_ts < end_ts else None
+
+    def _schedule_refresh(self, gid: str, end_ts: float):
+        refresh_ts = self._next_refresh(end_ts, time.time())
+        if refresh_ts is not None:
+            self.scheduler.schedule((gid, "refresh"), refresh_ts)
+
+    def _unschedule(self, gid: str):
+        self.scheduler.cancel((gid, "end"))
+        self.scheduler.cancel((gid, "refresh"))
+
+    async def _on_timer(self, key):
+        gid, kind = key
+        gw = RAW.get(gid)
+        if not gw:
+            return
+        if gw.end_ts is None:
+            return
+        if kind == "end":
+            await self._end_giveaway(gw)
+            return
+        # refresh countdown through the global budget, then re-arm
+        end_ts = gw.end_ts
+        self.refresh_budget.submit(gid, end_ts)
+        self._schedule_refresh(gid, end_ts)
 
     async def _end_giveaway(self, gw: Giveaway, forced: bool = False):
-        # snapshot and remove data from RAW & file first (so no race)
-        RAW.pop(gw.id, None)
-        save_data(RAW)
+        # snapshot and remove data from RAW & journal first (so no race)
+        if gw.id not in RAW:
+            return
+        self._unschedule(gw.id)
+        self.updater.discard(gw.id)
+        self._last_render.pop(gw.id, None)
+        STORE.delete(gw.id)
 
         # build channel & announce
         try:
-            channel = self.bot.get_channel(gw.channel_id) or await self.bot.fetch_channel(gw.channel_id)
+            channel = await self.resolver.channel(gw.channel_id)
         except Exception:
             channel = None
 
         if not gw.users:
+            await self._archive(gw, channel, None, None, [])
             if channel:
-                await channel.send(f"❌ Giveaway `{gw.id}` kết thúc nhưng không có người tham gia.")
+                try:
+                    await channel.send(f"❌ Giveaway `{gw.id}` kết thúc nhưng không có người tham gia.")
+                except discord.HTTPException as e:
+                    print(f"⚠️ Không gửi được thông báo kết thúc giveaway {gw.id}: {e}")
             return
 
-        winners = random.sample(gw.users, min(len(gw.users), gw.num_winners))
-        mentions = ", ".join(f"<@{uid}>" for uid in winners)
+        # weighted, seeded draw; pool kept for /reroll
+        seed = gw.seed or secrets.token_hex(16)
+        pool = self._build_draw_pool(gw)
+        winners = pool.draw(gw.num_winners, seed)
+        await db.record_draw(gw.id, 0, gw.creator_id, seed, seed_commitment(seed), pool.pool_hash, len(pool), winners)
+        await self._archive(gw, channel, seed, pool, winners)
+        self._remember_draw(gw.id, {
+            "pool": pool, "seed": seed, "round": 0, "winners": set(winners),
+            "creator_id": gw.creator_id, "channel_id": gw.channel_id, "reward": gw.reward,
+        })
+        mentions = ", ".join(f"<@{uid}>" for uid in winners) or "Không có ai đủ điều kiện"
         # Send public result embed
         public_embed = discord.Embed(
             title="🎊 Giveaway Kết Thúc!",
@@ -435,56 +1782,30 @@ class GiveawayCog(commands.Cog):
             color=discord.Color.gold(),
             timestamp=now_vn()
         )
+        public_embed.add_field(name="🔐 Kiểm chứng", value=self._verify_text(seed, pool), inline=False)
         # set thumbnail as creator avatar if possible
         try:
-            creator = await self.bot.fetch_user(gw.creator_id)
+            creator = await self.resolver.user(gw.creator_id)
             if creator and creator.avatar:
                 public_embed.set_footer(text=f"Tạo bởi {creator}", icon_url=creator.avatar.url)
         except:
             creator = None
 
-        if channel:
-            await channel.send(embed=public_embed)
+        # DM each winner (embed with creator info) via the outbox, in background;
+        # xếp hàng trước khi công bố để lỗi gửi vào kênh không làm mất DM
+        dm_embed = self._winner_dm_embed(gw.id, gw.reward, creator)
+        self._spawn(self.dm_dispatcher.enqueue(gw.id, gw.creator_id, winners, dm_embed))
 
-        # DM each winner with embed showing winner avatar + creator info
-        for uid in winners:
+        if channel:
             try:
-                user = await self.bot.fetch_user(uid)
-                # build DM embed
-                dm_embed = discord.Embed(
-                    title="🎉 Chúc mừng! Bạn đã thắng Giveaway",
-                    description=f"**Phần thưởng:** {gw.reward}\n**ID Giveaway:** `{gw.id}`",
-                    color=discord.Color.green(),
-                    timestamp=now_vn()
-                )
-                # set winner avatar as thumbnail (if available)
-                try:
-                    if user.avatar:
-                        dm_embed.set_thumbnail(url=user.avatar.url)
-                except:
-                    pass
-                # show creator info in embed field (with avatar url if possible)
-                if creator:
-                    creator_name = getattr(creator, "display_name", str(creator))
-                    dm_embed.add_field(name="Tạo bởi", value=f"{creator_name}", inline=True)
-                    try:
-                        if creator.avatar:
-                            dm_embed.set_footer(text=f"Tạo bởi {creator_name}", icon_url=creator.avatar.url)
-                    except:
-                        pass
-                # open DM and send embed
-                try:
-                    await user.send(embed=dm_embed)
-                except Exception:
-                    # can't DM — ignore
-                    pass
-            except Exception:
-                continue
+                await channel.send(embed=public_embed)
+            except discord.HTTPException as e:
+                print(f"⚠️ Không công bố được kết quả giveaway {gw.id}: {e}")
 
         # try to edit original message view to removed/ended state
         try:
             if channel:
-                msg = await channel.fetch_message(gw.message_id)
+                msg = channel.get_partial_message(gw.message_id)
                 ended_embed = discord.Embed(
                     title="🎊 Giveaway Đã Kết Thúc",
                     description=f"**Phần thưởng:** {gw.reward}\n**Người thắng:** {mentions}",
@@ -498,70 +1819,380 @@ class GiveawayCog(commands.Cog):
         # finally delete local store for this id (already removed)
         # participants list is no longer stored in RAW (deleted above)
 
+    def _winner_dm_embed(self, gid: str, reward: str, creator: Optional[discord.User]) -> discord.Embed:
+        dm_embed = discord.Embed(
+            title="🎉 Chúc mừng! Bạn đã thắng Giveaway",
+            description=f"**Phần thưởng:** {reward}\n**ID Giveaway:** `{gid}`",
+            color=discord.Color.green(),
+            timestamp=now_vn()
+        )
+        if creator:
+            creator_name = getattr(creator, "display_name", str(creator))
+            dm_embed.add_field(name="Tạo bởi", value=f"{creator_name}", inline=True)
+            if creator.avatar:
+                dm_embed.set_footer(text=f"Tạo bởi {creator_name}", icon_url=creator.avatar.url)
+        return dm_embed
+
+    # ---------- Draw helpers ----------
+    def _build_draw_pool(self, gw: Giveaway) -> DrawPool:
+        # mọi người 1 vé (copy mảng ở tầng C), chỉ vá thêm vé cho người có bonus
+        ids = array("q", gw.users.ids())
+        channel = self.bot.get_channel(gw.channel_id)
+        guild = getattr(channel, "guild", None)
+        position = None
+        rules = gw.eligibility
+        if rules is not None and guild is not None:
+            # role/thời gian có thể đã đổi từ lúc tham gia -> kiểm tra lại cả pool một lượt
+            ids = rules.filter(self._member_index(guild), ids)
+            position = {}
+        weights = array("d", [1.0]) * len(ids)
+        if guild is not None:
+            bonus: dict = {}
+            for role_id, extra in BONUS_ROLE_ENTRIES.items():
+                role = guild.get_role(role_id)
+                for member in (role.members if role else ()):
+                    bonus[member.id] = bonus.get(member.id, 0) + extra
+            if BOOSTER_ENTRIES:
+                for member in guild.premium_subscribers:
+                    bonus[member.id] = bonus.get(member.id, 0) + BOOSTER_ENTRIES
+            if position is not None and bonus:
+                position = {uid: i for i, uid in enumerate(ids)}
+            for uid, extra in bonus.items():
+                i = gw.users.index_of(uid) if position is None else position.get(uid, -1)
+                if i >= 0:
+                    weights[i] += extra
+        return DrawPool(ids, weights)
+
+    def _remember_draw(self, gid: str, entry: dict):
+        self._draws[gid] = entry
+        self._draws.move_to_end(gid)
+        while len(self._draws) > DRAW_CACHE_SIZE:
+            self._draws.popitem(last=False)
+
+    async def _load_draw(self, gid: str) -> Optional[dict]:
+        """Dựng lại pool quay thưởng từ archive (khi không còn trong cache RAM)."""
+        record = await ARCHIVE.get(gid)
+        if not record or not record.get("seed"):
+            return None
+        # archive cũ chỉ lưu pool (đã lọc) vào "users"
+        ids = record.get("pool_ids") or record["users"]
+        pool = DrawPool(_b64_array("q", ids), _b64_array("d", record["weights"]))
+        if pool.pool_hash != record["pool_hash"]:
+            print(f"❌ Archive của giveaway {gid} không khớp pool_hash, bỏ qua.")
+            return None
+        draws = await db.get_draws(gid)
+        entry = {
+            "pool": pool, "seed": record["seed"], "round": max((d["round"] for d in draws), default=0),
+            "winners": {uid for d in draws for uid in d["winners"]} or set(record["winners"]),
+            "creator_id": record["creator_id"], "channel_id": record["channel_id"], "reward": record["reward"],
+        }
+        self._remember_draw(gid, entry)
+        return entry
+
+    # ---------- Member index (eligibility) ----------
+    def _member_index(self, guild: discord.Guild) -> MemberIndex:
+        index = self._member_indexes.get(guild.id)
+        if index is None or (not index.complete and guild.chunked):
+            # dựng một lần từ cache member của gateway, sau đó chỉ cập nhật theo event
+            index = self._member_indexes[guild.id] = MemberIndex.build(guild)
+        return index
+
+    @commands.Cog.listener()
+    async def on_member_join(self, member: discord.Member):
+        index = self._member_indexes.get(member.guild.id)
+        if index is not None:
+            index.upsert(member)
+
+    @commands.Cog.listener()
+    async def on_member_update(self, before: discord.Member, after: discord.Member):
+        index = self._member_indexes.get(after.guild.id)
+        if index is not None:
+            index.upsert(after)
+
+    @commands.Cog.listener()
+    async def on_raw_member_remove(self, payload: discord.RawMemberRemoveEvent):
+        index = self._member_indexes.get(payload.guild_id)
+        if index is not None:
+            index.remove(payload.user.id)
+
+    @commands.Cog.listener()
+    async def on_user_update(self, before: discord.User, after: discord.User):
+        if before.avatar != after.avatar:
+            for index in self._member_indexes.values():
+                index.set_avatar(after.id, after.avatar is not None)
+
+    @commands.Cog.listener()
+    async def on_guild_remove(self, guild: discord.Guild):
+        self._member_indexes.pop(guild.id, None)
+
+    # ---------- Archive ----------
+    async def _archive(self, gw: Giveaway, channel, seed: Optional[str], pool: Optional[DrawPool], winners: List[int]):
+        record = dict(
+            gw.to_dict(),
+            users=gw.users.to_b64(),
+            # pool đã lọc điều kiện + trọng số, giữ riêng để /reroll dựng lại và kiểm pool_hash
+            pool_ids=base64.b64encode(pool.ids.tobytes()).decode("ascii") if pool else None,
+            weights=base64.b64encode(pool.weights.tobytes()).decode("ascii") if pool else None,
+            pool_hash=pool.pool_hash if pool else None,
+            participants=len(gw.users),
+            seed=seed,
+            commitment=seed_commitment(seed) if seed else None,
+            winners=winners,
+            guild_id=getattr(getattr(channel, "guild", None), "id", None),
+            ended_at=time.time(),
+        )
+        try:
+            await ARCHIVE.put(record)
+        except Exception as e:
+            print(f"❌ Lỗi lưu archive giveaway {gw.id}: {e}")
+
+    async def _lookup_any(self, gid: str) -> Optional[Giveaway]:
+        """Giveaway đang chạy trong RAW, hoặc đọc lười từ archive nếu đã kết thúc."""
+        gw = RAW.get(gid)
+        if gw is not None:
+            return gw
+        record = await ARCHIVE.get(gid)
+        return Giveaway(data=record) if record else None
+
+    @staticmethod
+    def _verify_text(seed: str, pool: DrawPool, round_: int = 0) -> str:
+        return (
+            f"Seed: `{seed}` (round {round_})\n"
+            f"Cam kết: `{seed_commitment(seed)}`\n"
+            f"Pool: {len(pool)} người, {pool.total:g} vé, hash `{pool.pool_hash[:16]}…`"
+        )
+
+    # ---------- Slash: /reroll <id> ----------
+    @app_commands.command(name="reroll", description="Quay lại người thắng cho giveaway đã kết thúc (chỉ người tạo)")
+    @app_commands.describe(giveaway_id="ID giveaway đã kết thúc", count="Số người thắng mới (mặc định 1)")
+    async def reroll(self, interaction: discord.Interaction, giveaway_id: str, count: app_commands.Range[int, 1, 50] = 1):
+        giveaway_id = normalize_id(giveaway_id)
+        entry = self._draws.get(giveaway_id) or await self._load_draw(giveaway_id)
+        if not entry:
+            await interaction.response.send_message("❌ Không còn dữ liệu quay thưởng cho giveaway này.", ephemeral=True)
+            return
+        if interaction.user.id != entry["creator_id"]:
+            await interaction.response.send_message("❌ Chỉ người tạo giveaway mới quay lại được.", ephemeral=True)
+            return
+        pool = entry["pool"]
+        round_ = entry["round"] + 1
+        winners = pool.draw(count, entry["seed"], round_, exclude=entry["winners"])
+        if not winners:
+            await interaction.response.send_message("❌ Không còn người tham gia nào để quay lại.", ephemeral=True)
+            return
+        entry["round"] = round_
+        entry["winners"].update(winners)
+        await db.record_draw(
+            giveaway_id, round_, entry["creator_id"], entry["seed"], seed_commitment(entry["seed"]),
+            pool.pool_hash, len(pool), winners,
+        )
+        mentions = ", ".join(f"<@{uid}>" for uid in winners)
+        embed = discord.Embed(
+            title="🔁 Giveaway Quay Lại!",
+            description=f"**ID:** `{giveaway_id}`\n**Phần thưởng:** {entry['reward']}\n**Người thắng mới:** {mentions}",
+            color=discord.Color.gold(),
+            timestamp=now_vn()
+        )
+        embed.add_field(name="🔐 Kiểm chứng", value=self._verify_text(entry["seed"], pool, round_), inline=False)
+        await interaction.response.send_message(f"🔁 Đã quay lại {len(winners)} người thắng.", ephemeral=True)
+        try:
+            channel = await self.resolver.channel(entry["channel_id"])
+            await channel.send(embed=embed)
+        except Exception:
+            pass
+        dm_embed = self._winner_dm_embed(giveaway_id, entry["reward"], interaction.user)
+        self._spawn(self.dm_dispatcher.enqueue(giveaway_id, entry["creator_id"], winners, dm_embed))
+
+    # ---------- Slash: /scgiveawayhistory ----------
+    @app_commands.command(name="scgiveawayhistory", description="Xem các giveaway đã kết thúc trong server (hoặc của một người tạo)")
+    @app_commands.describe(user="Chỉ xem giveaway do người này tạo")
+    async def scgiveawayhistory(self, interaction: discord.Interaction, user: Optional[discord.User] = None):
+        if user is not None:
+            rows = await ARCHIVE.history(creator_id=user.id)
+            title = f"📜 Giveaway đã kết thúc của {user}"
+        else:
+            rows = await ARCHIVE.history(guild_id=interaction.guild_id)
+            title = "📜 Giveaway đã kết thúc"
+        if not rows:
+            await interaction.response.send_message("📭 Chưa có giveaway nào kết thúc.", ephemeral=True)
+            return
+        lines = [
+            f"`{r['giveaway_id']}` · {r['reward']} · {r['participants']} người · <t:{int(r['ended_at'])}:R>"
+            for r in rows
+        ]
+        embed = discord.Embed(title=title, description="\n".join(lines), color=discord.Color.blurple())
+        embed.set_footer(text="Dùng /scgiveawaycheck <ID> để xem người tham gia, /reroll <ID> để quay lại")
+        await interaction.response.send_message(embed=embed, ephemeral=True)
+
     # ---------- Participants command internals (pagination) ----------
-    async def _respond_participants(self, interaction: discord.Interaction, gw: Giveaway, page: int = 1):
-        users = gw.users or []
-        per_page = 25
-        max_page = (len(users) - 1) // per_page + 1 if users else 1
-        page = max(1, min(page, max_page))
-        start = (page - 1) * per_page
-        end = start + per_page
-        page_users = users[start:end]
+    async def _respond_participants(self, interaction: discord.Interaction, gw: Giveaway, cursor: Optional[tuple] = None):
+        """Một trang người tham gia. Lần đầu gửi tin mới, Prev/Next thì edit tại chỗ.
 
-        lines = []
-        for idx, uid in enumerate(page_users, start=start + 1):
-            lines.append(f"{idx}. <@{uid}> (`{uid}`)")
+        Cursor trỏ vào một user (mốc) chứ không phải số trang, nên có người
+        vào/rời giữa chừng trang vẫn không lệch; ``index_of`` tra vị trí mốc
+        trong O(1) bằng bảng băm của ParticipantSet.
+        """
+        users = gw.users.ids()
+        total = len(users)
+        per_page = PARTICIPANTS_PER_PAGE
+        start = 0
+        if cursor is not None:
+            direction, uid, pos = cursor
+            anchor = gw.users.index_of(uid)
+            if anchor < 0:
+                # mốc đã rời: mọi người sau mốc dồn lên một chỗ
+                anchor = min(pos, total) - (direction == "n")
+            start = anchor + 1 if direction == "n" else anchor - per_page
+        start = max(0, min(start, total - 1))
+        end = min(start + per_page, total)
 
-        desc = "\n".join(lines) if lines else "Không có người tham gia."
+        lines = [f"{idx}. <@{uid}> (`{uid}`)" for idx, uid in enumerate(users[start:end], start=start + 1)]
         embed = discord.Embed(
-            title=f"📋 Participants · {gw.id} (Trang {page}/{max_page})",
-            description=desc,
+            title=f"📋 Participants · {gw.id} ({start + 1 if total else 0}–{end} / {total})",
+            description="\n".join(lines) if lines else "Không có người tham gia.",
             color=discord.Color.blurple(),
             timestamp=now_vn()
         )
         # show basic meta
         try:
-            creator = await self.bot.fetch_user(gw.creator_id)
+            creator = await self.resolver.user(gw.creator_id)
             embed.set_footer(text=f"Tạo bởi {creator}", icon_url=creator.avatar.url if creator and creator.avatar else None)
-        except:
+        except Exception:
             pass
 
-        # Build view with Prev/Next that include page number
-        view = discord.ui.View(timeout=120)
-        if page > 1:
-            view.add_item(discord.ui.Button(label="◀ Prev", style=discord.ButtonStyle.secondary, custom_id=f"{gw.id}|participants|{page-1}"))
-        if page < max_page:
-            view.add_item(discord.ui.Button(label="Next ▶", style=discord.ButtonStyle.secondary, custom_id=f"{gw.id}|participants|{page+1}"))
+        view = discord.ui.View(timeout=None)
+        if start > 0:
+            view.add_item(ParticipantsPageButton(gw.id, "p", users[start], start, label="◀ Prev"))
+        if end < total:
+            view.add_item(ParticipantsPageButton(gw.id, "n", users[end - 1], end - 1, label="Next ▶"))
+        if total:
+            view.add_item(ParticipantsExportButton(gw.id, "csv"))
+            view.add_item(ParticipantsExportButton(gw.id, "ndjson"))
+
+        if cursor is None:
+            # Reply ephemeral so only the requester sees it
+            await interaction.response.send_message(embed=embed, view=view, ephemeral=True)
+        else:
+            await interaction.response.edit_message(embed=embed, view=view)
 
-        # Reply ephemeral so only the requester sees it
-        await interaction.response.send_message(embed=embed, view=view, ephemeral=True)
+    async def _export_participants(self, interaction: discord.Interaction, gid: str, fmt: str):
+        """Xuất toàn bộ người tham gia (ID, username, thời điểm tham gia) thành file.
 
-    # listen for participants pagination button clicks
-    @commands.Cog.listener()
-    async def on_interaction_component(self, interaction: discord.Interaction):
-        # Some libraries may not call this — fallback to on_interaction above handles most
-        # But implement for the custom_id pattern used in participants view:
-        if interaction.type != discord.InteractionType.component:
-            return
-        cid = interaction.data.get("custom_id")
-        if not cid:
-            return
-        parts = cid.split("|")
-        if len(parts) == 3 and parts[1] == "participants":
-            gid = parts[0]
-            page = int(parts[2])
-            data = RAW.get(gid)
-            if not data:
-                await interaction.response.send_message("❌ Giveaway không tồn tại.", ephemeral=True)
-                return
-            gw = Giveaway(data=data)
-            await self._respond_participants(interaction, gw, page=page)
+        Dòng được ghi dần vào file tạm (chỉ giữ trong RAM tới EXPORT_SPOOL_SIZE)
+        theo từng lô đọc từ SQLite, không dựng cả danh sách đã format trong RAM.
+        Username lấy từ cache, không gọi REST cho từng người.
+        """
+        gw = await self._lookup_any(gid)
+        if gw is None:
+            await interaction.response.send_message("❌ Giveaway không tồn tại.", ephemeral=True)
             return
+        if interaction.user.id != gw.creator_id:
+            await interaction.response.send_message("❌ Chỉ người tạo giveaway mới xuất được danh sách.", ephemeral=True)
+            return
+        await interaction.response.defer(ephemeral=True, thinking=True)
+
+        if gid in RAW:
+            # giveaway đang chạy: đưa journal vào SQLite rồi đọc theo thứ tự tham gia
+            await STORE.checkpoint()
+            rows = db.iter_participants(gid)
+        else:
+            # đã kết thúc: archive chỉ còn ID theo thứ tự tham gia
+            rows = self._iter_archived(gw)
+
+        buf = tempfile.SpooledTemporaryFile(max_size=EXPORT_SPOOL_SIZE)
+        text = io.TextIOWrapper(buf, encoding="utf-8", newline="")
+        writer = csv.writer(text) if fmt == "csv" else None
+        if writer:
+            writer.writerow(("user_id", "username", "joined_at"))
+        count = 0
+        async for uid, joined_at in rows:
+            user = self.bot.get_user(uid)
+            name = user.name if user else ""
+            joined = datetime.fromtimestamp(joined_at, VN_TZ).isoformat() if joined_at else ""
+            if writer:
+                writer.writerow((uid, name, joined))
+            else:
+                text.write(json.dumps({"user_id": uid, "username": name, "joined_at": joined or None}, ensure_ascii=False) + "\n")
+            count += 1
+        text.flush()
+        text.detach()
+        buf.seek(0)
+        await interaction.followup.send(
+            f"📥 {count} người tham gia · `{gid}`",
+            file=discord.File(buf, filename=f"{gid}-participants.{fmt}"),
+            ephemeral=True,
+        )
+
+    @staticmethod
+    async def _iter_archived(gw: Giveaway):
+        for uid in gw.users:
+            yield uid, None
+
+    def _find_giveaway(self, query: str) -> Optional[Giveaway]:
+        """Tìm theo ID giveaway, ID message hoặc link message (qua index, không quét RAW)."""
+        query = query.strip()
+        gw = RAW.get(normalize_id(query))
+        if gw:
+            return gw
+        tail = query.rstrip("/").rsplit("/", 1)[-1]
+        if tail.isdigit():
+            return STORE.by_message_id(int(tail))
+        return None
+
+    # ---------- Owner: thống kê hiệu năng ----------
+    @commands.command(name="gwstats")
+    @commands.is_owner()
+    async def gwstats(self, ctx: commands.Context):
+        embed = discord.Embed(title="📈 Giveaway stats", color=discord.Color.blurple(), timestamp=now_vn())
+        u = self.updater.stats
+        embed.add_field(
+            name="✏️ Edit embed",
+            value=(
+                f"Yêu cầu: {u['requested']}\nĐã gửi: {u['sent']}\nGộp: {u['coalesced']}\n"
+                f"Không đổi: {u['unchanged']}\nLỗi: {u['failed']}"
+            ),
+            inline=True,
+        )
+        embed.add_field(name="⏰ Hẹn giờ", value=(
+                f"Đang chờ: {len(self.scheduler)}\nGiveaway: {len(RAW)}\n"
+                f"Kênh: {len(STORE.by_channel)} · Người tạo: {len(STORE.by_creator)}"
+            ),
+            inline=True,
+        )
+        r = self.refresh_budget.stats
+        embed.add_field(
+            name="🔄 Refresh countdown",
+            value=f"Chế độ: {COUNTDOWN_MODE}\nĐã gửi: {r['sent']}\nTrùng: {r['deduped']}\nĐang chờ: {len(self.refresh_budget)}",
+            inline=True,
+        )
+        d = self.dm_dispatcher.stats
+        embed.add_field(
+            name="📬 DM người thắng",
+            value=f"Đã gửi: {d['sent']}\nĐóng DM: {d['closed']}\nLỗi: {d['failed']}\nThử lại: {d['retries']}",
+            inline=True,
+        )
+        rc = self.recovery
+        if rc:
+            embed.add_field(
+                name="♻️ Khôi phục lần cuối",
+                value=(
+                    f"Đang chạy: {rc['running']}\nQuá hạn: {rc['overdue']}\nMất kênh: {rc['orphaned']}\n"
+                    f"Kênh chưa truy cập được: {rc['unreachable']}\n"
+                    f"Dựng lịch: {rc['schedule_ms']:.1f} ms\nTổng: {rc['total_s']:.1f} s"
+                ),
+                inline=True,
+            )
+        await ctx.send(embed=embed)
 
     # ---------- Cog unload/save ----------
-    def cog_unload(self):
-        # save RAW just in case
-        save_data(RAW)
+    async def cog_unload(self):
+        self.bot.remove_dynamic_items(GiveawayButton, ParticipantsPageButton, ParticipantsExportButton)
+        if self._recovery_task:
+            self._recovery_task.cancel()
+        self.scheduler.stop()
+        self.refresh_budget.stop()
+        # flush journal + ghi snapshot cuối cùng
+        await STORE.close()
 
 
 async def setup(bot: commands.Bot):
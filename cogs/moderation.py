@@ -2,12 +2,18 @@ import discord
 from discord.ext import commands
 from discord.ui import View, Button, Modal, TextInput
 from datetime import timedelta
+import asyncio
+from typing import List, Optional
+
+from cogs import db
+from cogs.utils import get_resolver
 
 # ⚙️ Config
 restrict_mode = False
 allowed_id = 660507549442900009  # Owner chính
 allowed_id_moderator = [660507549442900009, 416613894887440384]  # danh sách mod
-verified_users = [660507549442900009, 416613894887440384]
+default_verified_users = [660507549442900009, 416613894887440384]  # seed vào DB lần đầu (toàn cục)
+VERIFIED_PER_PAGE = 20  # số user mỗi trang của checktick
 
 # 🔇 Modal nhập thời gian mute
 class MuteModal(Modal, title="🔇 Nhập thời gian mute"):
@@ -61,6 +67,111 @@ class UserInfoView(View):
         await interaction.response.send_modal(MuteModal(self.member))
 
 
+# ✅ Verified users: SQLite + index trong RAM
+class VerifiedRegistry:
+    """Verified user theo phạm vi: ``db.GLOBAL_SCOPE`` (mọi server) hoặc từng guild.
+
+    Toàn bộ bảng được nạp một lần vào dict (dùng như set có thứ tự) nên kiểm
+    tra tick là O(1) không đụng DB; thêm/xoá ghi DB (kèm audit) rồi cập nhật index.
+    """
+
+    def __init__(self):
+        self._scopes: dict = {}  # guild_id -> {user_id: None}
+
+    async def load(self):
+        scopes: dict = {}
+        for guild_id, uid in await db.load_verified():
+            scopes.setdefault(guild_id, {})[uid] = None
+        self._scopes = scopes
+
+    def is_verified(self, uid: int, guild_id: Optional[int] = None) -> bool:
+        if uid in self._scopes.get(db.GLOBAL_SCOPE, ()):
+            return True
+        return guild_id is not None and uid in self._scopes.get(guild_id, ())
+
+    def members(self, guild_id: Optional[int] = None) -> List[int]:
+        """User verified ở ``guild_id`` (gồm cả toàn cục), không trùng lặp."""
+        merged = dict(self._scopes.get(db.GLOBAL_SCOPE, {}))
+        if guild_id is not None:
+            merged.update(self._scopes.get(guild_id, {}))
+        return list(merged)
+
+    def scope_of(self, uid: int, guild_id: Optional[int]) -> Optional[int]:
+        for scope in (guild_id, db.GLOBAL_SCOPE):
+            if scope is not None and uid in self._scopes.get(scope, ()):
+                return scope
+        return None
+
+    async def add(self, uid: int, scope: int, actor_id: int) -> bool:
+        if not await db.add_verified(uid, scope, added_by=actor_id):
+            return False
+        self._scopes.setdefault(scope, {})[uid] = None
+        return True
+
+    async def remove(self, uid: int, scope: int, actor_id: int) -> bool:
+        if not await db.remove_verified(uid, scope, removed_by=actor_id):
+            return False
+        self._scopes.get(scope, {}).pop(uid, None)
+        return True
+
+
+# 📋 Danh sách verified phân trang
+class VerifiedPageView(View):
+    """Mỗi trang resolve song song qua Resolver dùng chung; trang kế được tải trước."""
+
+    def __init__(self, resolver, author_id: int, user_ids: List[int], title: str):
+        super().__init__(timeout=180)
+        self.resolver = resolver
+        self.author_id = author_id
+        self.user_ids = user_ids
+        self.title = title
+        self.page = 0
+        self.pages = max(1, -(-len(user_ids) // VERIFIED_PER_PAGE))
+        self._prefetch: set = set()  # task làm nóng trang sau, giữ tham chiếu tới khi xong
+
+    def _slice(self, page: int) -> List[int]:
+        return self.user_ids[page * VERIFIED_PER_PAGE:(page + 1) * VERIFIED_PER_PAGE]
+
+    async def render(self) -> discord.Embed:
+        ids = self._slice(self.page)
+        users = await asyncio.gather(*(self.resolver.user(uid) for uid in ids), return_exceptions=True)
+        lines = []
+        for i, (uid, user) in enumerate(zip(ids, users), start=self.page * VERIFIED_PER_PAGE + 1):
+            if isinstance(user, BaseException):
+                lines.append(f"`{i}.` ❔ Người dùng không tồn tại (ID: {uid})")
+            else:
+                lines.append(f"`{i}.` ✅ **{user.name}** — <@{uid}>")
+        embed = discord.Embed(title=self.title, description="\n".join(lines), color=discord.Color.green())
+        embed.set_footer(text=f"Trang {self.page + 1}/{self.pages} · {len(self.user_ids)} user")
+        self.prev_page.disabled = self.page == 0
+        self.next_page.disabled = self.page >= self.pages - 1
+        # làm nóng cache cho trang sau để bấm ▶️ không phải chờ REST
+        if self.page + 1 < self.pages:
+            task = asyncio.get_running_loop().create_task(self._warm(self.page + 1))
+            self._prefetch.add(task)
+            task.add_done_callback(self._prefetch.discard)
+        return embed
+
+    async def _warm(self, page: int):
+        await asyncio.gather(*(self.resolver.user(uid) for uid in self._slice(page)), return_exceptions=True)
+
+    async def interaction_check(self, interaction: discord.Interaction) -> bool:
+        if interaction.user.id != self.author_id:
+            await interaction.response.send_message("❌ Chỉ người gọi lệnh mới chuyển trang được.", ephemeral=True)
+            return False
+        return True
+
+    @discord.ui.button(label="◀️", style=discord.ButtonStyle.secondary)
+    async def prev_page(self, interaction: discord.Interaction, button: Button):
+        self.page = max(0, self.page - 1)
+        await interaction.response.edit_message(embed=await self.render(), view=self)
+
+    @discord.ui.button(label="▶️", style=discord.ButtonStyle.secondary)
+    async def next_page(self, interaction: discord.Interaction, button: Button):
+        self.page = min(self.pages - 1, self.page + 1)
+        await interaction.response.edit_message(embed=await self.render(), view=self)
+
+
 def is_moderator(ctx):
     return ctx.author.id in allowed_id_moderator
 
@@ -68,6 +179,19 @@ def is_moderator(ctx):
 class Moderation(commands.Cog):
     def __init__(self, bot):
         self.bot = bot
+        self.resolver = get_resolver(bot)
+        self.registry = VerifiedRegistry()
+
+    async def cog_load(self):
+        await db.init_db()
+        await db.seed_verified(default_verified_users)
+        await self.registry.load()
+
+    def _scope(self, ctx, scope: Optional[str]) -> int:
+        """Phạm vi tick: server hiện tại, hoặc ``global`` (mọi server; mặc định khi dùng trong DM)."""
+        if scope is not None and scope.lower() == "global" or ctx.guild is None:
+            return db.GLOBAL_SCOPE
+        return ctx.guild.id
 
     # ⚙️ Restrict Mode ON/OFF
     @commands.command()
@@ -88,6 +212,29 @@ class Moderation(commands.Cog):
         else:
             await ctx.send("❌ Sai cú pháp. Dùng `sc?setting on` hoặc `sc?setting off`.")
 
+    # 📈 Thống kê cache user/channel/message dùng chung
+    @commands.command()
+    async def cachestats(self, ctx):
+        if ctx.author.id != allowed_id:
+            return await ctx.send("❌ Bạn không có quyền xem thống kê.")
+        st = self.resolver.summary()
+        embed = discord.Embed(title="📈 Resolver cache", color=discord.Color.blurple())
+        embed.add_field(
+            name="🎯 Lookup",
+            value=(
+                f"Tổng: {st['lookups']}\nGateway: {st['gateway']}\nCache: {st['cache']}\n"
+                f"Gộp in-flight: {st['inflight']}\nREST: {st['fetch']} (lỗi {st['errors']})"
+            ),
+            inline=True,
+        )
+        embed.add_field(
+            name="⏱️ Độ trễ REST",
+            value=f"TB: {st['fetch_avg_ms']:.1f} ms\nMax: {st['fetch_max_ms']:.1f} ms\nHit rate: {st['hit_rate']:.1%}",
+            inline=True,
+        )
+        embed.add_field(name="🗃️ Đang cache", value="\n".join(f"{k}: {v}" for k, v in st["cached"].items()), inline=True)
+        await ctx.send(embed=embed)
+
     # 📌 Lệnh check thông tin user
     @commands.command()
     async def check(self, ctx, member: discord.Member = None):
@@ -97,7 +244,7 @@ class Moderation(commands.Cog):
             return await ctx.send("❌ Bạn không có quyền dùng lệnh này.")
 
         member = member or ctx.author
-        verified = " ✅" if member.id in verified_users else ""
+        verified = " ✅" if self.registry.is_verified(member.id, ctx.guild.id if ctx.guild else None) else ""
 
         embed = discord.Embed(
             title=f"Thông tin của {member.display_name}{verified}",
@@ -116,42 +263,68 @@ class Moderation(commands.Cog):
 
     # ✅ Add Verified
     @commands.command()
-    async def addtick(self, ctx, user: discord.User):
+    async def addtick(self, ctx, user: discord.User, scope: str = None):
         if not is_moderator(ctx):
             return await ctx.send("❌ Bạn không có quyền thêm verified user.")
-        if user.id in verified_users:
+        guild_id = self._scope(ctx, scope)
+        if guild_id == db.GLOBAL_SCOPE and ctx.author.id != allowed_id:
+            return await ctx.send("❌ Chỉ owner mới thêm tick toàn cục được.")
+        if not await self.registry.add(user.id, guild_id, ctx.author.id):
             return await ctx.send(f"⚠️ <@{user.id}> đã có verified.")
-        verified_users.append(user.id)
-        await ctx.send(f"✅ Đã thêm <@{user.id}> vào verified users.")
+        where = "mọi server" if guild_id == db.GLOBAL_SCOPE else "server này"
+        await ctx.send(f"✅ Đã thêm <@{user.id}> vào verified users ({where}).")
 
     # 📋 Check Verified
     @commands.command()
     async def checktick(self, ctx):
         if not is_moderator(ctx):
             return await ctx.send("❌ Bạn không có quyền xem danh sách verified.")
+        verified_users = self.registry.members(ctx.guild.id if ctx.guild else None)
         if not verified_users:
             return await ctx.send("📭 Chưa có verified user nào.")
 
-        embed = discord.Embed(title="📋 Danh sách Verified Users", color=discord.Color.green())
-        for uid in verified_users:
-            try:
-                user = await self.bot.fetch_user(uid)
-                embed.add_field(name=user.name, value=f"✅ <@{uid}>", inline=False)
-            except:
-                embed.add_field(name="Người dùng không tồn tại", value=f"ID: {uid}", inline=False)
-
-        await ctx.send(embed=embed)
+        view = VerifiedPageView(self.resolver, ctx.author.id, verified_users, "📋 Danh sách Verified Users")
+        embed = await view.render()
+        await ctx.send(embed=embed, view=view if view.pages > 1 else None)
 
     # 🗑️ Xóa Verified
     @commands.command()
-    async def xoatick(self, ctx, user: discord.User):
+    async def xoatick(self, ctx, user: discord.User, scope: str = None):
         if not is_moderator(ctx):
             return await ctx.send("❌ Bạn không có quyền xoá verified user.")
-        if user.id not in verified_users:
+        if scope is None:
+            # không ghi phạm vi: xoá tick đang có (ưu tiên tick của server này)
+            guild_id = self.registry.scope_of(user.id, ctx.guild.id if ctx.guild else None)
+        else:
+            guild_id = self._scope(ctx, scope)
+        if guild_id is None:
+            return await ctx.send(f"⚠️ <@{user.id}> không có trong danh sách verified.")
+        if guild_id == db.GLOBAL_SCOPE and ctx.author.id != allowed_id:
+            return await ctx.send("❌ Tick toàn cục chỉ owner mới xoá được.")
+        if not await self.registry.remove(user.id, guild_id, ctx.author.id):
             return await ctx.send(f"⚠️ <@{user.id}> không có trong danh sách verified.")
-        verified_users.remove(user.id)
         await ctx.send(f"🗑️ Đã xoá <@{user.id}> khỏi verified users.")
 
+    # 🧾 Lịch sử thêm/xoá tick
+    @commands.command()
+    async def tickaudit(self, ctx, user: discord.User = None):
+        if not is_moderator(ctx):
+            return await ctx.send("❌ Bạn không có quyền xem lịch sử verified.")
+        # trong DM chỉ xem được tick toàn cục, không lộ lịch sử của server khác
+        rows = await db.verified_audit(
+            guild_id=ctx.guild.id if ctx.guild else db.GLOBAL_SCOPE, user_id=user.id if user else None, limit=15
+        )
+        if not rows:
+            return await ctx.send("📭 Chưa có lịch sử.")
+        lines = []
+        for guild_id, uid, action, actor_id, at in rows:
+            icon = "➕" if action == "add" else "➖"
+            scope = " 🌐" if guild_id == db.GLOBAL_SCOPE else ""
+            actor = f"<@{actor_id}>" if actor_id else "hệ thống"
+            lines.append(f"{icon} <@{uid}>{scope} bởi {actor} · <t:{int(at)}:R>")
+        embed = discord.Embed(title="🧾 Lịch sử Verified", description="\n".join(lines), color=discord.Color.green())
+        await ctx.send(embed=embed)
+
 
 async def setup(bot):
     await bot.add_cog(Moderation(bot))
\ No newline at end of file
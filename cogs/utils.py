@@ -0,0 +1,206 @@
+# cogs/utils.py
+# Helper dùng chung cho các cog (không phải extension, main.py bỏ qua file này).
+import asyncio
+import heapq
+import time
+from collections import OrderedDict
+from typing import Optional
+
+import discord
+from discord.ext import commands
+
+RESOLVER_MAXSIZE = 5000  # số object tối đa mỗi loại trong cache
+RESOLVER_TTL = 600  # giây
+
+
+class TTLCache:
+    """Cache LRU có hạn dùng: quá ``ttl`` giây hoặc vượt ``maxsize`` thì bị loại."""
+
+    def __init__(self, maxsize: int = RESOLVER_MAXSIZE, ttl: float = RESOLVER_TTL):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data: "OrderedDict[object, tuple]" = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def get(self, key):
+        item = self._data.get(key)
+        if item is None:
+            return None
+        expires, value = item
+        if expires < time.monotonic():
+            del self._data[key]
+            return None
+        self._data.move_to_end(key)
+        return value
+
+    def set(self, key, value):
+        self._data[key] = (time.monotonic() + self.ttl, value)
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+
+
+class TimerHeap:
+    """Một task duy nhất cho mọi hẹn giờ của một cog (vd. kết thúc giveaway, hết hạn phiên chat).
+
+    Các hẹn giờ nằm trong min-heap theo thời điểm (epoch giây). Huỷ hoặc
+    đặt lại chỉ cập nhật ``_deadlines``; mục cũ trong heap bị bỏ qua khi pop
+    (lazy invalidation). Task ngủ đúng tới hẹn giờ gần nhất và được đánh
+    thức sớm khi có hẹn giờ mới sớm hơn.
+    """
+
+    def __init__(self, on_due, label: str = "timer"):
+        self._on_due = on_due  # coroutine(key)
+        self.label = label
+        self._heap: list = []
+        self._deadlines: dict = {}
+        self._seq = 0
+        self._wakeup = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+        self._firing: set = set()  # giữ tham chiếu task _fire tới khi chạy xong
+
+    def __len__(self) -> int:
+        return len(self._deadlines)
+
+    def start(self):
+        if self._task is None or self._task.done():
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    def stop(self):
+        if self._task:
+            self._task.cancel()
+            self._task = None
+
+    def schedule(self, key, when: float):
+        """Đặt (hoặc đặt lại) hẹn giờ cho key vào thời điểm epoch ``when``."""
+        self._deadlines[key] = when
+        self._seq += 1
+        heapq.heappush(self._heap, (when, self._seq, key))
+        if self._heap[0][2] == key:
+            self._wakeup.set()
+
+    def schedule_many(self, items):
+        """Nạp nhiều hẹn giờ (key, when) một lượt: heapify một lần thay vì push từng cái."""
+        for key, when in items:
+            self._deadlines[key] = when
+            self._seq += 1
+            self._heap.append((when, self._seq, key))
+        heapq.heapify(self._heap)
+        self._wakeup.set()
+
+    def cancel(self, key):
+        self._deadlines.pop(key, None)
+
+    def _pop_stale(self):
+        heap = self._heap
+        while heap and self._deadlines.get(heap[0][2]) != heap[0][0]:
+            heapq.heappop(heap)
+
+    async def _run(self):
+        while True:
+            self._pop_stale()
+            timeout = self._heap[0][0] - time.time() if self._heap else None
+            if timeout is None or timeout > 0:
+                self._wakeup.clear()
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+            _, _, key = heapq.heappop(self._heap)
+            del self._deadlines[key]
+            # chạy riêng để một hẹn giờ chậm không làm trễ các hẹn giờ khác
+            task = asyncio.get_running_loop().create_task(self._fire(key))
+            self._firing.add(task)
+            task.add_done_callback(self._firing.discard)
+
+    async def _fire(self, key):
+        try:
+            await self._on_due(key)
+        except Exception as e:
+            print(f"❌ Lỗi hẹn giờ {self.label} {key}: {e}")
+
+
+class Resolver:
+    """Tìm user/channel theo ID với ít REST call nhất có thể.
+
+    Thứ tự: cache gateway của discord.py (get_user/get_channel) -> TTLCache
+    -> gộp các lần fetch đang chạy cho cùng ID -> REST. Lỗi (NotFound,
+    Forbidden, ...) được ném lại cho nơi gọi như fetch_* bình thường.
+    """
+
+    def __init__(self, bot: commands.Bot):
+        self.bot = bot
+        self._caches = {kind: TTLCache() for kind in ("user", "channel")}
+        self._inflight: dict = {}
+        self.stats = {"gateway": 0, "cache": 0, "inflight": 0, "fetch": 0, "errors": 0}
+        self._fetch_time = 0.0
+        self._fetch_max = 0.0
+
+    async def _resolve(self, kind: str, key, fetch):
+        cached = self._caches[kind].get(key)
+        if cached is not None:
+            self.stats["cache"] += 1
+            return cached
+        fut = self._inflight.get((kind, key))
+        if fut is not None:
+            self.stats["inflight"] += 1
+            return await asyncio.shield(fut)
+
+        fut = asyncio.get_running_loop().create_future()
+        self._inflight[(kind, key)] = fut
+        start = time.perf_counter()
+        try:
+            value = await fetch()
+        except Exception as e:
+            self.stats["errors"] += 1
+            fut.set_exception(e)
+            fut.exception()  # đánh dấu đã xử lý nếu không ai chờ
+            raise
+        else:
+            self._caches[kind].set(key, value)
+            fut.set_result(value)
+            return value
+        finally:
+            elapsed = time.perf_counter() - start
+            self.stats["fetch"] += 1
+            self._fetch_time += elapsed
+            self._fetch_max = max(self._fetch_max, elapsed)
+            self._inflight.pop((kind, key), None)
+
+    async def user(self, user_id: int) -> discord.User:
+        user = self.bot.get_user(user_id)
+        if user is not None:
+            self.stats["gateway"] += 1
+            return user
+        return await self._resolve("user", user_id, lambda: self.bot.fetch_user(user_id))
+
+    async def channel(self, channel_id: int):
+        channel = self.bot.get_channel(channel_id)
+        if channel is not None:
+            self.stats["gateway"] += 1
+            return channel
+        return await self._resolve("channel", channel_id, lambda: self.bot.fetch_channel(channel_id))
+
+    def summary(self) -> dict:
+        s = self.stats
+        lookups = s["gateway"] + s["cache"] + s["inflight"] + s["fetch"]
+        return {
+            **s,
+            "lookups": lookups,
+            "hit_rate": (lookups - s["fetch"]) / lookups if lookups else 0.0,
+            "fetch_avg_ms": self._fetch_time / s["fetch"] * 1000 if s["fetch"] else 0.0,
+            "fetch_max_ms": self._fetch_max * 1000,
+            "cached": {kind: len(c) for kind, c in self._caches.items()},
+        }
+
+
+def get_resolver(bot: commands.Bot) -> Resolver:
+    """Một Resolver duy nhất gắn vào bot, dùng chung cho mọi cog."""
+    resolver: Optional[Resolver] = getattr(bot, "resolver", None)
+    if resolver is None:
+        resolver = Resolver(bot)
+        bot.resolver = resolver
+    return resolver
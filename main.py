@@ -4,6 +4,8 @@ import os
 from dotenv import load_dotenv
 import asyncio
 
+from cogs import db
+
 
 # đảm bảo thư mục data tồn tại
 os.makedirs("data", exist_ok=True)